@@ -1,67 +1,19 @@
-import subprocess
-import sys
-import os
-import asyncio
-from dash import Dash, Input, Output, State
-import dash_bootstrap_components as dbc
-from flask_caching import Cache
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-import pandas as pd
-import numpy as np
-from ui.layout import create_layout
-from data.fetchers.yahoo_fetcher import YahooFetcher
-from data.fetchers.processors.data_processor import process_stock_data
-from visualization.plotter import plot_multi_stock_chart
-from config import CACHE_DIR, CACHE_TIMEOUT, DATABASE_URL
-
-# Automatically verify and install required packages
-def install_and_verify_packages():
-    """Ensure required packages are installed."""
-    required_packages = {
-        "dash": "2.9.3",
-        "dash-bootstrap-components": "1.3.1",
-        "flask-caching": "1.10.1",
-        "SQLAlchemy": "1.4.46",
-        "pandas": "1.5.3",
-        "numpy": "1.24.3",
-        "yfinance": "0.2.24",
-        "plotly": "5.15.0",
-        "python-dotenv": "1.0.0",
-        "aiohttp": "3.8.4",
-    }
-
-    for package, version in required_packages.items():
-        try:
-            import importlib.metadata
-            installed_version = importlib.metadata.version(package)
-            if installed_version != version:
-                raise ImportError(f"Version mismatch for {package}. Installed: {installed_version}, Required: {version}")
-        except ImportError:
-            print(f"Installing or upgrading package: {package}")
-            subprocess.check_call([sys.executable, "-m", "pip", "install", f"{package}=={version}"])
-
-install_and_verify_packages()
-
-# Initialize Dash app
-app = Dash(__name__, external_stylesheets=[dbc.themes.FLATLY])
-app.title = "Stocker 4.2.2"
-app.layout = create_layout()
-
-# Initialize Cache
-cache = Cache(app.server, config={
-    'CACHE_TYPE': 'filesystem',
-    'CACHE_DIR': CACHE_DIR,
-    'CACHE_THRESHOLD': 5000  # Adjust as needed
-})
-
-# Database Setup
-engine = create_engine(DATABASE_URL)
-Session = sessionmaker(bind=engine)
-
-# Create tables if they don't exist
-from data.models.stock_data import Base
-Base.metadata.create_all(engine)
+import atexit
+import logging
+from flask import jsonify, request
+from data.fetchers.processors.indicators import IndicatorCache
+from data.storage.price_store import PriceStore
+from data.storage.memory_cache import MemoryCache
+from data.storage.range_cache import RangeCache
+from data.storage.response_cache import ResponseCache
+from data.storage.shared_frames import SharedFrameStore
+from data.screener import ScreenerIndex
+import metrics
+from metrics import METRICS
+from config import (
+    DATABASE_URL, LOG_FORMAT, LOG_LEVEL, PRICE_STORE_DIR, PLOT_TRACE_CACHE_BYTES, REFRESH_SCHEDULER_ENABLED, SHARED_FRAMES_DIR,
+    STREAM_REPLAY_FILE, MEMORY_PRECISION, SCREENER_DEFAULT_LIMIT, SCREENER_MAX_LIMIT
+)
 
 # Sample list of 1000 stock tickers
 # Replace this list with actual stock tickers
@@ -70,75 +22,200 @@ TOP_1000_STOCKS = [
     # Add more tickers here
 ]
 
-# Cache the top 1000 stocks data on startup
-@app.server.before_first_request
-async def startup_cache():
-    fetcher = YahooFetcher()
-    end_date = pd.Timestamp.today().strftime('%Y-%m-%d')
-    start_date = (pd.Timestamp.today() - pd.Timedelta(days=365)).strftime('%Y-%m-%d')
-    
-    # Fetch data
-    print("Fetching data for top 1000 stocks...")
-    top_1000_data = await fetcher.fetch_top_1000_stocks(start_date, end_date, TOP_1000_STOCKS)
-    
-    # Process and cache data
-    for ticker, data in top_1000_data.items():
-        processed_data = process_stock_data(data)
-        cache.set(f"stock_data_{ticker}", processed_data.to_json(date_format='iso', orient='split'))
-    print("Caching complete.")
-
-@app.callback(
-    Output("multi-stock-graph", "figure"),
-    Output("error-message", "children"),
-    Input("fetch-data-button", "n_clicks"),
-    State("ticker-input", "value"),
-    State("date-picker-range", "start_date"),
-    State("date-picker-range", "end_date"),
-    State("indicators-checklist", "value")
+# Module attributes set by create_app
+SERVICES = (
+    'app', 'server', 'price_store', 'shared_frames', 'indicator_cache', 'sql_store', 'screener_index', 'processing_pool',
+    'runtime', 'fetcher', 'range_cache', 'trace_cache', 'response_cache', 'refresh_scheduler', 'stream',
 )
-def update_multi_stock_graph(n_clicks, tickers, start_date, end_date, indicators):
-    if n_clicks == 0:
-        return {}, ""
-    
-    if not tickers:
-        return {}, "Please enter valid ticker symbols."
-    
-    tickers_list = [ticker.strip().upper() for ticker in tickers.split(',')]
-    dfs = {}
-    fetcher = YahooFetcher()
-    error_messages = []
-    
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    
-    async def fetch_and_process(ticker):
-        cached_data = cache.get(f"stock_data_{ticker}")
-        if cached_data:
-            df = pd.read_json(cached_data, orient='split', convert_dates=['index'])
-            df.index = pd.to_datetime(df.index)
-            # Filter the data for the date range
-            df = df.loc[start_date:end_date]
-        else:
-            df = await fetcher.fetch_data(ticker, start_date, end_date)
-            if not df.empty:
-                df = process_stock_data(df)
-                cache.set(f"stock_data_{ticker}", df.to_json(date_format='iso', orient='split'))
-        return ticker, df
-    
-    tasks = [fetch_and_process(ticker) for ticker in tickers_list]
-    results = loop.run_until_complete(asyncio.gather(*tasks))
-    
-    for ticker, df in results:
-        if df.empty:
-            error_messages.append(f"No data found for ticker '{ticker}'.")
-            continue
-        dfs[ticker] = df
-    
-    if not dfs:
-        error_message = " | ".join(error_messages) if error_messages else "No data could be fetched for the provided tickers."
-        return {}, error_message
-    
-    fig = plot_multi_stock_chart(dfs, indicators)
-    error_message = " | ".join(error_messages) if error_messages else ""
-    
-   
\ No newline at end of file
+
+# Manifest generation of the shared frames the screener index was last synced to
+screener_generation = None
+
+def create_app():
+    """
+    Build the Dash app and the services behind it, once per process.
+
+    Importing this module is cheap: the Dash app and its callbacks (ui.callbacks), the
+    database, worker processes, HTTP session and upstream clients are set up here, and their
+    heavy dependencies (Dash, Plotly, SQLAlchemy, aiohttp, yfinance) are imported here or on
+    first use. Callbacks reach the services through the module globals assigned below, so a
+    second call returns the same app.
+    Accessing any name in SERVICES, such as `app:server` for gunicorn, calls this first.
+    """
+    global app, server, price_store, shared_frames, indicator_cache, sql_store, screener_index, processing_pool
+    global runtime, fetcher, range_cache, trace_cache, response_cache, refresh_scheduler, stream
+    if 'app' in globals():
+        return app
+
+    from dash import Dash
+    import dash_bootstrap_components as dbc
+    from sqlalchemy import create_engine
+    from ui.layout import create_layout
+    from ui import callbacks
+    from data.storage.sql_store import SQLStore
+    from data.processing_pool import ProcessingPool
+    from data.refresh_scheduler import RefreshScheduler
+    from data.async_runtime import AsyncRuntime
+    from data.fetchers.providers import create_fetcher
+
+    # A no-op when the server (e.g. gunicorn --log-config) has already configured logging
+    logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+
+    # Columnar store for price history; indicators are computed on demand
+    price_store = PriceStore(PRICE_STORE_DIR)
+    indicator_cache = IndicatorCache()
+
+    # Processed frames published by data.frame_publisher, mapped read-only by every worker
+    shared_frames = SharedFrameStore(SHARED_FRAMES_DIR) if SHARED_FRAMES_DIR else None
+
+    # Tables and indexes are created on first use
+    sql_store = SQLStore(create_engine(DATABASE_URL))
+
+    # Latest bar and indicator values of every processed ticker, for the screener
+    screener_index = ScreenerIndex()
+
+    # Indicators for persistence are computed in worker processes, forked before any other thread starts
+    processing_pool = ProcessingPool(PRICE_STORE_DIR, DATABASE_URL, on_latest=screener_index.update)
+    processing_pool.start()
+    # Registered first so it runs last, after the scheduler and runtime have stopped submitting work
+    atexit.register(processing_pool.close)
+    if shared_frames is not None:
+        # The publisher stores each ticker's last row with its frame, so workers don't recompute them
+        sync_screener()
+    else:
+        # Index what the price store already holds; refreshed tickers are re-indexed as they are persisted
+        processing_pool.refresh_latest(price_store.tickers())
+
+    # One event loop and HTTP session for every request, instead of a loop per callback
+    runtime = AsyncRuntime()
+    atexit.register(runtime.close)
+
+    # Shared fetcher over every configured provider, with failover and hedged requests
+    fetcher = create_fetcher(runtime)
+
+    # Fetches only the date ranges the price store doesn't hold yet
+    range_cache = RangeCache(price_store, fetcher, on_write=persist_bars, memory=MemoryCache(), shared=shared_frames)
+
+    # Plotly traces per ticker, trace group, store version and window, so unchanged tickers aren't rebuilt
+    trace_cache = MemoryCache(PLOT_TRACE_CACHE_BYTES)
+
+    # Serialized full-figure responses per query signature, valid while their tickers' stored bars are unchanged
+    response_cache = ResponseCache(price_store)
+
+    # Warm the universe and refresh it after each market close without blocking requests. With shared
+    # frames the publisher does, so that web workers don't each warm the universe and write the same tickers
+    refresh_scheduler = RefreshScheduler(range_cache, TOP_1000_STOCKS, runtime, sql_store)
+    if REFRESH_SCHEDULER_ENABLED and shared_frames is None:
+        refresh_scheduler.start()
+        # Registered after the runtime, so it stops before the runtime closes
+        atexit.register(refresh_scheduler.stop)
+
+    # Intraday bars aggregated on the shared runtime; live mode is off without a source
+    stream = None
+    if STREAM_REPLAY_FILE:
+        from data.streaming.pipeline import StreamPipeline
+        from data.streaming.sources import FileReplaySource
+        stream = StreamPipeline(FileReplaySource(STREAM_REPLAY_FILE))
+        runtime.submit(stream.run())
+
+    app = Dash(__name__, external_stylesheets=[dbc.themes.FLATLY])
+    app.title = "Stocker 4.2.2"
+    app.layout = create_layout()
+    server = app.server
+
+    # Prometheus-style /metrics, request timings and opt-in per-request profiling (PROFILE_DIR).
+    # Installed first, so responses served from the cache below are timed and profiled too
+    metrics.install(server)
+
+    server.add_url_rule("/refresh-status", view_func=refresh_status)
+    server.add_url_rule("/memory-usage", view_func=memory_usage)
+    server.add_url_rule("/api/screener", view_func=screener_api)
+    server.before_request(callbacks.serve_cached_figure)
+    server.after_request(callbacks.store_figure_response)
+
+    METRICS.gauge('stocker_memory_bytes', memory_tiers, labels=('tier',),
+                  help_text="Bytes held in process by cached prices, indicators, the trading calendar and stream buffers.")
+    METRICS.gauge('stocker_memory_cache', range_cache.memory.stats,
+                  help_text="In-process price cache entries, bytes and lifetime hit/miss/eviction counts.")
+    METRICS.gauge('stocker_single_flight', flight_stats, labels=('flight', 'stat'),
+                  help_text="Coalesced loads: calls made and calls that shared another's result.")
+    METRICS.gauge('stocker_provider_latency_seconds', provider_latency, labels=('provider', 'quantile'),
+                  help_text="Recent successful upstream latency per provider.")
+    METRICS.gauge('stocker_refresh_progress', refresh_scheduler.progress,
+                  help_text="Tickers in the current or last refresh cycle.")
+    METRICS.gauge('stocker_processing_pool', processing_pool.stats,
+                  help_text="Processing workers, queued tasks and lifetime processed/failed counts.")
+    METRICS.gauge('stocker_screener', screener_index.stats,
+                  help_text="Tickers in the screener index and columns with a current sorted index.")
+    METRICS.gauge('stocker_response_cache', response_cache.stats,
+                  help_text="Cached figure responses: entries, compressed bytes and lifetime hit/miss/eviction counts.")
+    if shared_frames is not None:
+        METRICS.gauge('stocker_shared_frames', shared_frames.stats,
+                      help_text="Published frames, frames this process has mapped and their bytes, and the publish time.")
+    if stream is not None:
+        METRICS.gauge('stocker_stream', stream.stats, help_text="Intraday stream counters and buffer bytes.")
+    return app
+
+def __getattr__(name):
+    if name in SERVICES:
+        create_app()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def persist_bars(ticker, new_bars):
+    # The worker resumes the ticker's saved indicator state, so only the new rows are processed;
+    # it reads the bars from the price store, so only their dates are sent
+    processing_pool.submit(ticker, new_bars.index)
+
+def refresh_status():
+    return jsonify(refresh_scheduler.progress())
+
+def memory_tiers():
+    return {
+        'prices': range_cache.memory.nbytes,
+        'indicators': indicator_cache.nbytes,
+        'calendar': range_cache.calendar.nbytes,
+        'traces': trace_cache.nbytes,
+        'responses': response_cache.nbytes,
+        'stream': stream.stats()['bytes'] if stream is not None else 0,
+    }
+
+def memory_usage():
+    # Bytes held in process per ticker; the shared trading calendar is counted once, under its tier
+    tickers = {}
+    for tier, usage in (('prices', range_cache.memory.usage()), ('indicators', indicator_cache.usage())):
+        for ticker, nbytes in usage.items():
+            tickers.setdefault(ticker, {'prices': 0, 'indicators': 0})[tier] = nbytes
+    tiers = memory_tiers()
+    return jsonify({'precision': MEMORY_PRECISION, 'tiers': tiers, 'total': sum(tiers.values()), 'tickers': tickers})
+
+def sync_screener():
+    """Index the last rows of the published shared frames, once per manifest generation."""
+    global screener_generation
+    manifest = shared_frames.manifest()
+    if manifest['generation'] != screener_generation:
+        screener_index.sync({ticker: entry['latest'] for ticker, entry in manifest['tickers'].items() if entry['latest']})
+        screener_generation = manifest['generation']
+
+def run_screen(query, sort_by, order, limit, columns=None):
+    if shared_frames is not None:
+        sync_screener()
+    limit = min(max(int(limit or SCREENER_DEFAULT_LIMIT), 1), SCREENER_MAX_LIMIT)
+    return screener_index.screen(query or '', sort_by or None, order != 'asc', limit, columns)
+
+def screener_api():
+    # e.g. /api/screener?q=RSI<30 and Close>SMA_50&sort=MFI&order=desc&limit=20&columns=Close,RSI
+    columns = request.args.get('columns')
+    try:
+        return jsonify(run_screen(request.args.get('q'), request.args.get('sort'), request.args.get('order'),
+                                  request.args.get('limit'), columns.split(',') if columns else None))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+def flight_stats():
+    return {(name, stat): getattr(flights, stat) for name, flights in
+            (('range', range_cache.flights), ('indicator', indicator_cache.flights)) for stat in ('calls', 'shared')}
+
+def provider_latency():
+    return {(name, quantile): stats[key] for name, stats in fetcher.stats().items()
+            for quantile, key in (('0.5', 'p50'), ('0.95', 'p95'))}
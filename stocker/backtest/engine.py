@@ -0,0 +1,155 @@
+import itertools
+from typing import Dict, Iterable, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from config import BACKTEST_COMBO_CHUNK, BACKTEST_COST, BACKTEST_PERIODS_PER_YEAR
+from data.fetchers.processors.data_processor import process_stock_data
+from data.processing_pool import ProcessingPool
+from metrics import METRICS
+from .strategies import STRATEGY_REGISTRY, StrategySpec
+
+# Per parameter combination of one ticker
+METRIC_NAMES = ['total_return', 'max_drawdown', 'sharpe', 'trades', 'exposure']
+
+def get_strategy(name: str) -> StrategySpec:
+    if name not in STRATEGY_REGISTRY:
+        raise ValueError(f"Unknown strategy '{name}'. Available: {', '.join(STRATEGY_REGISTRY)}")
+    return STRATEGY_REGISTRY[name]
+
+def parameter_grid(grid: Dict[str, Sequence[float]]) -> pd.DataFrame:
+    """Every combination of the parameter values, one row per combination."""
+    return pd.DataFrame(list(itertools.product(*grid.values())), columns=list(grid), dtype=np.float64)
+
+def hold(entries: np.ndarray, exits: np.ndarray) -> np.ndarray:
+    """
+    Long (True) from each bar in `entries` until the next bar in `exits`, flat otherwise.
+
+    Works along the last axis, so every row of a (combos, bars) array is a separate run; an
+    exit on the same bar as an entry wins. Vectorized by carrying the index of the last
+    signal forward instead of stepping through the bars.
+    """
+    entries, exits = np.broadcast_arrays(entries, exits)
+    events = np.where(exits, 0, np.where(entries, 1, -1)).astype(np.int8)
+    bars = np.arange(events.shape[-1])
+    last = np.maximum.accumulate(np.where(events >= 0, bars, 0), axis=-1)
+    return np.take_along_axis(events, last, axis=-1) == 1
+
+def evaluate(close: np.ndarray, positions: np.ndarray, cost: float = BACKTEST_COST,
+             periods_per_year: int = BACKTEST_PERIODS_PER_YEAR) -> Dict[str, np.ndarray]:
+    """
+    Returns, drawdowns and trades of each row of long/flat `positions` (combos x bars) over `close`.
+
+    A position held at a bar's close earns the next bar's return, so a signal never trades on
+    the return it was computed from, and every change of position pays `cost` of its size.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = np.diff(close) / close[:-1]
+    returns[~np.isfinite(returns)] = 0
+    positions = positions.astype(np.float64)
+    changes = np.diff(positions, axis=1, prepend=0)
+    period_returns = positions[:, :-1] * returns - cost * np.abs(changes[:, :-1])
+
+    log_equity = np.cumsum(np.log1p(period_returns), axis=1)
+    # Drawdowns are measured from the running peak, starting at the initial equity
+    peak = np.maximum.accumulate(np.maximum(log_equity, 0), axis=1)
+    mean, std = period_returns.mean(axis=1), period_returns.std(axis=1)
+    sharpe = np.divide(mean, std, out=np.zeros_like(mean), where=std > 0) * np.sqrt(periods_per_year)
+    return {
+        'total_return': np.expm1(log_equity[:, -1]),
+        'max_drawdown': np.expm1((log_equity - peak).min(axis=1)),
+        'sharpe': sharpe,
+        'trades': np.count_nonzero(changes > 0, axis=1).astype(np.float64),
+        'exposure': positions[:, :-1].mean(axis=1),
+    }
+
+def backtest_frame(df: pd.DataFrame, strategy: str, params: Dict[str, np.ndarray], start=None, end=None,
+                   cost: float = BACKTEST_COST) -> Optional[Dict[str, np.ndarray]]:
+    """
+    Run every parameter combination of `strategy` over the OHLCV history in `df`.
+
+    `params` holds one array per parameter, all as long as the number of combinations.
+    Indicators come from process_stock_data over the whole history, so they are warmed up at
+    `start`; only bars in [start, end] are traded. Returns one array per METRIC_NAMES entry,
+    or None if the window has fewer than two bars.
+    """
+    spec = get_strategy(strategy)
+    processed = process_stock_data(df, list(spec.indicators)).loc[start:end]
+    if len(processed) < 2:
+        return None
+    data = {column: processed[column].to_numpy(dtype=np.float64) for column in ('Close',) + spec.indicators}
+    combos = len(next(iter(params.values())))
+    chunks = []
+    # Bounds the (combos x bars) temporaries for large grids
+    for first in range(0, combos, BACKTEST_COMBO_CHUNK):
+        chunk = {name: values[first:first + BACKTEST_COMBO_CHUNK, None] for name, values in params.items()}
+        chunks.append(evaluate(data['Close'], hold(*spec.func(data, **chunk)), cost))
+    return {name: np.concatenate([chunk[name] for chunk in chunks]) for name in METRIC_NAMES}
+
+def _backtest_ticker(ticker: str, df: pd.DataFrame, *args) -> Optional[Dict[str, np.ndarray]]:
+    return backtest_frame(df, *args)
+
+class BacktestResult:
+    """
+    Metrics of a parameter sweep over a universe.
+
+    `params` has one row per parameter combination, `per_ticker` one row per (ticker, combo)
+    and `aggregate` one row per combo, summarizing its results across tickers.
+    """
+
+    def __init__(self, strategy: str, params: pd.DataFrame, results: Dict[str, Dict[str, np.ndarray]]):
+        self.strategy = strategy
+        self.params = params
+        self.tickers = sorted(results)
+        # (tickers x combos) per metric
+        self.metrics = {
+            name: np.stack([results[ticker][name] for ticker in self.tickers]) if self.tickers
+            else np.empty((0, len(params)))
+            for name in METRIC_NAMES
+        }
+
+    @property
+    def per_ticker(self) -> pd.DataFrame:
+        index = pd.MultiIndex.from_product([self.tickers, self.params.index], names=['ticker', 'combo'])
+        return pd.DataFrame({name: values.ravel() for name, values in self.metrics.items()}, index=index)
+
+    @property
+    def aggregate(self) -> pd.DataFrame:
+        returns, drawdowns = self.metrics['total_return'], self.metrics['max_drawdown']
+        with np.errstate(all='ignore'):
+            summary = pd.DataFrame({
+                'tickers': len(self.tickers),
+                'mean_return': returns.mean(axis=0),
+                'median_return': np.median(returns, axis=0),
+                'win_rate': (returns > 0).mean(axis=0),
+                'mean_drawdown': drawdowns.mean(axis=0),
+                'worst_drawdown': drawdowns.min(axis=0, initial=0),
+                'mean_sharpe': self.metrics['sharpe'].mean(axis=0),
+                'mean_trades': self.metrics['trades'].mean(axis=0),
+            }, index=self.params.index)
+        return pd.concat([self.params, summary], axis=1)
+
+    def best(self, metric: str = 'median_return', n: int = 10) -> pd.DataFrame:
+        """The `n` combos with the highest `metric` (drawdowns are negative, so the shallowest)."""
+        return self.aggregate.sort_values(metric, ascending=False).head(n)
+
+def run_backtest(pool: ProcessingPool, tickers: Iterable[str], strategy: str,
+                 grid: Optional[Dict[str, Sequence[float]]] = None, start=None, end=None,
+                 cost: float = BACKTEST_COST) -> BacktestResult:
+    """
+    Sweep `strategy` over every combination in `grid` (default: the strategy's own) for each
+    stored ticker, sharded across the pool's worker processes.
+    """
+    spec = get_strategy(strategy)
+    grid = spec.grid if grid is None else grid
+    unknown = [name for name in grid if name not in spec.grid]
+    if unknown:
+        raise ValueError(f"Unknown parameter '{unknown[0]}' for {strategy}. Available: {', '.join(spec.grid)}")
+    # Parameters left out are swept over their default values
+    params = parameter_grid({name: grid.get(name, values) for name, values in spec.grid.items()})
+    columns = {name: params[name].to_numpy() for name in params.columns}
+    with METRICS.span('backtest'):
+        results = pool.map(_backtest_ticker, tickers, strategy, columns, start, end, cost)
+    return BacktestResult(strategy, params, {ticker: result for ticker, result in results.items() if result is not None})
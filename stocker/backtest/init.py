@@ -0,0 +1 @@
+# This file makes 'stocker.backtest' a Python package.
\ No newline at end of file
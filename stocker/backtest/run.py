@@ -0,0 +1,86 @@
+"""
+Sweep a rule strategy's parameters over the stored universe.
+
+Run from the stocker directory:
+
+    python -m backtest.run bollinger_breakout --start 2015-01-01 --top 20
+    python -m backtest.run macd_crossover --param band=0,0.001,0.002 --tickers AAPL MSFT --output results
+
+Tickers are read from the price store (PRICE_STORE_DIR) and sharded across BATCH_WORKERS
+processes. The best parameter combinations across tickers are printed; with --output, the
+aggregate and per-ticker metrics are also written as CSV files.
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from config import BACKTEST_COST, BATCH_WORKERS, DATABASE_URL, PRICE_STORE_DIR
+from backtest.engine import run_backtest
+from backtest.strategies import STRATEGY_REGISTRY
+from data.processing_pool import ProcessingPool
+from data.storage.price_store import PriceStore
+
+def parse_params(values: List[str]) -> Dict[str, List[float]]:
+    grid = {}
+    for value in values:
+        name, _, numbers = value.partition('=')
+        try:
+            grid[name.strip()] = [float(number) for number in numbers.split(',')]
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Expected name=value,value,... got '{value}'")
+    return grid
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('strategy', choices=list(STRATEGY_REGISTRY))
+    parser.add_argument('--param', action='append', default=[], metavar='NAME=V1,V2,...',
+                        help="Values to sweep for a parameter; others use the strategy's default grid")
+    parser.add_argument('--tickers', nargs='*', help="Tickers to test (default: every stored ticker)")
+    parser.add_argument('--start', help="First traded date; earlier bars only warm up indicators")
+    parser.add_argument('--end', help="Last traded date")
+    parser.add_argument('--cost', type=float, default=BACKTEST_COST, help="Cost per unit of position traded")
+    parser.add_argument('--workers', type=int, default=BATCH_WORKERS, help="Worker processes; 0 runs in-process")
+    parser.add_argument('--metric', default='median_return', help="Aggregate column to rank combinations by")
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--output', help="Directory for aggregate.csv and tickers.csv")
+    args = parser.parse_args(argv)
+
+    try:
+        grid = parse_params(args.param)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+    tickers = args.tickers or PriceStore(PRICE_STORE_DIR).tickers()
+    if not tickers:
+        print(f"No stored tickers in {PRICE_STORE_DIR}.")
+        return 1
+
+    pool = ProcessingPool(PRICE_STORE_DIR, DATABASE_URL, workers=args.workers)
+    pool.start()
+    started = time.perf_counter()
+    try:
+        result = run_backtest(pool, tickers, args.strategy, {**STRATEGY_REGISTRY[args.strategy].grid, **grid},
+                              args.start, args.end, args.cost)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    finally:
+        pool.close()
+    elapsed = time.perf_counter() - started
+
+    print(f"{args.strategy}: {len(result.params)} combinations x {len(result.tickers)} tickers in {elapsed:.1f}s")
+    if args.metric not in result.aggregate.columns:
+        parser.error(f"Unknown metric '{args.metric}'. Available: {', '.join(result.aggregate.columns)}")
+    with pd.option_context('display.width', 200, 'display.max_columns', None):
+        print(result.best(args.metric, args.top).to_string())
+    if args.output:
+        os.makedirs(args.output, exist_ok=True)
+        result.aggregate.to_csv(os.path.join(args.output, 'aggregate.csv'), index_label='combo')
+        result.per_ticker.to_csv(os.path.join(args.output, 'tickers.csv'))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,63 @@
+from collections import OrderedDict
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+class StrategySpec:
+    """A registered rule strategy: its signal function, the columns it reads and its default parameter grid."""
+
+    def __init__(self, name: str, func: Callable, indicators: Tuple[str, ...], grid: Dict[str, List[float]]):
+        self.name = name
+        self.func = func
+        self.indicators = tuple(indicators)
+        self.grid = grid
+
+STRATEGY_REGISTRY: Dict[str, StrategySpec] = OrderedDict()
+
+def register_strategy(name: str, indicators: Sequence[str], **grid: Sequence[float]):
+    """
+    Register the decorated function as strategy `name`, with a default grid of parameter values.
+
+    It is called as func(data, **params): `data` maps 'Close' and `indicators` to arrays over
+    the bars, and each parameter is a (combos, 1) array, so comparisons broadcast to one row
+    per parameter combination. It returns (entries, exits) boolean arrays; see engine.hold.
+    """
+    def decorator(func: Callable) -> Callable:
+        STRATEGY_REGISTRY[name] = StrategySpec(name, func, indicators, {key: [float(value) for value in values]
+                                                                       for key, values in grid.items()})
+        return func
+    return decorator
+
+def crosses_above(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    above = a > b
+    return above & ~np.concatenate([[True], above[:-1]])
+
+def crosses_below(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return crosses_above(b, a)
+
+@register_strategy('macd_crossover', indicators=('MACD', 'Signal_Line', 'SMA_50'),
+                   band=[0, 0.00025, 0.0005, 0.00075, 0.001, 0.0015, 0.002, 0.003, 0.004, 0.006], trend=[0, 1])
+def _macd_crossover(data, band, trend):
+    # Long while MACD is above its signal line by more than `band` of the price, flat once it is
+    # below by as much; with `trend` only entering above SMA_50
+    spread = (data['MACD'] - data['Signal_Line']) / data['Close']
+    entries = (spread > band) & ((trend == 0) | (data['Close'] > data['SMA_50']))
+    exits = spread < -band
+    return entries, exits
+
+@register_strategy('bollinger_breakout', indicators=('SMA_20', 'stddev_20'),
+                   entry_width=np.arange(1.0, 3.01, 0.25), exit_width=np.arange(-1.0, 2.01, 0.5))
+def _bollinger_breakout(data, entry_width, exit_width):
+    # Enter on a close above SMA_20 + entry_width standard deviations (Upper_BB at 2) and leave on
+    # one below SMA_20 - exit_width standard deviations (Lower_BB at 2; negative is above the mean)
+    entries = data['Close'] > data['SMA_20'] + entry_width * data['stddev_20']
+    exits = data['Close'] < data['SMA_20'] - exit_width * data['stddev_20']
+    return entries, exits
+
+@register_strategy('stochastic', indicators=('%K', '%D'),
+                   oversold=[10, 15, 20, 25, 30, 35, 40], overbought=[60, 65, 70, 75, 80, 85, 90])
+def _stochastic(data, oversold, overbought):
+    # %K crossing above %D while oversold enters, crossing below it while overbought exits
+    entries = crosses_above(data['%K'], data['%D']) & (data['%K'] < oversold)
+    exits = crosses_below(data['%K'], data['%D']) & (data['%K'] > overbought)
+    return entries, exits
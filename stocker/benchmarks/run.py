@@ -0,0 +1,541 @@
+"""
+Offline benchmarks for the fetch, process, cache and plot hot paths.
+
+Run from the stocker directory:
+
+    python -m benchmarks.run --rows 5000 --tickers 100 --output results.json
+    python -m benchmarks.run --compare results.json
+
+Every benchmark uses synthetic data and stub fetchers, so no network is needed and results
+only depend on the code and the machine. Results are written as JSON (timings in seconds,
+sizes in bytes) together with the library versions and git revision they were taken at;
+`--compare` prints the ratio of each median to a previous results file. The startup
+benchmarks also exit with status 1 when a median exceeds its budget (STARTUP_*_BUDGET in
+config) or importing the app module loads a dependency it should defer.
+"""
+import argparse
+import asyncio
+import json
+import os
+import pickle
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+from io import StringIO
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Settings are read when config is first imported, so keep the app away from real storage,
+# upstream providers and background work before anything imports it
+SCRATCH_DIR = tempfile.mkdtemp(prefix='stocker-bench-')
+os.environ['PRICE_STORE_DIR'] = os.path.join(SCRATCH_DIR, 'price-store')
+os.environ['CACHE_DIR'] = os.path.join(SCRATCH_DIR, 'cache-directory')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(SCRATCH_DIR, 'stocker.db')}"
+os.environ['REFRESH_SCHEDULER_ENABLED'] = '0'
+os.environ.pop('STREAM_REPLAY_FILE', None)
+
+from benchmarks.synthetic import synthetic_ohlcv, synthetic_universe
+
+BENCHMARKS: Dict[str, Callable] = OrderedDict()
+
+# Indicators offered by the UI checklist
+UI_INDICATORS = ['SMA_20', 'SMA_50', 'EMA_12', 'EMA_26', 'RSI', 'Bollinger_Bands', 'MACD', 'OBV', 'Stochastic_Oscillator']
+
+def benchmark(name: str):
+    def decorator(func: Callable):
+        BENCHMARKS[name] = func
+        return func
+    return decorator
+
+def measure(func: Callable, repeat: int, setup: Optional[Callable] = None) -> dict:
+    """Time `func` `repeat` times after one warm-up call; `setup` runs untimed before each call."""
+    if setup is not None:
+        setup()
+    func()
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return summarize(timings)
+
+def summarize(timings: List[float]) -> dict:
+    return {
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'mean': statistics.fmean(timings),
+        'repeat': len(timings),
+    }
+
+def result(name: str, params: dict, seconds: dict, **extra) -> dict:
+    return {'name': name, 'params': params, 'seconds': seconds, 'extra': extra}
+
+@benchmark('process')
+def bench_process(args) -> List[dict]:
+    from data.fetchers.processors.data_processor import process_stock_data
+    from data.fetchers.processors.incremental_processor import IncrementalProcessor
+    from data.fetchers.processors.indicators import compute_indicators, expand_selection
+
+    df = synthetic_ohlcv(args.rows)
+    results = [
+        result('process_stock_data', {'rows': args.rows}, measure(lambda: process_stock_data(df.copy()), args.repeat)),
+        result('compute_indicators.selected', {'rows': args.rows, 'indicators': ['SMA_20', 'MACD']},
+               measure(lambda: compute_indicators(df, expand_selection(['SMA_20', 'MACD'])), args.repeat)),
+    ]
+
+    processor = IncrementalProcessor()
+    processor.update(df.iloc[:-1])
+    bar = df.iloc[-1:]
+    close, high, low, volume = (bar[col].to_numpy() for col in ['Close', 'High', 'Low', 'Volume'])
+    results.append(result('incremental.update_arrays', {'bars': 1},
+                          measure(lambda: processor.update_arrays(close, high, low, volume), args.repeat)))
+    return results
+
+@benchmark('panel')
+def bench_panel(args) -> List[dict]:
+    from data.fetchers.processors.data_processor import process_stock_data
+    from data.fetchers.processors.panel_processor import process_stock_panel
+
+    dfs = synthetic_universe(args.tickers, args.rows)
+    params = {'rows': args.rows, 'tickers': args.tickers}
+    return [
+        result('process_stock_data.loop', params,
+               measure(lambda: {ticker: process_stock_data(df.copy()) for ticker, df in dfs.items()}, args.repeat)),
+        result('process_stock_panel', params, measure(lambda: process_stock_panel(dfs), args.repeat)),
+    ]
+
+@benchmark('warmup')
+def bench_warmup(args) -> List[dict]:
+    from data.processing_pool import ProcessingPool
+    from data.storage.price_store import PriceStore
+
+    root = os.path.join(SCRATCH_DIR, 'warmup')
+    store = PriceStore(os.path.join(root, 'price-store'))
+    for ticker, df in synthetic_universe(args.tickers, args.rows).items():
+        store.write(ticker, df)
+    tickers = store.tickers()
+
+    results = []
+    for workers in sorted({0, os.cpu_count() or 1}):
+        pool = ProcessingPool(store.root, f"sqlite:///{os.path.join(root, f'warmup-{workers}.db')}", workers=workers)
+        pool.start()
+        try:
+            seconds = measure(lambda: pool.process_all(tickers), args.repeat)
+        finally:
+            pool.close()
+        results.append(result('warmup.process_all', {'rows': args.rows, 'tickers': args.tickers, 'workers': workers}, seconds))
+    return results
+
+@benchmark('backtest')
+def bench_backtest(args) -> List[dict]:
+    from backtest.engine import run_backtest
+    from backtest.strategies import STRATEGY_REGISTRY
+    from config import BATCH_WORKERS
+    from data.processing_pool import ProcessingPool
+    from data.storage.price_store import PriceStore
+
+    root = os.path.join(SCRATCH_DIR, 'backtest')
+    store = PriceStore(os.path.join(root, 'price-store'))
+    for ticker, df in synthetic_universe(args.tickers, args.rows).items():
+        store.write(ticker, df)
+    tickers = store.tickers()
+
+    results = []
+    pool = ProcessingPool(store.root, f"sqlite:///{os.path.join(root, 'backtest.db')}", workers=BATCH_WORKERS)
+    pool.start()
+    try:
+        for name, spec in STRATEGY_REGISTRY.items():
+            combos = int(np.prod([len(values) for values in spec.grid.values()]))
+            seconds = measure(lambda: run_backtest(pool, tickers, name), args.repeat)
+            results.append(result(f'backtest.{name}', {'rows': args.rows, 'tickers': args.tickers, 'combos': combos,
+                                                       'workers': pool.workers}, seconds,
+                                  runs_per_second=args.tickers * combos / seconds['median']))
+    finally:
+        pool.close()
+    return results
+
+@benchmark('cache')
+def bench_cache(args) -> List[dict]:
+    from data.fetchers.processors.data_processor import process_stock_data
+    from data.fetchers.base_fetcher import OHLCV_COLUMNS
+    from data.fetchers.processors.indicators import ALL_INDICATORS, INTERMEDIATE_INDICATORS
+    from data.storage.compact import TradingCalendar, compact_frame
+    from data.storage.memory_cache import MemoryCache
+    from data.storage.price_store import PriceStore
+
+    df = process_stock_data(synthetic_ohlcv(args.rows), ALL_INDICATORS)
+    params = {'rows': args.rows, 'columns': len(df.columns)}
+    results = []
+
+    # What the filesystem cache used to hold: the processed frame as JSON
+    encoded = df.to_json(orient='split', date_format='iso')
+    results.append(result('cache.json.roundtrip', params,
+                          measure(lambda: pd.read_json(StringIO(df.to_json(orient='split', date_format='iso')), orient='split'), args.repeat),
+                          bytes=len(encoded)))
+    results.append(result('cache.json.read', params,
+                          measure(lambda: pd.read_json(StringIO(encoded), orient='split'), args.repeat), bytes=len(encoded)))
+
+    pickled = pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL)
+    results.append(result('cache.pickle.read', params, measure(lambda: pickle.loads(pickled), args.repeat), bytes=len(pickled)))
+
+    with tempfile.TemporaryDirectory() as root:
+        store = PriceStore(root)
+        results.append(result('cache.price_store.write', params, measure(lambda: store.write('SYN', df), args.repeat)))
+        start, end = df.index[len(df) // 2], df.index[-1]
+
+        def read_fresh():
+            # Drop the cached mapping so every read maps the files again
+            store._mapped.clear()
+            return store.read('SYN', start, end)
+
+        results.append(result('cache.price_store.read', params, measure(read_fresh, args.repeat)))
+        results.append(result('cache.price_store.read_mapped', params,
+                              measure(lambda: store.read('SYN', start, end), args.repeat)))
+
+    memory = MemoryCache()
+    memory.set('SYN', df)
+    results.append(result('cache.memory.get', params, measure(lambda: memory.get('SYN'), args.repeat),
+                          bytes=memory.nbytes))
+
+    # What the memory tiers hold now: float64 prices on a shared calendar, and the displayed
+    # indicators as float32 arrays
+    calendar = TradingCalendar()
+    prices = compact_frame(df, calendar, 'float64', drop=ALL_INDICATORS)
+    indicators = compact_frame(df, calendar, 'float32', drop=[*OHLCV_COLUMNS, *INTERMEDIATE_INDICATORS])
+    results.append(result('cache.compact.to_frame', params, measure(prices.to_frame, args.repeat),
+                          bytes=prices.nbytes + indicators.nbytes))
+    return results
+
+@benchmark('plot')
+def bench_plot(args) -> List[dict]:
+    from data.fetchers.processors.data_processor import process_stock_data
+    from visualization.plotter import plot_multi_stock_chart
+
+    dfs = {ticker: process_stock_data(df) for ticker, df in synthetic_universe(args.plot_tickers, args.rows).items()}
+    results = []
+    for max_points in (None, args.width):
+        params = {'rows': args.rows, 'tickers': args.plot_tickers, 'max_points': max_points}
+        build = lambda: plot_multi_stock_chart(dfs, UI_INDICATORS, max_points=max_points)
+        serialized = build().to_json()
+        results.append(result('plot.build', params, measure(build, args.repeat)))
+        results.append(result('plot.build_and_serialize', params, measure(lambda: build().to_json(), args.repeat),
+                              bytes=len(serialized)))
+    return results
+
+class StubFetcher:
+    """Serves slices of synthetic histories after a fixed latency."""
+
+    def __init__(self, rows: int, latency: float):
+        self.rows = rows
+        self.latency = latency
+        self.calls = 0
+
+    async def fetch_data(self, ticker: str, start_date: str, end_date: str) -> pd.DataFrame:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        df = synthetic_ohlcv(self.rows, seed=sum(map(ord, ticker)))
+        tz = df.index.tz
+        return df[(df.index >= pd.Timestamp(start_date, tz=tz)) & (df.index < pd.Timestamp(end_date, tz=tz))]
+
+@benchmark('fetch')
+def bench_fetch(args) -> List[dict]:
+    from data.fetchers.yahoo_fetcher import YahooFetcher
+
+    class StubYahooFetcher(YahooFetcher):
+        def _history(self, ticker: str, start_date: str, end_date: str) -> pd.DataFrame:
+            time.sleep(args.latency)
+            return synthetic_ohlcv(250, seed=sum(map(ord, ticker)))
+
+    tickers = [f"SYN{i:04d}" for i in range(args.tickers)]
+    fetcher = StubYahooFetcher(batch_size=0)
+    try:
+        seconds = measure(lambda: asyncio.run(fetcher.fetch_top_1000_stocks('2000-01-01', '2001-01-01', tickers)), args.repeat)
+    finally:
+        fetcher.close()
+    return [result('fetch.yahoo.concurrent', {'tickers': args.tickers, 'latency': args.latency}, seconds)]
+
+def anonymous_bytes() -> Optional[int]:
+    """Anonymous (heap) memory of this process, or None where /proc/self/smaps_rollup is missing."""
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                if line.startswith('Anonymous:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+def worker_heap(load: Callable[[], object]) -> Optional[int]:
+    """Heap a freshly forked process adds while holding what `load` returns, like one more web worker."""
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        before = anonymous_bytes()
+        held = load()  # Kept alive until measured
+        after = anonymous_bytes()
+        os.write(write_fd, json.dumps(None if before is None else after - before).encode())
+        os._exit(0)
+    os.close(write_fd)
+    with os.fdopen(read_fd) as f:
+        heap = json.loads(f.read() or 'null')
+    os.waitpid(pid, 0)
+    return heap
+
+@benchmark('shared')
+def bench_shared(args) -> List[dict]:
+    from config import BATCH_WORKERS
+    from data.fetchers.processors.data_processor import process_stock_data
+    from data.frame_publisher import FramePublisher
+    from data.processing_pool import ProcessingPool
+    from data.storage.compact import TradingCalendar, compact_frame
+    from data.storage.price_store import PriceStore
+    from data.storage.shared_frames import SharedFrameStore
+
+    root = os.path.join(SCRATCH_DIR, 'shared')
+    store = PriceStore(os.path.join(root, 'price-store'))
+    for ticker, df in synthetic_universe(args.tickers, args.rows).items():
+        store.write(ticker, df)
+    tickers = store.tickers()
+    params = {'rows': args.rows, 'tickers': args.tickers}
+
+    generation = iter(range(10 ** 6))
+    shared = {}
+
+    def new_store():
+        # An empty store each time, so every ticker is published
+        shared['store'] = SharedFrameStore(os.path.join(root, f"shared-{next(generation)}"))
+
+    pool = ProcessingPool(store.root, f"sqlite:///{os.path.join(root, 'shared.db')}", workers=BATCH_WORKERS)
+    pool.start()
+    try:
+        publish = measure(lambda: FramePublisher(store, shared['store'], pool).publish(), args.repeat, setup=new_store)
+    finally:
+        pool.close()
+
+    reader = SharedFrameStore(shared['store'].root)
+    read = measure(lambda: [reader.read(ticker) for ticker in tickers], args.repeat)
+
+    def load_shared():
+        frames = [SharedFrameStore(reader.root).read(ticker)[0] for ticker in tickers]
+        for frame in frames:
+            # Fault every page in, as serving the frames would
+            for column in frame:
+                frame[column].to_numpy().sum()
+        return frames
+
+    def load_private():
+        # What a worker without shared frames caches: compact copies of the processed history
+        calendar = TradingCalendar()
+        return [compact_frame(process_stock_data(store.read(ticker)), calendar) for ticker in tickers]
+
+    return [
+        result('shared.publish', params, publish, mapped_bytes=sum(
+            os.path.getsize(os.path.join(directory, name)) for directory, _, names in os.walk(shared['store'].root)
+            for name in names if name.endswith('.npy'))),
+        result('shared.read', params, read, worker_heap_bytes=worker_heap(load_shared),
+               private_worker_heap_bytes=worker_heap(load_private)),
+    ]
+
+# Run in a fresh interpreter per sample, since a module is only imported once per process
+STARTUP_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+deferred = [name for name in %r if name not in sys.modules]
+status = app.create_app().server.test_client().get('/_dash-layout').status_code
+ready = time.perf_counter()
+print(json.dumps({'import': imported - started, 'ready': ready - started, 'status': status, 'deferred': deferred}))
+"""
+
+# Loaded by create_app or on first use, never by importing the app module
+DEFERRED_MODULES = ['dash', 'plotly', 'sqlalchemy', 'aiohttp', 'yfinance']
+
+@benchmark('startup')
+def bench_startup(args) -> List[dict]:
+    from config import STARTUP_IMPORT_BUDGET, STARTUP_READY_BUDGET
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    samples = []
+    # The first run warms the OS file cache and creates the database
+    for _ in range(args.repeat + 1):
+        completed = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT % DEFERRED_MODULES], cwd=root,
+                                   capture_output=True, text=True, check=True)
+        sample = json.loads(completed.stdout.strip().splitlines()[-1])
+        if sample['status'] != 200:
+            raise RuntimeError(f"First request after startup returned {sample['status']}")
+        samples.append(sample)
+    samples = samples[1:]
+    eager = sorted({name for name in DEFERRED_MODULES if any(name not in sample['deferred'] for sample in samples)})
+    return [
+        result('startup.import', {}, summarize([sample['import'] for sample in samples]),
+               budget=STARTUP_IMPORT_BUDGET, eager_modules=eager),
+        result('startup.ready', {}, summarize([sample['ready'] for sample in samples]), budget=STARTUP_READY_BUDGET),
+    ]
+
+@benchmark('e2e')
+def bench_e2e(args) -> List[dict]:
+    from dash import Patch
+    from dash._callback_context import context_value
+    from dash._utils import AttributeDict
+    from plotly.io.json import to_json_plotly
+    import app
+    from ui.callbacks import update_multi_stock_graph
+
+    stub = StubFetcher(args.rows, args.latency)
+    app.range_cache.fetcher = stub
+    end = synthetic_ohlcv(args.rows).index[-1]
+    start_date = (end - pd.Timedelta(days=365)).strftime('%Y-%m-%d')
+    end_date = end.strftime('%Y-%m-%d')
+    tickers = ",".join(f"SYN{i:04d}" for i in range(args.plot_tickers))
+    params = {'rows': args.rows, 'tickers': args.plot_tickers, 'latency': args.latency, 'width': args.width}
+
+    def call(ticker_list: str, trigger: str = 'graph-size.data', indicators: List[str] = UI_INDICATORS,
+             state: Optional[dict] = None):
+        context_value.set(AttributeDict(triggered_inputs=[{'prop_id': trigger, 'value': None}]))
+        fig, error, state = update_multi_stock_graph({'width': args.width}, None, indicators, 1, ticker_list,
+                                                     start_date, end_date, state)
+        if error:
+            raise RuntimeError(error)
+        return fig, state
+
+    def payload(fig) -> int:
+        return len(to_json_plotly(fig.to_plotly_json() if isinstance(fig, Patch) else fig))
+
+    generation = iter(range(10 ** 6))
+    cold_tickers = {}
+
+    def new_tickers():
+        # Unseen ticker names, so nothing is cached in memory, on disk or in the database
+        n = next(generation)
+        cold_tickers['value'] = ",".join(f"C{n:05d}{i:03d}" for i in range(args.plot_tickers))
+
+    # Figures to patch: one ticker fewer, and one indicator fewer
+    _, fewer_tickers = call(tickers.rsplit(',', 1)[0])
+    _, fewer_indicators = call(tickers, indicators=UI_INDICATORS[:-1])
+    add_ticker = lambda: call(tickers, state=fewer_tickers)[0]
+    add_indicator = lambda: call(tickers, 'indicators-checklist.value', state=fewer_indicators)[0]
+
+    # The same query through the Flask route, answered from the response cache after the first call
+    client = app.app.server.test_client()
+    request_body = {
+        'output': '..multi-stock-graph.figure...error-message.children...figure-state.data..',
+        'outputs': [{'id': 'multi-stock-graph', 'property': 'figure'}, {'id': 'error-message', 'property': 'children'},
+                    {'id': 'figure-state', 'property': 'data'}],
+        'inputs': [{'id': 'graph-size', 'property': 'data', 'value': {'width': args.width}},
+                   {'id': 'multi-stock-graph', 'property': 'relayoutData', 'value': None},
+                   {'id': 'indicators-checklist', 'property': 'value', 'value': UI_INDICATORS}],
+        'changedPropIds': ['graph-size.data'],
+        'state': [{'id': 'fetch-data-button', 'property': 'n_clicks', 'value': 1},
+                  {'id': 'ticker-input', 'property': 'value', 'value': tickers},
+                  {'id': 'date-picker-range', 'property': 'start_date', 'value': start_date},
+                  {'id': 'date-picker-range', 'property': 'end_date', 'value': end_date},
+                  {'id': 'figure-state', 'property': 'data', 'value': None}],
+    }
+    cached_request = lambda: client.post('/_dash-update-component', json=request_body, headers={'Accept-Encoding': 'gzip'})
+
+    results = [
+        result('e2e.update_multi_stock_graph.cold', params,
+               measure(lambda: call(cold_tickers['value']), args.repeat, setup=new_tickers)),
+        result('e2e.update_multi_stock_graph.warm', params, measure(lambda: call(tickers), args.repeat),
+               bytes=payload(call(tickers)[0])),
+        result('e2e.update_multi_stock_graph.add_ticker', params, measure(add_ticker, args.repeat),
+               bytes=payload(add_ticker())),
+        result('e2e.update_multi_stock_graph.add_indicator', params, measure(add_indicator, args.repeat),
+               bytes=payload(add_indicator())),
+        result('e2e.figure_request.cached', params, measure(cached_request, args.repeat),
+               bytes=len(cached_request().data)),
+    ]
+    app.runtime.close()
+    return results
+
+def metadata(args) -> dict:
+    try:
+        revision = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                  cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        revision = None
+    return {
+        'timestamp': pd.Timestamp.now(tz='UTC').isoformat(),
+        'git_revision': revision,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'args': vars(args),
+    }
+
+def compare(results: List[dict], baseline_path: str) -> List[dict]:
+    """Ratio of each median to the same benchmark (name and params) in a previous results file."""
+    with open(baseline_path) as f:
+        baseline = {(r['name'], json.dumps(r['params'], sort_keys=True)): r for r in json.load(f)['results']}
+    rows = []
+    for r in results:
+        previous = baseline.get((r['name'], json.dumps(r['params'], sort_keys=True)))
+        if previous is None:
+            continue
+        ratio = r['seconds']['median'] / previous['seconds']['median'] if previous['seconds']['median'] else None
+        rows.append({'name': r['name'], 'params': r['params'], 'baseline': previous['seconds']['median'],
+                     'current': r['seconds']['median'], 'ratio': ratio})
+    return rows
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=5000, help="Bars per synthetic ticker")
+    parser.add_argument('--tickers', type=int, default=100, help="Tickers for panel, warmup, backtest and fetch benchmarks")
+    parser.add_argument('--plot-tickers', type=int, default=3, help="Tickers per figure")
+    parser.add_argument('--width', type=int, default=1200, help="Graph width in pixels for downsampled figures")
+    parser.add_argument('--latency', type=float, default=0.01, help="Stub upstream latency in seconds")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--only', nargs='*', choices=list(BENCHMARKS), help="Benchmark groups to run")
+    parser.add_argument('--output', help="Write JSON results here instead of stdout")
+    parser.add_argument('--compare', help="Previous results file to compare medians against")
+    parser.add_argument('--fail-above', type=float, help="Exit with status 1 if any median ratio exceeds this")
+    args = parser.parse_args(argv)
+
+    results = []
+    try:
+        for name in args.only or BENCHMARKS:
+            print(f"Running {name} benchmarks...", file=sys.stderr)
+            results.extend(BENCHMARKS[name](args))
+    finally:
+        shutil.rmtree(SCRATCH_DIR, ignore_errors=True)
+
+    report = {'meta': metadata(args), 'results': results}
+    status = 0
+    # Benchmarks with a budget fail the run when their median exceeds it
+    for r in results:
+        budget = r['extra'].get('budget')
+        if budget is not None and r['seconds']['median'] > budget:
+            print(f"{r['name']} over budget: {r['seconds']['median']:.3f}s > {budget:.3f}s", file=sys.stderr)
+            status = 1
+        if r['extra'].get('eager_modules'):
+            print(f"{r['name']} imports {', '.join(r['extra']['eager_modules'])} eagerly", file=sys.stderr)
+            status = 1
+    if args.compare:
+        report['comparison'] = compare(results, args.compare)
+        for row in report['comparison']:
+            print(f"{row['name']:<45} {row['baseline']:.6f}s -> {row['current']:.6f}s  x{row['ratio']:.2f}", file=sys.stderr)
+        if args.fail_above and any(row['ratio'] and row['ratio'] > args.fail_above for row in report['comparison']):
+            status = 1
+
+    encoded = json.dumps(report, indent=2, default=str)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(encoded)
+    else:
+        print(encoded)
+    return status
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,27 @@
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from config import MARKET_TIMEZONE
+
+def synthetic_ohlcv(rows: int, seed: int = 0, start: str = '2000-01-03', tz: str = MARKET_TIMEZONE) -> pd.DataFrame:
+    """
+    Daily OHLCV bars following a geometric random walk, shaped like yfinance history.
+
+    The same `rows` and `seed` always give the same frame, so results are comparable
+    between runs and versions.
+    """
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.02, rows)))
+    open_ = close * np.exp(rng.normal(0, 0.005, rows))
+    spread = np.abs(rng.normal(0, 0.01, rows))
+    high = np.maximum(open_, close) * (1 + spread)
+    low = np.minimum(open_, close) * (1 - spread)
+    volume = rng.integers(100_000, 10_000_000, rows)
+    index = pd.bdate_range(start, periods=rows, tz=tz)
+    return pd.DataFrame({'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Volume': volume}, index=index)
+
+def synthetic_universe(tickers: int, rows: int, seed: int = 0) -> Dict[str, pd.DataFrame]:
+    """`tickers` synthetic histories named SYN0000, SYN0001, ..., each seeded differently."""
+    return {f"SYN{i:04d}": synthetic_ohlcv(rows, seed + i) for i in range(tickers)}
@@ -11,8 +11,92 @@ ALPHA_VANTAGE_API_KEY = os.getenv("ALPHA_VANTAGE_API_KEY", None)
 FINNHUB_API_KEY = os.getenv("FINNHUB_API_KEY", None)
 
 # Cache Settings
-CACHE_DIR = 'cache-directory'
+CACHE_DIR = os.getenv("CACHE_DIR", 'cache-directory')
 CACHE_TIMEOUT = 60 * 60  # 1 hour in seconds
+MEMORY_CACHE_MAX_BYTES = int(os.getenv("MEMORY_CACHE_MAX_BYTES", 256 * 1024 * 1024))  # In-process tier in front of the on-disk stores
+MEMORY_PRECISION = os.getenv("MEMORY_PRECISION", "float32")  # Float dtype of cached indicator values (prices are always float64); "float64" keeps full precision
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", 64 * 1024 * 1024))  # Serialized figure responses
+RESPONSE_CACHE_COMPRESS_LEVEL = 6  # gzip level of cached responses; 0 stores them uncompressed
 
 # Database Configuration
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///stocker.db")
\ No newline at end of file
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///stocker.db")
+
+# Fetcher Settings
+FETCH_MAX_WORKERS = int(os.getenv("FETCH_MAX_WORKERS", 32))  # Threads for blocking yfinance calls
+FETCH_MAX_CONCURRENCY = int(os.getenv("FETCH_MAX_CONCURRENCY", 16))  # In-flight upstream requests
+FETCH_TIMEOUT = 30  # Per-ticker timeout in seconds
+FETCH_REQUEST_TIMEOUT = FETCH_TIMEOUT * 2  # Seconds a web request waits on its fetches (AsyncRuntime.run) before cancelling them
+FETCH_RETRIES = 2
+FETCH_BACKOFF = 0.5  # Base delay in seconds, doubled on each retry
+FETCH_BATCH_SIZE = 100  # Tickers per yf.download call; 0 disables batch downloads
+FETCH_BATCH_TIMEOUT = 120
+FETCH_PROVIDERS = os.getenv("FETCH_PROVIDERS", "yahoo,polygon,finnhub,alpha_vantage").split(",")  # In order of preference; unconfigured ones are skipped
+FETCH_HEDGE_ENABLED = True  # Ask the next provider when one is slower than its p95 latency
+FETCH_HEDGE_MIN_SAMPLES = 20  # Latencies needed before a provider's p95 is trusted
+FETCH_HEDGE_DEFAULT_DELAY = 2.0  # Hedge delay in seconds until then
+FETCH_LATENCY_WINDOW = 200  # Recent latencies kept per provider
+FETCH_FAILOVER_THRESHOLD = 3  # Consecutive failures before a provider is tried last
+
+# Processing Settings
+# Processes computing indicators for persistence; 0 runs them on a background thread. Every web worker
+# has its own pool writing to the database, so give one process per deployment a pool and 0 to the rest.
+# SQLite takes one writer at a time, so it defaults to 0 there: each web worker then persists on one
+# core of its own. That is the trade-off for not contending for the database lock. Refreshes only
+# process their new bars (see data.processing_pool), so it rarely matters. Use a server database for
+# more persistence cores; backtests and the frame publisher use BATCH_WORKERS cores either way.
+PROCESS_WORKERS = int(os.getenv("PROCESS_WORKERS", 0 if DATABASE_URL.startswith("sqlite") else 2))
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", os.cpu_count() or 1))  # Processes of the backtest runner and frame publisher; the publisher's also persist the bars it refreshes
+PROCESS_CHUNK_SIZE = 8  # Tickers per task in bulk processing
+
+# Screener Settings
+SCREENER_DEFAULT_LIMIT = 50  # Rows a screen returns unless asked for more
+SCREENER_MAX_LIMIT = 1000
+
+# Backtest Settings
+BACKTEST_COST = 0.0005  # Fraction of position value paid per unit traded (5 bps)
+BACKTEST_PERIODS_PER_YEAR = 252  # Bars per year, for annualized Sharpe ratios
+BACKTEST_COMBO_CHUNK = 256  # Parameter combinations evaluated at once per ticker
+
+# HTTP Settings (shared aiohttp session)
+HTTP_CONNECTION_LIMIT = 100  # Pooled connections across all hosts
+HTTP_CONNECTION_LIMIT_PER_HOST = 20
+HTTP_TIMEOUT = 30  # Total seconds per request
+
+# Price Store Settings
+PRICE_STORE_DIR = os.getenv("PRICE_STORE_DIR", "price-store")
+RANGE_REFRESH_DAYS = 3  # Trailing days refetched once a ticker's cached range is older than CACHE_TIMEOUT
+
+# Shared Frame Settings
+SHARED_FRAMES_DIR = os.getenv("SHARED_FRAMES_DIR", None)  # Processed frames published by `python -m data.frame_publisher`; off without it
+SHARED_FRAMES_INTERVAL = float(os.getenv("SHARED_FRAMES_INTERVAL", 30))  # Seconds between the publisher's checks for changed tickers
+
+# Refresh Scheduler Settings
+# Warm the universe and refresh it after each market close, in one process per deployment. With
+# SHARED_FRAMES_DIR set, web workers never run it: data.frame_publisher does, unless given --no-refresh
+REFRESH_SCHEDULER_ENABLED = os.getenv("REFRESH_SCHEDULER_ENABLED", "1") == "1"
+REFRESH_RATE_LIMIT = 2.0  # Upstream requests per second
+REFRESH_POLL_INTERVAL = 5 * 60  # Seconds between checks for newly requested or stale tickers
+REFRESH_HISTORY_DAYS = 365  # History fetched for tickers that aren't stored yet
+MARKET_TIMEZONE = "America/New_York"
+MARKET_CLOSE = "16:00"
+MARKET_CLOSE_DELAY = 30 * 60  # Seconds after the close before final daily bars are expected
+
+# Streaming Settings
+STREAM_REPLAY_FILE = os.getenv("STREAM_REPLAY_FILE", None)  # CSV of ticks or bars to replay; live mode is off without a source
+STREAM_REPLAY_SPEED = float(os.getenv("STREAM_REPLAY_SPEED", 1.0))  # 0 replays as fast as possible
+STREAM_BAR_SECONDS = 60
+STREAM_BUFFER_BARS = 390  # Bars kept per ticker (one regular session of minute bars)
+STREAM_PUSH_INTERVAL = 1000  # Milliseconds between graph updates in live mode
+
+# Plot Settings
+PLOT_DEFAULT_WIDTH = 1200  # Pixels assumed when the browser hasn't reported the graph width
+PLOT_TRACE_CACHE_BYTES = 64 * 1024 * 1024  # Per-ticker figure traces kept for patching and re-sending
+
+# Metrics Settings
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")  # Level of the stocker loggers; upstream failures are warnings, refresh and publish progress info
+LOG_FORMAT = "%(asctime)s [%(process)d] %(levelname)s %(name)s: %(message)s"  # The pid tells the gunicorn workers and the publisher apart
+PROFILE_DIR = os.getenv("PROFILE_DIR", None)  # Where per-request cProfile dumps go; profiling is off without it. Only covers the request thread, not its work on the AsyncRuntime loop
+
+# Startup Settings
+STARTUP_IMPORT_BUDGET = float(os.getenv("STARTUP_IMPORT_BUDGET", 1.0))  # Seconds to import the app module; checked by the startup benchmark
+STARTUP_READY_BUDGET = float(os.getenv("STARTUP_READY_BUDGET", 3.0))  # Seconds from import until the first request is served
@@ -0,0 +1,96 @@
+import asyncio
+import threading
+from concurrent.futures import Future, TimeoutError
+from typing import Awaitable, Optional, TypeVar
+
+import aiohttp
+
+from config import FETCH_REQUEST_TIMEOUT, HTTP_CONNECTION_LIMIT, HTTP_CONNECTION_LIMIT_PER_HOST, HTTP_TIMEOUT
+
+T = TypeVar('T')
+
+class AsyncRuntime:
+    """
+    A long-lived event loop on a daemon thread, shared by every request.
+
+    Synchronous code (Dash callbacks run on the server's worker threads) submits coroutines
+    with `run` or `submit` and waits on the returned future, instead of creating and leaking
+    an event loop per request. The runtime also owns one aiohttp ClientSession, so HTTP
+    fetchers reuse pooled keep-alive connections across requests.
+    """
+
+    def __init__(self, connection_limit: int = HTTP_CONNECTION_LIMIT,
+                 connection_limit_per_host: int = HTTP_CONNECTION_LIMIT_PER_HOST, timeout: float = HTTP_TIMEOUT):
+        self.connection_limit = connection_limit
+        self.connection_limit_per_host = connection_limit_per_host
+        self.timeout = timeout
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """The runtime's loop, started on first use."""
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                started = threading.Event()
+                self._thread = threading.Thread(target=self._run, args=(loop, started), name="async-runtime", daemon=True)
+                self._thread.start()
+                started.wait()
+                self._loop = loop
+            return self._loop
+
+    @staticmethod
+    def _run(loop: asyncio.AbstractEventLoop, started: threading.Event):
+        asyncio.set_event_loop(loop)
+        loop.call_soon(started.set)
+        loop.run_forever()
+
+    def submit(self, coro: Awaitable[T]) -> 'Future[T]':
+        """Schedule `coro` on the runtime's loop from any other thread."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Awaitable[T], timeout: Optional[float] = FETCH_REQUEST_TIMEOUT) -> T:
+        """
+        Run `coro` on the runtime's loop and block the calling thread until it finishes.
+
+        After `timeout` seconds (None waits forever) `coro` is cancelled and TimeoutError is
+        raised, so a hung upstream can't hold the caller's thread indefinitely.
+        """
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    async def session(self) -> aiohttp.ClientSession:
+        """The shared ClientSession. Must be awaited on the runtime's loop."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.connection_limit, limit_per_host=self.connection_limit_per_host,
+                                             ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(connector=connector,
+                                                  timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self._session
+
+    async def _shutdown(self):
+        # Long-running work such as stream consumers is cancelled rather than abandoned
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    def close(self):
+        """Cancel outstanding work, close the session and stop the loop."""
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._shutdown(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        self._thread.join()
+        loop.close()
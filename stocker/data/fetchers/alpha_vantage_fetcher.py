@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+from .base_fetcher import normalize_bars
+from .http_fetcher import HTTPFetcher
+
+class AlphaVantageFetcher(HTTPFetcher):
+    """
+    Daily adjusted time series from Alpha Vantage.
+
+    Bars are adjusted like Yahoo's and Polygon's, which they are merged with: prices are
+    scaled by each day's adjusted-close factor (splits and dividends) and volumes by the
+    splits that happened after the day.
+    """
+
+    provider = 'alpha_vantage'
+    base_url = 'https://www.alphavantage.co'
+
+    def _request(self, ticker: str, start_date: str, end_date: str):
+        # The API has no date range; the compact series only covers the last 100 days
+        days = (pd.Timestamp.today() - pd.Timestamp(start_date)).days
+        outputsize = 'compact' if days < 100 else 'full'
+        return "/query", {'function': 'TIME_SERIES_DAILY_ADJUSTED', 'symbol': ticker, 'outputsize': outputsize,
+                          'apikey': self.api_key}
+
+    def _parse(self, payload, start_date: str, end_date: str) -> pd.DataFrame:
+        series = payload.get('Time Series (Daily)')
+        if series is None:
+            # Errors and rate-limit notices come back as 200s with a message
+            raise ValueError(payload.get('Error Message') or payload.get('Note') or payload.get('Information') or 'no time series')
+        bars = pd.DataFrame.from_dict(series, orient='index')
+        if bars.empty:
+            return pd.DataFrame()
+        bars = bars.apply(pd.to_numeric, errors='coerce').sort_index()
+        factor = bars['5. adjusted close'] / bars['4. close']
+        # A split on a day applies to the volumes of the days before it
+        splits = bars['8. split coefficient'].fillna(1.0).replace(0.0, 1.0).to_numpy()
+        split_factor = np.append(np.cumprod(splits[::-1])[::-1][1:], 1.0)
+        return normalize_bars(bars.index, bars['1. open'] * factor, bars['2. high'] * factor, bars['3. low'] * factor,
+                              bars['5. adjusted close'], (bars['6. volume'] * split_factor).round(), start_date, end_date)
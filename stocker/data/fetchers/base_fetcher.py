@@ -1,7 +1,46 @@
 from abc import ABC, abstractmethod
+import numpy as np
 import pandas as pd
+from config import MARKET_TIMEZONE
+
+# Columns every fetcher returns
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
 
 class BaseFetcher(ABC):
+    # Provider label used in metrics
+    provider: str = 'unknown'
+
     @abstractmethod
     async def fetch_data(self, ticker: str, start_date: str, end_date: str) -> pd.DataFrame:
-        pass
\ No newline at end of file
+        pass
+
+def normalize_bars(dates, open_, high, low, close, volume, start_date: str = None, end_date: str = None) -> pd.DataFrame:
+    """
+    Build a daily OHLCV frame in the schema yfinance returns.
+
+    `dates` are the trading days (anything pd.to_datetime accepts, tz-naive or not); the index
+    becomes exchange-local midnight in MARKET_TIMEZONE, sorted, restricted to
+    [start_date, end_date) like yfinance's start/end.
+    """
+    index = pd.DatetimeIndex(pd.to_datetime(dates))
+    if index.tz is not None:
+        index = index.tz_convert(MARKET_TIMEZONE).tz_localize(None)
+    index = index.normalize().tz_localize(MARKET_TIMEZONE)
+    def column(values) -> np.ndarray:
+        # Positional, so inputs indexed differently from `dates` aren't realigned
+        return pd.to_numeric(np.asarray(values), errors='coerce').astype(np.float64)
+
+    df = pd.DataFrame({
+        'Open': column(open_),
+        'High': column(high),
+        'Low': column(low),
+        'Close': column(close),
+        'Volume': column(volume),
+    }, index=index).sort_index()
+    df = df[~df.index.duplicated(keep='last')]
+    if start_date is not None:
+        df = df[df.index >= pd.Timestamp(start_date).tz_localize(MARKET_TIMEZONE)]
+    if end_date is not None:
+        df = df[df.index < pd.Timestamp(end_date).tz_localize(MARKET_TIMEZONE)]
+    df['Volume'] = df['Volume'].fillna(0).astype('int64')
+    return df
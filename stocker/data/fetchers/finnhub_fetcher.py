@@ -0,0 +1,24 @@
+import pandas as pd
+from .base_fetcher import normalize_bars
+from .http_fetcher import HTTPFetcher
+
+class FinnhubFetcher(HTTPFetcher):
+    """Daily candles from Finnhub."""
+
+    provider = 'finnhub'
+    base_url = 'https://finnhub.io'
+
+    def _request(self, ticker: str, start_date: str, end_date: str):
+        start = int(pd.Timestamp(start_date, tz='UTC').timestamp())
+        end = int(pd.Timestamp(end_date, tz='UTC').timestamp())
+        return "/api/v1/stock/candle", {'symbol': ticker, 'resolution': 'D', 'from': start, 'to': end, 'token': self.api_key}
+
+    def _parse(self, payload, start_date: str, end_date: str) -> pd.DataFrame:
+        if payload.get('s') == 'no_data':
+            return pd.DataFrame()
+        if payload.get('s') != 'ok':
+            raise ValueError(payload.get('error') or f"status {payload.get('s')}")
+        # Daily candles are stamped at midnight UTC of the trading day
+        dates = pd.to_datetime(payload['t'], unit='s')
+        return normalize_bars(dates, payload['o'], payload['h'], payload['l'], payload['c'], payload['v'],
+                              start_date, end_date)
@@ -0,0 +1,77 @@
+import asyncio
+import logging
+from abc import abstractmethod
+from typing import Optional
+
+import aiohttp
+import pandas as pd
+
+from config import FETCH_RETRIES, FETCH_BACKOFF
+from data.async_runtime import AsyncRuntime
+from metrics import METRICS
+from .base_fetcher import BaseFetcher
+
+logger = logging.getLogger(__name__)
+
+class HTTPFetcher(BaseFetcher):
+    """
+    Base class for providers with a JSON-over-HTTP API.
+
+    Requests go through the runtime's shared aiohttp session, so every provider draws from
+    one pool of keep-alive connections, and must therefore be awaited on the runtime's loop.
+    Subclasses build the request in `_request` and turn the JSON payload into OHLCV bars
+    with `normalize_bars` in `_parse`. `base_url` can point at a local stub server.
+    """
+
+    base_url: str = ''
+
+    def __init__(self, api_key: Optional[str], runtime: AsyncRuntime, base_url: Optional[str] = None,
+                 retries: int = FETCH_RETRIES, backoff: float = FETCH_BACKOFF):
+        self.api_key = api_key
+        self.runtime = runtime
+        if base_url is not None:
+            self.base_url = base_url
+        self.retries = retries
+        self.backoff = backoff
+
+    @abstractmethod
+    def _request(self, ticker: str, start_date: str, end_date: str):
+        """Return (path, query params) for the daily bars of `ticker`."""
+
+    @abstractmethod
+    def _parse(self, payload, start_date: str, end_date: str) -> pd.DataFrame:
+        """Turn the JSON payload into a frame from `normalize_bars`; raise ValueError on API errors."""
+
+    async def _get_json(self, path: str, params: dict):
+        session = await self.runtime.session()
+        for attempt in range(self.retries + 1):
+            try:
+                async with session.get(self.base_url + path, params=params) as response:
+                    # Client errors (bad key, unknown ticker) won't get better on retry
+                    if 400 <= response.status < 500 and response.status != 429:
+                        raise ValueError(f"HTTP {response.status}: {await response.text()}")
+                    response.raise_for_status()
+                    return await response.json(content_type=None)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if attempt == self.retries:
+                    raise
+                METRICS.inc('stocker_upstream_retries_total', provider=self.provider)
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+
+    async def fetch_data(self, ticker: str, start_date: str, end_date: str) -> pd.DataFrame:
+        try:
+            path, params = self._request(ticker, start_date, end_date)
+            with METRICS.span('upstream_request', provider=self.provider):
+                payload = await self._get_json(path, params)
+            with METRICS.span('upstream_parse', provider=self.provider):
+                data = self._parse(payload, start_date, end_date)
+            if data.empty:
+                raise ValueError(f"No data found for ticker '{ticker}'.")
+            METRICS.inc('stocker_upstream_requests_total', provider=self.provider, outcome='ok')
+            return data
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            METRICS.inc('stocker_upstream_requests_total', provider=self.provider, outcome=type(e).__name__)
+            logger.warning("Error fetching data from %s for %s: %r", type(self).__name__, ticker, e)
+            return pd.DataFrame()
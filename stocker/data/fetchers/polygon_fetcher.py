@@ -0,0 +1,22 @@
+import pandas as pd
+from .base_fetcher import normalize_bars
+from .http_fetcher import HTTPFetcher
+
+class PolygonFetcher(HTTPFetcher):
+    """Daily aggregates from Polygon.io."""
+
+    provider = 'polygon'
+    base_url = 'https://api.polygon.io'
+
+    def _request(self, ticker: str, start_date: str, end_date: str):
+        # Polygon's range includes the end date; ours doesn't, which normalize_bars takes care of
+        path = f"/v2/aggs/ticker/{ticker}/range/1/day/{start_date}/{end_date}"
+        return path, {'adjusted': 'true', 'sort': 'asc', 'limit': 50000, 'apiKey': self.api_key}
+
+    def _parse(self, payload, start_date: str, end_date: str) -> pd.DataFrame:
+        if payload.get('status') not in ('OK', 'DELAYED'):
+            raise ValueError(payload.get('error') or payload.get('message') or f"status {payload.get('status')}")
+        bars = pd.DataFrame(payload.get('results') or [], columns=['t', 'o', 'h', 'l', 'c', 'v'])
+        # Bars are stamped with the start of the trading day in exchange time, in epoch ms
+        return normalize_bars(pd.to_datetime(bars['t'], unit='ms', utc=True), bars['o'], bars['h'],
+                              bars['l'], bars['c'], bars['v'], start_date, end_date)
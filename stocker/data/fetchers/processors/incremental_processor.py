@@ -0,0 +1,379 @@
+import math
+from collections import deque
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .indicators import ALL_INDICATORS, DEFAULT_INDICATORS
+
+# Streaming versions of the pandas window aggregations used by process_stock_data. Each
+# kernel carries the exact running state of the corresponding routine in
+# pandas/_libs/window/aggregations.pyx (Kahan-compensated sums, Welford variance, the
+# repeated-value and sign corrections), so feeding a series through one in any number of
+# chunks produces the same bits as a single rolling()/ewm() call over the whole series.
+
+NaN = float('nan')
+
+def _prep(val: float) -> float:
+    # Window functions treat inf as missing.
+    return NaN if math.isinf(val) else val
+
+def _signbit(val: float) -> bool:
+    return math.copysign(1.0, val) < 0
+
+class _RollingMean:
+    def __init__(self, window: int):
+        self.window = window
+        self.values = deque(maxlen=window)
+        self.started = False
+        self.nobs = 0
+        self.neg_ct = 0
+        self.sum_x = 0.0
+        self.compensation_add = 0.0
+        self.compensation_remove = 0.0
+        self.num_consecutive_same_value = 0
+        self.prev_value = NaN
+
+    def _add(self, val: float):
+        if val == val:
+            self.nobs += 1
+            y = val - self.compensation_add
+            t = self.sum_x + y
+            self.compensation_add = t - self.sum_x - y
+            self.sum_x = t
+            if _signbit(val):
+                self.neg_ct += 1
+            if val == self.prev_value:
+                self.num_consecutive_same_value += 1
+            else:
+                self.num_consecutive_same_value = 1
+            self.prev_value = val
+
+    def _remove(self, val: float):
+        if val == val:
+            self.nobs -= 1
+            y = - val - self.compensation_remove
+            t = self.sum_x + y
+            self.compensation_remove = t - self.sum_x - y
+            self.sum_x = t
+            if _signbit(val):
+                self.neg_ct -= 1
+
+    def _result(self) -> float:
+        if self.nobs >= self.window and self.nobs > 0:
+            result = self.sum_x / self.nobs
+            if self.num_consecutive_same_value >= self.nobs:
+                result = self.prev_value
+            elif self.neg_ct == 0 and result < 0:
+                result = 0.0
+            elif self.neg_ct == self.nobs and result > 0:
+                result = 0.0
+            return result
+        return NaN
+
+    def _step(self, val: float):
+        if not self.started:
+            self.prev_value = val
+            self.started = True
+        if len(self.values) == self.window:
+            self._remove(self.values[0])
+        self.values.append(val)
+        self._add(val)
+
+    def update(self, values: np.ndarray) -> np.ndarray:
+        output = np.empty(len(values), dtype=np.float64)
+        for i, val in enumerate(values.tolist()):
+            self._step(_prep(val))
+            output[i] = self._result()
+        return output
+
+class _RollingSum(_RollingMean):
+    def _result(self) -> float:
+        if self.nobs >= self.window:
+            if self.num_consecutive_same_value >= self.nobs:
+                return self.prev_value * self.nobs
+            return self.sum_x
+        return NaN
+
+class _RollingStd:
+    def __init__(self, window: int, ddof: int = 1):
+        self.window = window
+        self.ddof = ddof
+        self.values = deque(maxlen=window)
+        self.started = False
+        self.nobs = 0.0
+        self.mean_x = 0.0
+        self.ssqdm_x = 0.0
+        self.compensation_add = 0.0
+        self.compensation_remove = 0.0
+        self.num_consecutive_same_value = 0
+        self.prev_value = NaN
+
+    def _add(self, val: float):
+        if val != val:
+            return
+        self.nobs += 1
+        if val == self.prev_value:
+            self.num_consecutive_same_value += 1
+        else:
+            self.num_consecutive_same_value = 1
+        self.prev_value = val
+
+        prev_mean = self.mean_x - self.compensation_add
+        y = val - self.compensation_add
+        t = y - self.mean_x
+        self.compensation_add = t + self.mean_x - y
+        self.mean_x = self.mean_x + t / self.nobs
+        self.ssqdm_x = self.ssqdm_x + (val - prev_mean) * (val - self.mean_x)
+
+    def _remove(self, val: float):
+        if val == val:
+            self.nobs -= 1
+            if self.nobs:
+                prev_mean = self.mean_x - self.compensation_remove
+                y = val - self.compensation_remove
+                t = y - self.mean_x
+                self.compensation_remove = t + self.mean_x - y
+                self.mean_x = self.mean_x - t / self.nobs
+                self.ssqdm_x = self.ssqdm_x - (val - prev_mean) * (val - self.mean_x)
+            else:
+                self.mean_x = 0.0
+                self.ssqdm_x = 0.0
+
+    def _result(self) -> float:
+        if self.nobs >= max(self.window, 1) and self.nobs > self.ddof:
+            if self.nobs == 1 or self.num_consecutive_same_value >= self.nobs:
+                return 0.0
+            var = self.ssqdm_x / (self.nobs - self.ddof)
+            return math.sqrt(var) if var >= 0 else 0.0
+        return NaN
+
+    def update(self, values: np.ndarray) -> np.ndarray:
+        output = np.empty(len(values), dtype=np.float64)
+        for i, val in enumerate(values.tolist()):
+            val = _prep(val)
+            if not self.started:
+                self.prev_value = val
+                self.started = True
+            if len(self.values) == self.window:
+                self._remove(self.values[0])
+            self.values.append(val)
+            self._add(val)
+            output[i] = self._result()
+        return output
+
+class _RollingExtreme:
+    def __init__(self, window: int, is_max: bool):
+        self.window = window
+        self.is_max = is_max
+        self.values = deque(maxlen=window)
+
+    def update(self, values: np.ndarray) -> np.ndarray:
+        output = np.empty(len(values), dtype=np.float64)
+        for i, val in enumerate(values.tolist()):
+            self.values.append(_prep(val))
+            best = None
+            nobs = 0
+            for v in self.values:
+                if v != v:
+                    continue
+                nobs += 1
+                # Ties go to the most recent value, as in the pandas deque algorithm.
+                if best is None or (v >= best if self.is_max else v <= best):
+                    best = v
+            output[i] = best if nobs >= self.window else NaN
+        return output
+
+class _EWMMean:
+    def __init__(self, span: int):
+        com = (span - 1) / 2
+        alpha = 1. / (1. + com)
+        self.old_wt_factor = 1. - alpha
+        self.new_wt = alpha
+        self.started = False
+        self.weighted = NaN
+        self.old_wt = 1.
+        self.nobs = 0
+
+    def update(self, values: np.ndarray) -> np.ndarray:
+        output = np.empty(len(values), dtype=np.float64)
+        for i, cur in enumerate(values.tolist()):
+            cur = _prep(cur)
+            is_observation = cur == cur
+            self.nobs += is_observation
+            if not self.started:
+                self.weighted = cur
+                self.old_wt = 1.
+                self.started = True
+            elif self.weighted == self.weighted:
+                self.old_wt *= self.old_wt_factor
+                if is_observation:
+                    if self.weighted != cur:
+                        self.weighted = self.old_wt * self.weighted + self.new_wt * cur
+                        self.weighted /= (self.old_wt + self.new_wt)
+                    self.old_wt = 1.
+            elif is_observation:
+                self.weighted = cur
+            output[i] = self.weighted if self.nobs >= 1 else NaN
+        return output
+
+class _CumSum:
+    def __init__(self):
+        self.total = 0.0
+
+    def update(self, values: np.ndarray) -> np.ndarray:
+        output = np.cumsum(np.concatenate(([self.total], values)))[1:]
+        if len(output):
+            self.total = float(output[-1])
+        return output
+
+class IncrementalProcessor:
+    """
+    Append-only equivalent of process_stock_data for a single ticker.
+
+    The processor keeps the running state of every rolling and exponentially weighted
+    indicator, so each call to `update` only computes the rows it is given. Feeding a
+    ticker's history through `update` in one or many chunks yields exactly the same values
+    as process_stock_data over the concatenated history.
+
+    Rows must be appended in index order. Processors are picklable, so the state can be
+    persisted next to the processed data.
+
+    Like process_stock_data, only `indicators` (by default DEFAULT_INDICATORS) are returned;
+    intermediates such as stddev_20 and TR are kept as state either way.
+    """
+
+    def __init__(self, indicators: Optional[List[str]] = None):
+        indicators = DEFAULT_INDICATORS if indicators is None else indicators
+        unknown = [name for name in indicators if name not in ALL_INDICATORS]
+        if unknown:
+            raise ValueError(f"Unknown indicator '{unknown[0]}'. Available: {', '.join(ALL_INDICATORS)}")
+        self.indicators = [name for name in ALL_INDICATORS if name in indicators]
+        self.last_index = None
+        self.prev_close = NaN
+        self.prev_raw_money_flow = NaN
+        self.sma_20 = _RollingMean(20)
+        self.sma_50 = _RollingMean(50)
+        self.ema_12 = _EWMMean(12)
+        self.ema_26 = _EWMMean(26)
+        self.gain_14 = _RollingMean(14)
+        self.loss_14 = _RollingMean(14)
+        self.stddev_20 = _RollingStd(20)
+        self.signal_line = _EWMMean(9)
+        self.obv = _CumSum()
+        self.low_14 = _RollingExtreme(14, is_max=False)
+        self.high_14 = _RollingExtreme(14, is_max=True)
+        self.percent_d = _RollingMean(3)
+        self.atr = _RollingMean(14)
+        self.tp_mean_20 = _RollingMean(20)
+        self.tp_std_20 = _RollingStd(20)
+        self.flow_positive_14 = _RollingSum(14)
+        self.flow_negative_14 = _RollingSum(14)
+
+    def update_arrays(self, close: np.ndarray, high: np.ndarray, low: np.ndarray,
+                      volume: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Compute indicators for new bars given as arrays, without building a DataFrame.
+
+        Returns the arrays of the processor's indicators keyed by column, in process_stock_data
+        order. This is the cheap path for streaming one bar at a time; `update` wraps it for frames.
+        """
+        close = np.asarray(close, dtype=np.float64)
+        high = np.asarray(high, dtype=np.float64)
+        low = np.asarray(low, dtype=np.float64)
+        volume = np.asarray(volume)
+        if not len(close):
+            return {}
+        prev_close = np.concatenate(([self.prev_close], close[:-1]))
+        out = {}
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            out['SMA_20'] = sma_20 = self.sma_20.update(close)
+            out['SMA_50'] = self.sma_50.update(close)
+
+            out['EMA_12'] = ema_12 = self.ema_12.update(close)
+            out['EMA_26'] = ema_26 = self.ema_26.update(close)
+
+            delta = close - prev_close
+            gain = self.gain_14.update(np.where(delta > 0, delta, 0.0))
+            loss = self.loss_14.update(-np.where(delta < 0, delta, 0.0))
+            rs = gain / np.where((loss == 0) | np.isnan(loss), 1e-8, loss)
+            out['RSI'] = 100 - (100 / (1 + rs))
+
+            out['stddev_20'] = stddev_20 = self.stddev_20.update(close)
+            out['Upper_BB'] = sma_20 + (stddev_20 * 2)
+            out['Lower_BB'] = sma_20 - (stddev_20 * 2)
+
+            out['MACD'] = macd = ema_12 - ema_26
+            out['Signal_Line'] = self.signal_line.update(macd)
+
+            signed_volume = np.sign(delta) * volume
+            out['OBV'] = self.obv.update(np.where(np.isnan(signed_volume), 0.0, signed_volume))
+
+            low_14 = self.low_14.update(low)
+            high_14 = self.high_14.update(high)
+            out['%K'] = percent_k = 100 * ((close - low_14) / (high_14 - low_14 + 1e-8))
+            out['%D'] = self.percent_d.update(percent_k)
+
+            out['TR'] = tr = np.maximum(np.maximum(high - low, np.abs(high - prev_close)), np.abs(low - prev_close))
+            out['ATR'] = self.atr.update(tr)
+
+            tp = (high + low + close) / 3
+            out['CCI'] = (tp - self.tp_mean_20.update(tp)) / (0.015 * self.tp_std_20.update(tp))
+
+            raw_money_flow = tp * volume
+            prev_raw_money_flow = np.concatenate(([self.prev_raw_money_flow], raw_money_flow[:-1]))
+            flow_positive = np.where(raw_money_flow > prev_raw_money_flow, raw_money_flow, 0.0)
+            flow_negative = np.where(raw_money_flow < prev_raw_money_flow, raw_money_flow, 0.0)
+            negative_sum = self.flow_negative_14.update(flow_negative)
+            money_ratio = self.flow_positive_14.update(flow_positive) / np.where(
+                (negative_sum == 0) | np.isnan(negative_sum), 1e-8, negative_sum
+            )
+            out['MFI'] = 100 - (100 / (1 + money_ratio))
+
+            out['Williams_%R'] = -100 * ((high_14 - close) / (high_14 - low_14 + 1e-8))
+
+        self.prev_close = float(close[-1])
+        self.prev_raw_money_flow = float(raw_money_flow[-1])
+        return {column: out[column] for column in self.indicators}
+
+    def update(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Compute indicators for rows appended after everything seen so far.
+
+        Parameters:
+        df (pd.DataFrame): New rows with columns 'Close', 'High', 'Low', 'Volume'.
+
+        Returns:
+        pd.DataFrame: The new rows with the processor's indicator columns added.
+
+        Raises:
+        ValueError: If required columns are missing or the rows do not follow the previous ones.
+        """
+        if df.empty:
+            return df
+
+        required_columns = ['Close', 'High', 'Low', 'Volume']
+        if not all(col in df.columns for col in required_columns):
+            raise ValueError(f"Missing required columns in DataFrame: {', '.join(set(required_columns) - set(df.columns))}")
+        if self.last_index is not None and df.index[0] <= self.last_index:
+            raise ValueError(f"Rows must be appended after {self.last_index}, got {df.index[0]}.")
+
+        df = df.copy()
+        indicators = self.update_arrays(df['Close'].to_numpy(dtype=np.float64), df['High'].to_numpy(dtype=np.float64),
+                                        df['Low'].to_numpy(dtype=np.float64), df['Volume'].to_numpy())
+        for column, values in indicators.items():
+            df[column] = values
+        self.last_index = df.index[-1]
+        return df
+
+def process_stock_data_incremental(processed: Optional[pd.DataFrame], new_rows: pd.DataFrame,
+                                   processor: IncrementalProcessor) -> pd.DataFrame:
+    """Append `new_rows`, processed with `processor`, to an already processed frame."""
+    new_processed = processor.update(new_rows)
+    if processed is None or processed.empty:
+        return new_processed
+    if new_processed.empty:
+        return processed
+    return pd.concat([processed, new_processed])
@@ -0,0 +1,314 @@
+import threading
+from collections import ChainMap, OrderedDict
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config import MEMORY_PRECISION
+from data.storage.compact import restore, shrink
+from data.storage.single_flight import SingleFlight
+from metrics import METRICS
+
+class IndicatorSpec:
+    """A registered indicator: how to compute it, its parameters and what it depends on."""
+
+    def __init__(self, name: str, func: Callable, dependencies: Tuple[str, ...] = (), params: Optional[dict] = None):
+        self.name = name
+        self.func = func
+        self.dependencies = tuple(dependencies)
+        self.params = params or {}
+
+    @property
+    def key(self) -> Tuple:
+        return (self.name, tuple(sorted(self.params.items())))
+
+# Indicators in the order process_stock_data adds them. Names starting with '_' are
+# intermediates shared by several indicators and never returned.
+INDICATOR_REGISTRY: Dict[str, IndicatorSpec] = OrderedDict()
+
+# UI checklist entries that plot more than one column
+INDICATOR_GROUPS = {
+    'Bollinger_Bands': ['Upper_BB', 'Lower_BB'],
+    'MACD': ['MACD', 'Signal_Line'],
+    'Stochastic_Oscillator': ['%K', '%D'],
+}
+
+def register_indicator(name: str, dependencies: Tuple[str, ...] = (), **params):
+    """Register the decorated function as indicator `name`; it is called as func(data, **params)."""
+    def decorator(func: Callable) -> Callable:
+        INDICATOR_REGISTRY[name] = IndicatorSpec(name, func, dependencies, params)
+        return func
+    return decorator
+
+def _sma(data, window: int) -> pd.Series:
+    return data['Close'].rolling(window=window).mean()
+
+register_indicator('SMA_20', window=20)(_sma)
+register_indicator('SMA_50', window=50)(_sma)
+
+def _ema(data, span: int) -> pd.Series:
+    return data['Close'].ewm(span=span, adjust=False).mean()
+
+register_indicator('EMA_12', span=12)(_ema)
+register_indicator('EMA_26', span=26)(_ema)
+
+@register_indicator('RSI', window=14)
+def _rsi(data, window: int) -> pd.Series:
+    delta = data['Close'].diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window=window).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=window).mean()
+    rs = gain / loss.replace(0, np.nan).fillna(1e-8)  # Avoid division by zero
+    return 100 - (100 / (1 + rs))
+
+@register_indicator('stddev_20', window=20)
+def _stddev(data, window: int) -> pd.Series:
+    return data['Close'].rolling(window=window).std()
+
+@register_indicator('Upper_BB', dependencies=('SMA_20', 'stddev_20'), width=2)
+def _upper_bb(data, width: float) -> pd.Series:
+    return data['SMA_20'] + (data['stddev_20'] * width)
+
+@register_indicator('Lower_BB', dependencies=('SMA_20', 'stddev_20'), width=2)
+def _lower_bb(data, width: float) -> pd.Series:
+    return data['SMA_20'] - (data['stddev_20'] * width)
+
+@register_indicator('MACD', dependencies=('EMA_12', 'EMA_26'))
+def _macd(data) -> pd.Series:
+    return data['EMA_12'] - data['EMA_26']
+
+@register_indicator('Signal_Line', dependencies=('MACD',), span=9)
+def _signal_line(data, span: int) -> pd.Series:
+    return data['MACD'].ewm(span=span, adjust=False).mean()
+
+@register_indicator('OBV')
+def _obv(data) -> pd.Series:
+    return (np.sign(data['Close'].diff()) * data['Volume']).fillna(0).cumsum()
+
+@register_indicator('_low_14', window=14)
+def _rolling_low(data, window: int) -> pd.Series:
+    return data['Low'].rolling(window=window).min()
+
+@register_indicator('_high_14', window=14)
+def _rolling_high(data, window: int) -> pd.Series:
+    return data['High'].rolling(window=window).max()
+
+@register_indicator('%K', dependencies=('_low_14', '_high_14'))
+def _percent_k(data) -> pd.Series:
+    return 100 * ((data['Close'] - data['_low_14']) / (data['_high_14'] - data['_low_14'] + 1e-8))  # Avoid division by zero
+
+@register_indicator('%D', dependencies=('%K',), window=3)
+def _percent_d(data, window: int) -> pd.Series:
+    return data['%K'].rolling(window=window).mean()
+
+@register_indicator('TR')
+def _true_range(data) -> pd.Series:
+    # np.maximum only compares two arrays; a third positional argument is its `out` buffer
+    return np.maximum(np.maximum(data['High'] - data['Low'],
+                                 np.abs(data['High'] - data['Close'].shift(1))),
+                      np.abs(data['Low'] - data['Close'].shift(1)))
+
+@register_indicator('ATR', dependencies=('TR',), window=14)
+def _atr(data, window: int) -> pd.Series:
+    return data['TR'].rolling(window=window).mean()
+
+@register_indicator('_typical_price')
+def _typical_price(data) -> pd.Series:
+    return (data['High'] + data['Low'] + data['Close']) / 3
+
+@register_indicator('CCI', dependencies=('_typical_price',), window=20)
+def _cci(data, window: int) -> pd.Series:
+    tp = data['_typical_price']
+    return (tp - tp.rolling(window=window).mean()) / (0.015 * tp.rolling(window=window).std())
+
+@register_indicator('MFI', dependencies=('_typical_price',), window=14)
+def _mfi(data, window: int) -> pd.Series:
+    raw_money_flow = data['_typical_price'] * data['Volume']
+    flow_positive = raw_money_flow.where(raw_money_flow > raw_money_flow.shift(1), 0)
+    flow_negative = raw_money_flow.where(raw_money_flow < raw_money_flow.shift(1), 0)
+    money_ratio = flow_positive.rolling(window=window).sum() / flow_negative.rolling(window=window).sum().replace(0, np.nan).fillna(1e-8)
+    return 100 - (100 / (1 + money_ratio))
+
+@register_indicator('Williams_%R', dependencies=('_low_14', '_high_14'))
+def _williams_r(data) -> pd.Series:
+    return -100 * ((data['_high_14'] - data['Close']) / (data['_high_14'] - data['_low_14'] + 1e-8))
+
+ALL_INDICATORS = [name for name in INDICATOR_REGISTRY if not name.startswith('_')]
+
+# Indicators that mostly exist as inputs to others (Bollinger Bands, ATR). They are left out
+# of process_stock_data's default output and of memoization unless asked for.
+INTERMEDIATE_INDICATORS = ['stddev_20', 'TR']
+
+# What process_stock_data adds by default
+DEFAULT_INDICATORS = [name for name in ALL_INDICATORS if name not in INTERMEDIATE_INDICATORS]
+
+def is_intermediate(name: str) -> bool:
+    return name.startswith('_') or name in INTERMEDIATE_INDICATORS
+
+def expand_selection(selection: Iterable[str]) -> List[str]:
+    """Map UI checklist values (e.g. 'Bollinger_Bands') to indicator columns."""
+    columns = []
+    for name in selection or []:
+        for column in INDICATOR_GROUPS.get(name, [name]):
+            if column not in columns:
+                columns.append(column)
+    return columns
+
+def warmup_bars(names: Iterable[str]) -> int:
+    """
+    Bars of history needed before the first displayed row for `names` to be fully formed.
+
+    Each indicator needs its own window (or EWM span) plus the longest warm-up of its
+    dependencies. EWMs never fully forget, so their span is a practical approximation.
+    """
+    def lookback(name: str) -> int:
+        spec = INDICATOR_REGISTRY[name]
+        own = spec.params.get('window') or spec.params.get('span') or 1
+        return own + max((lookback(dependency) for dependency in spec.dependencies), default=1)
+
+    return max((lookback(name) for name in resolve_indicators(names)), default=0)
+
+def resolve_indicators(names: Iterable[str]) -> List[str]:
+    """Return `names` and everything they depend on, dependencies first, in registry order."""
+    needed = set()
+
+    def visit(name: str):
+        if name in needed:
+            return
+        if name not in INDICATOR_REGISTRY:
+            raise ValueError(f"Unknown indicator '{name}'. Available: {', '.join(ALL_INDICATORS)}")
+        for dependency in INDICATOR_REGISTRY[name].dependencies:
+            visit(dependency)
+        needed.add(name)
+
+    for name in names:
+        visit(name)
+    return [name for name in INDICATOR_REGISTRY if name in needed]
+
+class IndicatorCache:
+    """
+    Thread-safe LRU memo of computed indicator values.
+
+    Entries are keyed by (ticker, indicator, params, version), where `version` identifies
+    the underlying price data, so a refreshed ticker never serves stale indicators.
+    Values are kept as bare arrays at the `precision` float dtype, without an index (the
+    price frame they were computed from has it), and read back as float64 (see
+    data.storage.compact.restore). Concurrent misses for the same key compute the values once.
+
+    At float32, a value differs from what process_stock_data computes over the same float64
+    prices by at most about 1e-6 times its magnitude, or times the magnitude of the memoized
+    indicators it was computed from (MACD and Signal_Line inherit the rounding of the EMAs).
+    """
+
+    def __init__(self, max_entries: int = 4096, precision: str = MEMORY_PRECISION):
+        self.max_entries = max_entries
+        self.precision = precision
+        self._entries: 'OrderedDict[Hashable, np.ndarray]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.flights = SingleFlight()
+        self.nbytes = 0
+
+    def get(self, key: Hashable) -> Optional[np.ndarray]:
+        with self._lock:
+            values = self._entries.get(key)
+            if values is None:
+                return None
+            self._entries.move_to_end(key)
+        return restore(values)
+
+    def set(self, key: Hashable, values):
+        values = shrink(values, self.precision)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.nbytes -= previous.nbytes
+            self._entries[key] = values
+            self.nbytes += values.nbytes
+            while len(self._entries) > self.max_entries:
+                self.nbytes -= self._entries.popitem(last=False)[1].nbytes
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], pd.Series]) -> np.ndarray:
+        values = self.get(key)
+        if values is not None:
+            METRICS.inc('stocker_cache_requests_total', cache='indicator', result='hit')
+            return values
+        METRICS.inc('stocker_cache_requests_total', cache='indicator', result='miss')
+
+        def run() -> np.ndarray:
+            # The previous flight for this key may have finished since the lookup above
+            values = self.get(key)
+            if values is None:
+                self.set(key, compute().to_numpy())
+                # Read back, so a miss returns exactly what later hits will
+                values = self.get(key)
+            return values
+
+        return self.flights.call(key, run)
+
+    def usage(self) -> Dict[str, int]:
+        """Bytes held per ticker."""
+        usage: Dict[str, int] = {}
+        with self._lock:
+            for key, values in self._entries.items():
+                usage[key[0]] = usage.get(key[0], 0) + values.nbytes
+        return usage
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+def compute_indicators(df: pd.DataFrame, indicators: Iterable[str], ticker: Optional[str] = None,
+                       version: Optional[Hashable] = None, cache: Optional[IndicatorCache] = None) -> pd.DataFrame:
+    """
+    Add only the requested indicators (and what they depend on) to a price frame.
+
+    Columns already present in `df` are reused rather than recomputed. When `ticker`,
+    `version` and `cache` are given, computed values are memoized per
+    (ticker, indicator, params, version); intermediates are only memoized when requested,
+    and dependencies are only computed when what needs them isn't memoized.
+
+    Parameters:
+    df (pd.DataFrame): DataFrame containing stock data with columns 'Close', 'High', 'Low', 'Volume'.
+    indicators (Iterable[str]): Indicator columns to add, e.g. ['SMA_20', 'Signal_Line'].
+
+    Returns:
+    pd.DataFrame: `df` with the requested indicator columns added.
+
+    Raises:
+    ValueError: If required columns are missing or an indicator is unknown.
+    """
+    requested = [name for name in indicators if name not in df.columns]
+    if df.empty or not requested:
+        return df
+
+    required_columns = ['Close', 'High', 'Low', 'Volume']
+    if not all(col in df.columns for col in required_columns):
+        raise ValueError(f"Missing required columns in DataFrame: {', '.join(set(required_columns) - set(df.columns))}")
+
+    memoize = cache is not None and ticker is not None and version is not None
+    computed: Dict[str, pd.Series] = {}
+    data = ChainMap(computed, df)
+
+    def resolve(name: str):
+        if name in data:
+            return
+        if name not in INDICATOR_REGISTRY:
+            raise ValueError(f"Unknown indicator '{name}'. Available: {', '.join(ALL_INDICATORS)}")
+        spec = INDICATOR_REGISTRY[name]
+
+        def compute() -> pd.Series:
+            for dependency in spec.dependencies:
+                resolve(dependency)
+            return spec.func(data, **spec.params)
+
+        if memoize and (name in requested or not is_intermediate(name)):
+            computed[name] = pd.Series(cache.get_or_compute((ticker, *spec.key, version), compute), index=df.index)
+        else:
+            computed[name] = compute()
+
+    for name in requested:
+        resolve(name)
+
+    added = {name: computed[name] for name in INDICATOR_REGISTRY if name in requested}
+    return pd.concat([df, pd.DataFrame(added, index=df.index)], axis=1, copy=False)
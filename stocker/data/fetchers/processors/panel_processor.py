@@ -0,0 +1,156 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from typing import Dict, Union
+from .indicators import DEFAULT_INDICATORS
+
+# Indicator columns in the order process_stock_data adds them
+INDICATOR_COLUMNS = DEFAULT_INDICATORS
+
+def _rolling(values: np.ndarray, window: int, func, **kwargs) -> np.ndarray:
+    """Apply `func` over trailing windows along axis 0; any NaN in a window yields NaN."""
+    out = np.full(values.shape, np.nan)
+    if len(values) >= window:
+        # Window functions treat inf as missing.
+        values = np.where(np.isinf(values), np.nan, values)
+        out[window - 1:] = func(sliding_window_view(values, window, axis=0), axis=-1, **kwargs)
+    return out
+
+def _ewm_mean(values: np.ndarray, span: int) -> np.ndarray:
+    """ewm(span=span, adjust=False).mean() for every column, stepping through rows."""
+    com = (span - 1) / 2
+    alpha = 1. / (1. + com)
+    old_wt_factor = 1. - alpha
+
+    out = np.empty(values.shape)
+    weighted = values[0].copy()
+    old_wt = np.ones(values.shape[1])
+    out[0] = weighted
+    for i in range(1, len(values)):
+        cur = values[i]
+        started = ~np.isnan(weighted)
+        observed = ~np.isnan(cur)
+        old_wt = np.where(started, old_wt * old_wt_factor, old_wt)
+        blended = (old_wt * weighted + alpha * cur) / (old_wt + alpha)
+        weighted = np.where(started & observed & (weighted != cur), blended, weighted)
+        old_wt = np.where(started & observed, 1., old_wt)
+        weighted = np.where(~started & observed, cur, weighted)
+        out[i] = weighted
+    return out
+
+def _shift(values: np.ndarray) -> np.ndarray:
+    shifted = np.empty(values.shape)
+    shifted[0] = np.nan
+    shifted[1:] = values[:-1]
+    return shifted
+
+def compute_panel_indicators(close: np.ndarray, high: np.ndarray, low: np.ndarray,
+                             volume: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Compute every process_stock_data indicator for a (rows x tickers) panel in one pass.
+
+    Rows before a ticker's first bar must be NaN.
+    """
+    prev_close = _shift(close)
+    indicators = {}
+
+    indicators['SMA_20'] = sma_20 = _rolling(close, 20, np.mean)
+    indicators['SMA_50'] = _rolling(close, 50, np.mean)
+
+    indicators['EMA_12'] = ema_12 = _ewm_mean(close, 12)
+    indicators['EMA_26'] = ema_26 = _ewm_mean(close, 26)
+
+    # Missing comparisons become zeros once a ticker is listed, like in the per-ticker code
+    listed = np.cumsum(~np.isnan(close), axis=0) > 0
+    delta = close - prev_close
+    gain = _rolling(np.where(listed, np.where(delta > 0, delta, 0.0), np.nan), 14, np.mean)
+    loss = _rolling(np.where(listed, -np.where(delta < 0, delta, 0.0), np.nan), 14, np.mean)
+    rs = gain / np.where((loss == 0) | np.isnan(loss), 1e-8, loss)
+    indicators['RSI'] = 100 - (100 / (1 + rs))
+
+    indicators['stddev_20'] = stddev_20 = _rolling(close, 20, np.std, ddof=1)
+    indicators['Upper_BB'] = sma_20 + (stddev_20 * 2)
+    indicators['Lower_BB'] = sma_20 - (stddev_20 * 2)
+
+    indicators['MACD'] = macd = ema_12 - ema_26
+    indicators['Signal_Line'] = _ewm_mean(macd, 9)
+
+    signed_volume = np.sign(delta) * volume
+    indicators['OBV'] = np.cumsum(np.where(np.isnan(signed_volume), 0.0, signed_volume), axis=0)
+
+    low_14 = _rolling(low, 14, np.min)
+    high_14 = _rolling(high, 14, np.max)
+    indicators['%K'] = percent_k = 100 * ((close - low_14) / (high_14 - low_14 + 1e-8))
+    indicators['%D'] = _rolling(percent_k, 3, np.mean)
+
+    indicators['TR'] = tr = np.maximum(np.maximum(high - low, np.abs(high - prev_close)), np.abs(low - prev_close))
+    indicators['ATR'] = _rolling(tr, 14, np.mean)
+
+    tp = (high + low + close) / 3
+    indicators['CCI'] = (tp - _rolling(tp, 20, np.mean)) / (0.015 * _rolling(tp, 20, np.std, ddof=1))
+
+    raw_money_flow = tp * volume
+    prev_raw_money_flow = _shift(raw_money_flow)
+    flow_positive = np.where(listed, np.where(raw_money_flow > prev_raw_money_flow, raw_money_flow, 0.0), np.nan)
+    flow_negative = np.where(listed, np.where(raw_money_flow < prev_raw_money_flow, raw_money_flow, 0.0), np.nan)
+    negative_sum = _rolling(flow_negative, 14, np.sum)
+    money_ratio = _rolling(flow_positive, 14, np.sum) / np.where((negative_sum == 0) | np.isnan(negative_sum), 1e-8, negative_sum)
+    indicators['MFI'] = 100 - (100 / (1 + money_ratio))
+
+    indicators['Williams_%R'] = -100 * ((high_14 - close) / (high_14 - low_14 + 1e-8))
+
+    return indicators
+
+def process_stock_panel(dfs: Dict[str, pd.DataFrame], as_frame: bool = False,
+                        chunk_size: int = 256) -> Union[Dict[str, pd.DataFrame], pd.DataFrame]:
+    """
+    Process many tickers at once with vectorized NumPy instead of one process_stock_data call each.
+
+    Tickers are stacked into (rows x tickers) arrays aligned on their most recent bar, which
+    is the date alignment for tickers sharing a trading calendar; shorter histories are
+    padded with leading NaN, so listing gaps and halts give the same values a per-ticker
+    computation would. Tickers are processed `chunk_size` at a time to bound memory.
+
+    Parameters:
+    dfs (Dict[str, pd.DataFrame]): Frames with columns 'Close', 'High', 'Low', 'Volume', keyed by ticker.
+    as_frame (bool): Return a single date-aligned frame with (ticker, column) MultiIndex columns.
+    chunk_size (int): Number of tickers per vectorized pass.
+
+    Returns:
+    Dict[str, pd.DataFrame] | pd.DataFrame: Frames with the same columns process_stock_data adds.
+
+    Raises:
+    ValueError: If required columns are missing from any input DataFrame.
+    """
+    required_columns = ['Close', 'High', 'Low', 'Volume']
+    for ticker, df in dfs.items():
+        if not df.empty and not all(col in df.columns for col in required_columns):
+            raise ValueError(f"Missing required columns in DataFrame for {ticker}: {', '.join(set(required_columns) - set(df.columns))}")
+
+    results = {ticker: df for ticker, df in dfs.items() if df.empty}
+    tickers = [ticker for ticker, df in dfs.items() if not df.empty]
+    for start in range(0, len(tickers), chunk_size):
+        chunk = tickers[start:start + chunk_size]
+        rows = max(len(dfs[ticker]) for ticker in chunk)
+        panel = {col: np.full((rows, len(chunk)), np.nan) for col in required_columns}
+        for j, ticker in enumerate(chunk):
+            df = dfs[ticker]
+            for col in required_columns:
+                panel[col][rows - len(df):, j] = df[col].to_numpy(dtype=np.float64)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            indicators = compute_panel_indicators(panel['Close'], panel['High'], panel['Low'], panel['Volume'])
+        # (tickers x rows x indicators), so each ticker's block is contiguous
+        stacked = np.stack([indicators[col].T for col in INDICATOR_COLUMNS], axis=-1)
+
+        for j, ticker in enumerate(chunk):
+            df = dfs[ticker]
+            values = stacked[j, rows - len(df):]
+            existing = [col for col in INDICATOR_COLUMNS if col in df.columns]
+            base = df.drop(columns=existing) if existing else df
+            results[ticker] = pd.concat([base, pd.DataFrame(values, index=df.index, columns=INDICATOR_COLUMNS)], axis=1)
+
+    results = {ticker: results[ticker] for ticker in dfs}
+    if as_frame:
+        return pd.concat(results, axis=1)
+    return results
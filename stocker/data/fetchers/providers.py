@@ -0,0 +1,179 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config import (
+    POLYGON_API_KEY, ALPHA_VANTAGE_API_KEY, FINNHUB_API_KEY, FETCH_PROVIDERS,
+    FETCH_HEDGE_ENABLED, FETCH_HEDGE_MIN_SAMPLES, FETCH_HEDGE_DEFAULT_DELAY, FETCH_LATENCY_WINDOW,
+    FETCH_FAILOVER_THRESHOLD
+)
+from data.async_runtime import AsyncRuntime
+from metrics import METRICS
+from .base_fetcher import BaseFetcher, OHLCV_COLUMNS
+from .yahoo_fetcher import YahooFetcher
+from .polygon_fetcher import PolygonFetcher
+from .finnhub_fetcher import FinnhubFetcher
+from .alpha_vantage_fetcher import AlphaVantageFetcher
+
+logger = logging.getLogger(__name__)
+
+# Provider name -> factory returning a fetcher, or None when the provider isn't configured
+PROVIDERS: Dict[str, Callable[[AsyncRuntime], Optional[BaseFetcher]]] = OrderedDict()
+
+def register_provider(name: str):
+    def decorator(factory: Callable[[AsyncRuntime], Optional[BaseFetcher]]):
+        PROVIDERS[name] = factory
+        return factory
+    return decorator
+
+@register_provider('yahoo')
+def _yahoo(runtime: AsyncRuntime) -> BaseFetcher:
+    return YahooFetcher()
+
+@register_provider('polygon')
+def _polygon(runtime: AsyncRuntime) -> Optional[BaseFetcher]:
+    return PolygonFetcher(POLYGON_API_KEY, runtime) if POLYGON_API_KEY else None
+
+@register_provider('finnhub')
+def _finnhub(runtime: AsyncRuntime) -> Optional[BaseFetcher]:
+    return FinnhubFetcher(FINNHUB_API_KEY, runtime) if FINNHUB_API_KEY else None
+
+@register_provider('alpha_vantage')
+def _alpha_vantage(runtime: AsyncRuntime) -> Optional[BaseFetcher]:
+    return AlphaVantageFetcher(ALPHA_VANTAGE_API_KEY, runtime) if ALPHA_VANTAGE_API_KEY else None
+
+class LatencyTracker:
+    """Recent successful latencies and the failure streak of one provider."""
+
+    def __init__(self, window: int = FETCH_LATENCY_WINDOW):
+        self.latencies = deque(maxlen=window)
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, ok: bool):
+        with self._lock:
+            if ok:
+                self.latencies.append(seconds)
+                self.successes += 1
+                self.consecutive_failures = 0
+            else:
+                self.failures += 1
+                self.consecutive_failures += 1
+
+    def percentile(self, q: float, min_samples: int = FETCH_HEDGE_MIN_SAMPLES) -> Optional[float]:
+        with self._lock:
+            if len(self.latencies) < min_samples:
+                return None
+            return float(np.percentile(self.latencies, q))
+
+class MultiProviderFetcher(BaseFetcher):
+    """
+    Fetch from several providers with failover and hedged requests.
+
+    Providers are tried in the configured order, except that one which failed its last
+    `failover_threshold` requests in a row is moved to the back. If a provider fails, the
+    next one is asked straight away. With `hedge` enabled, the next provider is also asked
+    when the current one hasn't answered within its own p95 latency (or `default_delay`
+    until enough samples exist); the first non-empty answer wins and the rest are cancelled.
+    Results are normalized to the OHLCV columns.
+    """
+
+    def __init__(self, providers: Sequence[Tuple[str, BaseFetcher]], hedge: bool = FETCH_HEDGE_ENABLED,
+                 default_delay: float = FETCH_HEDGE_DEFAULT_DELAY, failover_threshold: int = FETCH_FAILOVER_THRESHOLD):
+        if not providers:
+            raise ValueError("At least one provider is required.")
+        self.providers = list(providers)
+        self.hedge = hedge
+        self.default_delay = default_delay
+        self.failover_threshold = failover_threshold
+        self.latency = {name: LatencyTracker() for name, _ in self.providers}
+
+    def _ordered(self) -> List[Tuple[str, BaseFetcher]]:
+        return sorted(self.providers,
+                      key=lambda provider: self.latency[provider[0]].consecutive_failures >= self.failover_threshold)
+
+    def hedge_delay(self, name: str) -> float:
+        p95 = self.latency[name].percentile(95)
+        return self.default_delay if p95 is None else p95
+
+    async def _timed(self, name: str, fetcher: BaseFetcher, ticker: str, start_date: str, end_date: str) -> pd.DataFrame:
+        started = time.perf_counter()
+        try:
+            data = await fetcher.fetch_data(ticker, start_date, end_date)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            METRICS.inc('stocker_upstream_requests_total', provider=name, outcome=type(e).__name__)
+            logger.warning("Error fetching data from %s for %s: %r", name, ticker, e)
+            data = pd.DataFrame()
+        self.latency[name].record(time.perf_counter() - started, not data.empty)
+        return data
+
+    async def fetch_data(self, ticker: str, start_date: str, end_date: str) -> pd.DataFrame:
+        queue = self._ordered()
+        pending: Dict[asyncio.Task, str] = {}
+
+        def launch() -> str:
+            name, fetcher = queue.pop(0)
+            pending[asyncio.ensure_future(self._timed(name, fetcher, ticker, start_date, end_date))] = name
+            return name
+
+        latest = launch()
+        try:
+            while pending:
+                timeout = self.hedge_delay(latest) if self.hedge and queue else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # Hedge: the current provider is slower than usual
+                    METRICS.inc('stocker_fetch_hedges_total', provider=latest)
+                    latest = launch()
+                    continue
+                for task in done:
+                    failed = pending.pop(task)
+                    data = task.result()
+                    if not data.empty:
+                        return data[[col for col in OHLCV_COLUMNS if col in data.columns]]
+                if queue:
+                    # Fail over
+                    METRICS.inc('stocker_fetch_failovers_total', provider=failed)
+                    latest = launch()
+            return pd.DataFrame()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> Dict[str, dict]:
+        return {
+            name: {
+                'successes': tracker.successes,
+                'failures': tracker.failures,
+                'consecutive_failures': tracker.consecutive_failures,
+                'p50': tracker.percentile(50, min_samples=1),
+                'p95': tracker.percentile(95, min_samples=1),
+            }
+            for name, tracker in self.latency.items()
+        }
+
+    def close(self):
+        for _, fetcher in self.providers:
+            if hasattr(fetcher, 'close'):
+                fetcher.close()
+
+def create_fetcher(runtime: AsyncRuntime, names: Sequence[str] = FETCH_PROVIDERS) -> MultiProviderFetcher:
+    """Build a failover fetcher from the providers in `names` that are configured."""
+    providers = []
+    for name in names:
+        if name not in PROVIDERS:
+            raise ValueError(f"Unknown provider '{name}'. Available: {', '.join(PROVIDERS)}")
+        fetcher = PROVIDERS[name](runtime)
+        if fetcher is not None:
+            providers.append((name, fetcher))
+    return MultiProviderFetcher(providers)
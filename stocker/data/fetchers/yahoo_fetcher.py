@@ -1,22 +1,131 @@
-import yfinance as yf
 import pandas as pd
 from .base_fetcher import BaseFetcher
+from metrics import METRICS
 import asyncio
-from typing import List, Dict
+import logging
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Callable, Optional
+from config import (
+    FETCH_MAX_WORKERS, FETCH_MAX_CONCURRENCY, FETCH_TIMEOUT, FETCH_RETRIES,
+    FETCH_BACKOFF, FETCH_BATCH_SIZE, FETCH_BATCH_TIMEOUT
+)
+
+logger = logging.getLogger(__name__)
 
 class YahooFetcher(BaseFetcher):
+    """
+    Fetch daily history from Yahoo Finance without blocking the event loop.
+
+    yfinance is synchronous, so every upstream call runs on a dedicated thread pool. A
+    per-loop semaphore bounds the number of requests in flight, each call has a timeout and
+    is retried with exponential backoff. Large universes are fetched with yf.download in
+    batches of `batch_size` tickers. yfinance itself is only imported on the first call.
+
+    Subclasses can override `_history` and `_download` to fetch from somewhere else, which
+    is how the fetcher is exercised offline.
+    """
+
+    provider = 'yahoo'
+
+    def __init__(self, max_workers: int = FETCH_MAX_WORKERS, max_concurrency: int = FETCH_MAX_CONCURRENCY,
+                 timeout: float = FETCH_TIMEOUT, retries: int = FETCH_RETRIES, backoff: float = FETCH_BACKOFF,
+                 batch_size: int = FETCH_BATCH_SIZE, batch_timeout: float = FETCH_BATCH_TIMEOUT):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="yahoo-fetch")
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.batch_size = batch_size
+        self.batch_timeout = batch_timeout
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        # Semaphores are bound to the loop they are first used on.
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return semaphore
+
+    def _history(self, ticker: str, start_date: str, end_date: str) -> pd.DataFrame:
+        import yfinance as yf
+        return yf.Ticker(ticker).history(start=start_date, end=end_date, timeout=self.timeout)
+
+    def _download(self, tickers: List[str], start_date: str, end_date: str) -> Dict[str, pd.DataFrame]:
+        import yfinance as yf
+        data = yf.download(
+            tickers, start=start_date, end=end_date, group_by='ticker', auto_adjust=True,
+            actions=True, threads=False, progress=False, timeout=self.timeout
+        )
+        if data.empty:
+            return {}
+        if not isinstance(data.columns, pd.MultiIndex):
+            return {tickers[0]: data.dropna(how='all')}
+
+        frames = {}
+        available = set(data.columns.get_level_values(0))
+        for ticker in tickers:
+            if ticker not in available:
+                continue
+            frame = data[ticker].dropna(how='all')
+            if not frame.empty:
+                frames[ticker] = frame
+        return frames
+
+    async def _run(self, func: Callable, *args, timeout: Optional[float] = None):
+        """Run a blocking call on the worker pool, retrying failures with exponential backoff."""
+        loop = asyncio.get_running_loop()
+        timeout = self.timeout if timeout is None else timeout
+        for attempt in range(self.retries + 1):
+            try:
+                async with self._semaphore():
+                    # A timed out call keeps its worker thread until yfinance gives up on its own.
+                    return await asyncio.wait_for(loop.run_in_executor(self.executor, func, *args), timeout)
+            except Exception:
+                if attempt == self.retries:
+                    raise
+                METRICS.inc('stocker_upstream_retries_total', provider=self.provider)
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+
     async def fetch_data(self, ticker: str, start_date: str, end_date: str) -> pd.DataFrame:
         try:
-            stock = yf.Ticker(ticker)
-            data = stock.history(start=start_date, end=end_date)
+            with METRICS.span('upstream_history', provider=self.provider):
+                data = await self._run(self._history, ticker, start_date, end_date)
             if data.empty:
                 raise ValueError(f"No data found for ticker '{ticker}'.")
+            METRICS.inc('stocker_upstream_requests_total', provider=self.provider, outcome='ok')
             return data
         except Exception as e:
-            print(f"Error fetching data from Yahoo Finance for {ticker}: {e}")
+            METRICS.inc('stocker_upstream_requests_total', provider=self.provider, outcome=type(e).__name__)
+            logger.warning("Error fetching data from Yahoo Finance for %s: %r", ticker, e)
             return pd.DataFrame()
-    
+
+    async def _fetch_batch(self, batch: List[str], start_date: str, end_date: str) -> Dict[str, pd.DataFrame]:
+        try:
+            with METRICS.span('upstream_download', provider=self.provider):
+                frames = await self._run(self._download, batch, start_date, end_date, timeout=self.batch_timeout)
+            METRICS.inc('stocker_upstream_requests_total', provider=self.provider, outcome='ok')
+            return frames
+        except Exception as e:
+            METRICS.inc('stocker_upstream_requests_total', provider=self.provider, outcome=type(e).__name__)
+            # Fall back to per-ticker requests so one bad batch doesn't lose every ticker in it.
+            logger.warning("Error batch fetching %d tickers from Yahoo Finance: %r", len(batch), e)
+            results = await asyncio.gather(*(self.fetch_data(stock, start_date, end_date) for stock in batch))
+            return {stock: result for stock, result in zip(batch, results) if not result.empty}
+
     async def fetch_top_1000_stocks(self, start_date: str, end_date: str, stock_list: List[str]) -> Dict[str, pd.DataFrame]:
+        if self.batch_size and len(stock_list) > self.batch_size:
+            batches = [stock_list[i:i + self.batch_size] for i in range(0, len(stock_list), self.batch_size)]
+            results = await asyncio.gather(*(self._fetch_batch(batch, start_date, end_date) for batch in batches))
+            frames = {}
+            for result in results:
+                frames.update(result)
+            return {stock: frames[stock] for stock in stock_list if stock in frames}
+
         tasks = [self.fetch_data(stock, start_date, end_date) for stock in stock_list]
         results = await asyncio.gather(*tasks)
-        return {stock: result for stock, result in zip(stock_list, results) if not result.empty}
\ No newline at end of file
+        return {stock: result for stock, result in zip(stock_list, results) if not result.empty}
+
+    def close(self):
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,145 @@
+"""
+Publish the processed frames of every stored ticker for web workers to share.
+
+Run one per deployment, from the stocker directory, next to the web workers:
+
+    SHARED_FRAMES_DIR=shared-frames python -m data.frame_publisher
+    SHARED_FRAMES_DIR=shared-frames python -m data.frame_publisher --once
+
+Every SHARED_FRAMES_INTERVAL seconds, tickers whose bars changed in the price store
+(PRICE_STORE_DIR) are reprocessed on BATCH_WORKERS processes and published with one
+manifest swap. Web workers started with the same SHARED_FRAMES_DIR map the published
+frames instead of computing and caching their own copies.
+
+Web workers with SHARED_FRAMES_DIR set don't run the refresh scheduler: the publisher
+warms the universe and refreshes it after each market close (REFRESH_SCHEDULER_ENABLED),
+persisting new bars to the database, so each ticker is fetched and written by one process.
+Pass --no-refresh when another process owns refreshing instead.
+"""
+import argparse
+import logging
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from config import (
+    BATCH_WORKERS, DATABASE_URL, LOG_FORMAT, LOG_LEVEL, PRICE_STORE_DIR, REFRESH_SCHEDULER_ENABLED, SHARED_FRAMES_DIR,
+    SHARED_FRAMES_INTERVAL
+)
+from data.processing_pool import ProcessingPool
+from data.storage.price_store import PriceStore
+from data.storage.shared_frames import SharedFrameStore
+from metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+class FramePublisher:
+    """
+    Keeps a SharedFrameStore in step with the price store.
+
+    Each pass compares the price store version of every stored ticker with the version its
+    published frame was built from, snapshots the changed ones on the processing pool and
+    publishes them, together with the removal of tickers no longer stored, in a single
+    manifest swap. Tickers that fail keep their previous frame until the next pass.
+    """
+
+    def __init__(self, store: PriceStore, shared: SharedFrameStore, pool: ProcessingPool,
+                 interval: float = SHARED_FRAMES_INTERVAL):
+        self.store = store
+        self.shared = shared
+        self.pool = pool
+        self.interval = interval
+        self._stop = threading.Event()
+
+    def stale(self) -> Tuple[List[str], List[str]]:
+        """Tickers whose published frame is missing or out of date, and published tickers no longer stored."""
+        published = self.shared.manifest()['tickers']
+        stored = self.store.tickers()
+        changed = [ticker for ticker in stored
+                   if ticker not in published or published[ticker]['version'] != self.store.version(ticker)]
+        removed = sorted(set(published) - set(stored))
+        return changed, removed
+
+    def publish(self) -> Dict[str, int]:
+        """Run one pass; returns how many tickers were published, failed and removed."""
+        changed, removed = self.stale()
+        if not changed and not removed:
+            return {'published': 0, 'failed': 0, 'removed': 0}
+        with METRICS.span('publish'):
+            results = self.pool.snapshot(changed, self.shared.root)
+            entries = {ticker: entry for ticker, entry in results.items() if entry is not None}
+            self.shared.publish(entries, removed)
+        return {'published': len(entries), 'failed': len(changed) - len(entries), 'removed': len(removed)}
+
+    def run(self):
+        """Publish every `interval` seconds until `stop` is called."""
+        # Frames of a publish that was interrupted before its manifest swap
+        self.shared.prune()
+        while not self._stop.is_set():
+            started = time.perf_counter()
+            counts = self.publish()
+            if counts['published'] or counts['failed'] or counts['removed']:
+                logger.info("Published %d tickers (%d failed, %d removed) in %.1fs", counts['published'],
+                            counts['failed'], counts['removed'], time.perf_counter() - started)
+            self._stop.wait(self.interval)
+
+    def stop(self):
+        self._stop.set()
+
+def start_refresh(store: PriceStore, pool: ProcessingPool):
+    """Warm and refresh the universe from this process, persisting new bars on `pool`; returns (runtime, scheduler)."""
+    from sqlalchemy import create_engine
+    from app import TOP_1000_STOCKS
+    from data.async_runtime import AsyncRuntime
+    from data.fetchers.providers import create_fetcher
+    from data.refresh_scheduler import RefreshScheduler
+    from data.storage.range_cache import RangeCache
+    from data.storage.sql_store import SQLStore
+
+    runtime = AsyncRuntime()
+    # Like the web app's persist_bars: only the new rows are written to the database
+    range_cache = RangeCache(store, create_fetcher(runtime),
+                             on_write=lambda ticker, new_bars: pool.submit(ticker, new_bars.index))
+    scheduler = RefreshScheduler(range_cache, TOP_1000_STOCKS, runtime, SQLStore(create_engine(DATABASE_URL)))
+    scheduler.start()
+    return runtime, scheduler
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--shared-dir', default=SHARED_FRAMES_DIR, help="Where frames are published (SHARED_FRAMES_DIR)")
+    parser.add_argument('--interval', type=float, default=SHARED_FRAMES_INTERVAL, help="Seconds between passes")
+    parser.add_argument('--workers', type=int, default=BATCH_WORKERS, help="Worker processes; 0 runs in-process")
+    parser.add_argument('--once', action='store_true', help="Publish what changed and exit")
+    parser.add_argument('--no-refresh', action='store_true', help="Don't warm and refresh the price store from this process")
+    args = parser.parse_args(argv)
+    if not args.shared_dir:
+        parser.error("Set SHARED_FRAMES_DIR or pass --shared-dir.")
+    logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+
+    pool = ProcessingPool(PRICE_STORE_DIR, DATABASE_URL, workers=args.workers)
+    pool.start()
+    publisher = FramePublisher(PriceStore(PRICE_STORE_DIR), SharedFrameStore(args.shared_dir), pool, args.interval)
+    refresh = None
+    if REFRESH_SCHEDULER_ENABLED and not args.once and not args.no_refresh:
+        # Started after the pool has forked its workers
+        refresh = start_refresh(publisher.store, pool)
+    try:
+        if args.once:
+            publisher.shared.prune()
+            counts = publisher.publish()
+            logger.info("Published %d tickers (%d failed, %d removed).", counts['published'], counts['failed'], counts['removed'])
+        else:
+            publisher.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if refresh is not None:
+            runtime, scheduler = refresh
+            scheduler.stop()
+            runtime.close()
+        pool.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,10 +1,13 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime
+from sqlalchemy import Column, Integer, String, Float, DateTime, Index
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
 
 class StockData(Base):
     __tablename__ = 'stock_data'
+    __table_args__ = (
+        Index('ix_stock_data_ticker_date', 'ticker', 'date', unique=True),
+    )
     id = Column(Integer, primary_key=True)
     ticker = Column(String)
     date = Column(DateTime)
@@ -0,0 +1,321 @@
+import logging
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+
+from config import DATABASE_URL, PRICE_STORE_DIR, PROCESS_WORKERS, PROCESS_CHUNK_SIZE
+from data.fetchers.processors.data_processor import process_stock_data
+from data.fetchers.processors.incremental_processor import IncrementalProcessor
+from data.fetchers.processors.indicators import DEFAULT_INDICATORS
+from data.fetchers.processors.panel_processor import process_stock_panel
+from data.screener import latest_values
+from data.storage.price_store import PriceStore
+from data.storage.shared_frames import SharedFrameStore
+from data.storage.sql_store import SQLStore
+from metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+# Date and values of a ticker's last processed row (see data.screener.latest_values)
+Latest = Tuple[str, Dict[str, float]]
+
+# Stores of the current worker, opened once per worker by the pool initializer. Thread-local, since
+# every in-process pool (workers=0) runs its tasks on its own thread of the same process
+_stores = threading.local()
+
+def _open_stores(store_root: str, database_url: str):
+    _stores.store = PriceStore(store_root)
+    _stores.sql_store = SQLStore(create_engine(database_url))
+
+# Indicator state saved next to each ticker's bars (see PriceStore.write_state)
+INDICATOR_STATE = 'indicators'
+
+def _resume(ticker: str, df: pd.DataFrame, dates: Optional[pd.DatetimeIndex]) -> Tuple[IncrementalProcessor, int]:
+    """
+    The saved indicator state of `ticker` and the number of leading rows of `df` it has
+    processed, or a new processor and 0 if there is no state or the bars it was computed
+    from have changed: rows were inserted before its last one, or `dates` include one of them.
+    """
+    state = _stores.store.read_state(ticker, INDICATOR_STATE) if dates is not None else None
+    if state is not None:
+        processor, rows = state
+        changed = np.flatnonzero(df.index.isin(dates))
+        if rows < len(df) and df.index[rows - 1] == processor.last_index and (not len(changed) or changed[0] >= rows):
+            return processor, rows
+    return IncrementalProcessor(DEFAULT_INDICATORS), 0
+
+def _process(ticker: str, dates: Optional[pd.DatetimeIndex] = None, persist: bool = True) -> Tuple[int, Optional[Latest]]:
+    """
+    Compute the default indicators for the new rows of `ticker` and upsert them.
+
+    Indicators are computed incrementally from the state saved by the previous call, so a
+    refresh costs the new bars rather than the whole history, with the same values as
+    processing the whole history. The state is saved as of the second-to-last row, because
+    a refresh refetches the last stored day in case it was a partial bar. The whole history
+    is processed when `dates` is None or the state is missing or stale (see _resume). Only
+    the rows at `dates` are written when given. Returns the number of rows written and the
+    values of the last row, which feed the screener.
+    """
+    df = _stores.store.read(ticker)
+    if df is None or df.empty:
+        return 0, None
+    processor, start = _resume(ticker, df, dates)
+    checkpoint = len(df) - 1
+    head = processor.update(df.iloc[start:checkpoint])
+    if checkpoint > 0:
+        _stores.store.write_state(ticker, INDICATOR_STATE, (processor, checkpoint))
+    tail = processor.update(df.iloc[checkpoint:])
+    processed = pd.concat([head, tail]) if not head.empty else tail
+    latest = latest_values(processed)
+    if not persist:
+        return 0, latest
+    if dates is not None:
+        processed = processed[processed.index.isin(dates)]
+    _stores.sql_store.upsert(ticker, processed)
+    return len(processed), latest
+
+def _process_shard(tickers: List[str], persist: bool = True) -> Dict[str, Optional[Tuple[int, Optional[Latest]]]]:
+    """
+    Process a shard of tickers in one task with the vectorized panel engine and upsert
+    their full histories; failed tickers map to None.
+    """
+    results: Dict[str, Optional[Tuple[int, Optional[Latest]]]] = {}
+    dfs = {}
+    for ticker in tickers:
+        try:
+            df = _stores.store.read(ticker)
+        except Exception as e:
+            logger.warning("Error processing %s: %r", ticker, e)
+            results[ticker] = None
+            continue
+        if df is None or df.empty:
+            results[ticker] = (0, None)
+        else:
+            dfs[ticker] = df
+
+    try:
+        processed = process_stock_panel(dfs) if dfs else {}
+    except Exception as e:
+        logger.warning("Error processing %s: %r", ', '.join(dfs), e)
+        processed = {}
+        results.update((ticker, None) for ticker in dfs)
+
+    for ticker, df in processed.items():
+        try:
+            if persist:
+                _stores.sql_store.upsert(ticker, df)
+            results[ticker] = (len(df) if persist else 0, latest_values(df))
+        except Exception as e:
+            logger.warning("Error processing %s: %r", ticker, e)
+            results[ticker] = None
+    return {ticker: results[ticker] for ticker in tickers}
+
+def _snapshot(ticker: str, shared_root: str) -> Optional[dict]:
+    """
+    Compute the default indicators over the stored history of `ticker` and write the frame
+    to the shared frame store, unpublished. Returns its manifest entry, or None if the
+    ticker isn't stored or was rewritten while it was being read.
+    """
+    df, version = _stores.store.read_versioned(ticker)
+    if df is None or df.empty:
+        return None
+    coverage, written_at = _stores.store.coverage(ticker), _stores.store.written_at(ticker)
+    if _stores.store.version(ticker) != version:
+        return None
+    processed = process_stock_data(df, DEFAULT_INDICATORS)
+    return SharedFrameStore(shared_root).write(ticker, processed, version, coverage, written_at, latest_values(processed))
+
+def _snapshot_shard(tickers: List[str], shared_root: str) -> Dict[str, Optional[dict]]:
+    results = {}
+    for ticker in tickers:
+        try:
+            results[ticker] = _snapshot(ticker, shared_root)
+        except Exception as e:
+            logger.warning("Error snapshotting %s: %r", ticker, e)
+            results[ticker] = None
+    return results
+
+def _apply_shard(func: Callable, tickers: List[str], args: tuple) -> Dict[str, Any]:
+    """Call func(ticker, stored history, *args) for a shard of tickers; missing or failed tickers map to None."""
+    results = {}
+    for ticker in tickers:
+        try:
+            df = _stores.store.read(ticker)
+            results[ticker] = None if df is None or df.empty else func(ticker, df, *args)
+        except Exception as e:
+            logger.warning("Error processing %s: %r", ticker, e)
+            results[ticker] = None
+    return results
+
+class ProcessingPool:
+    """
+    Compute indicators and persist them from a pool of worker processes.
+
+    Indicator computation is CPU-bound and holds the GIL, so it runs in `workers` processes
+    rather than on the event loop or request threads. Price data never crosses the process
+    boundary: every worker memory-maps the same price store files, which share the OS page
+    cache, and writes its results to the database itself. Only ticker names, the dates to
+    write, row counts and each ticker's last row of values are pickled; the latter are
+    passed to `on_latest` (e.g. ScreenerIndex.update) as (ticker, date, values).
+
+    Workers are forked on `start`; start the pool before the app starts other threads. With
+    `workers` set to 0 the work runs on one background thread of this process instead, with
+    its own stores, so callers on an event loop never block on it.
+
+    Every pool writes to the database, and each web worker process starts its own; see
+    PROCESS_WORKERS for sizing them across a deployment.
+    """
+
+    def __init__(self, store_root: str = PRICE_STORE_DIR, database_url: str = DATABASE_URL,
+                 workers: int = PROCESS_WORKERS, chunk_size: int = PROCESS_CHUNK_SIZE,
+                 on_latest: Optional[Callable[[str, str, Dict[str, float]], None]] = None):
+        self.store_root = store_root
+        self.database_url = database_url
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.on_latest = on_latest
+        self._executor: Optional[Executor] = None
+        self._pending: Set[Future] = set()
+        self._lock = threading.Lock()
+        self.processed = 0
+        self.failed = 0
+
+    def start(self):
+        if self._executor is not None:
+            return
+        if not self.workers:
+            self._executor = ThreadPoolExecutor(1, thread_name_prefix='processing-pool', initializer=_open_stores,
+                                                initargs=(self.store_root, self.database_url))
+            return
+        # Create the schema once here; workers creating it concurrently would race
+        sql_store = SQLStore(create_engine(self.database_url))
+        sql_store.create_schema()
+        sql_store.engine.dispose()
+        self._executor = ProcessPoolExecutor(self.workers, initializer=_open_stores,
+                                             initargs=(self.store_root, self.database_url))
+        # Forks every worker now and waits until they have opened their stores
+        for future in [self._executor.submit(int) for _ in range(self.workers)]:
+            future.result()
+
+    def _call(self, func, *args) -> Future:
+        self.start()
+        return self._executor.submit(func, *args)
+
+    def _publish(self, ticker: str, latest: Optional[Latest]):
+        if self.on_latest is not None and latest is not None:
+            self.on_latest(ticker, *latest)
+
+    def _record(self, ticker: str, future: Future):
+        with self._lock:
+            self._pending.discard(future)
+        if future.cancelled():
+            return
+        error = future.exception()
+        with self._lock:
+            if error is None:
+                self.processed += 1
+            else:
+                self.failed += 1
+        METRICS.inc('stocker_processed_tickers_total', outcome='ok' if error is None else 'failed')
+        if error is not None:
+            logger.warning("Error processing %s: %r", ticker, error)
+        else:
+            self._publish(ticker, future.result()[1])
+
+    def _record_shard(self, future: Future):
+        with self._lock:
+            self._pending.discard(future)
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            logger.warning("Error computing latest values: %r", future.exception())
+            return
+        for ticker, result in future.result().items():
+            if result is not None:
+                self._publish(ticker, result[1])
+
+    def submit(self, ticker: str, dates: Optional[pd.DatetimeIndex] = None) -> Future:
+        """Process `ticker` in the background, writing only the rows at `dates` if given."""
+        future = self._call(_process, ticker, dates)
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(lambda done: self._record(ticker, done))
+        return future
+
+    def _shards(self, tickers: Iterable[str]) -> List[List[str]]:
+        tickers = list(tickers)
+        return [tickers[i:i + self.chunk_size] for i in range(0, len(tickers), self.chunk_size)]
+
+    def refresh_latest(self, tickers: Iterable[str]) -> List[Future]:
+        """
+        Compute the last row of every ticker in the background and pass it to `on_latest`,
+        without writing to the database. Used to fill the screener from the price store.
+        """
+        futures = []
+        for shard in self._shards(tickers):
+            future = self._call(_process_shard, shard, False)
+            with self._lock:
+                self._pending.add(future)
+            future.add_done_callback(self._record_shard)
+            futures.append(future)
+        return futures
+
+    def process_all(self, tickers: Iterable[str]) -> Dict[str, Optional[int]]:
+        """
+        Process and persist the full stored history of every ticker, sharded across the workers.
+
+        Returns rows written per ticker, None for tickers that failed. Blocks until done.
+        """
+        results: Dict[str, Optional[int]] = {}
+        with METRICS.span('process_all'):
+            for future in [self._call(_process_shard, shard) for shard in self._shards(tickers)]:
+                for ticker, result in future.result().items():
+                    results[ticker] = None if result is None else result[0]
+                    if result is not None:
+                        self._publish(ticker, result[1])
+        failed = sum(rows is None for rows in results.values())
+        with self._lock:
+            self.processed += len(results) - failed
+            self.failed += failed
+        METRICS.inc('stocker_processed_tickers_total', len(results) - failed, outcome='ok')
+        METRICS.inc('stocker_processed_tickers_total', failed, outcome='failed')
+        return results
+
+    def map(self, func: Callable, tickers: Iterable[str], *args) -> Dict[str, Any]:
+        """
+        Call func(ticker, stored history, *args) for every ticker, sharded across the workers.
+
+        `func` must be a module-level function and its arguments and result picklable. Returns
+        the result per ticker, None for tickers that aren't stored or failed. Blocks until done.
+        """
+        results: Dict[str, Any] = {}
+        for future in [self._call(_apply_shard, func, shard, args) for shard in self._shards(tickers)]:
+            results.update(future.result())
+        return results
+
+    def snapshot(self, tickers: Iterable[str], shared_root: str) -> Dict[str, Optional[dict]]:
+        """
+        Write the processed frame of every ticker to the shared frame store at `shared_root`,
+        sharded across the workers, for SharedFrameStore.publish. Returns the manifest entry
+        per ticker, None for tickers that were skipped or failed. Blocks until done.
+        """
+        results: Dict[str, Optional[dict]] = {}
+        with METRICS.span('snapshot'):
+            for future in [self._call(_snapshot_shard, shard, shared_root) for shard in self._shards(tickers)]:
+                results.update(future.result())
+        return results
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'workers': self.workers, 'pending': len(self._pending),
+                    'processed': self.processed, 'failed': self.failed}
+
+    def close(self):
+        """Finish queued work and stop the workers."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
@@ -0,0 +1,185 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from config import (
+    REFRESH_RATE_LIMIT, REFRESH_POLL_INTERVAL, REFRESH_HISTORY_DAYS,
+    MARKET_TIMEZONE, MARKET_CLOSE, MARKET_CLOSE_DELAY
+)
+from data.async_runtime import AsyncRuntime
+from data.storage.range_cache import RangeCache
+from data.storage.sql_store import SQLStore
+from metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+def last_market_close(now: Optional[pd.Timestamp] = None, timezone: str = MARKET_TIMEZONE,
+                      close: str = MARKET_CLOSE, delay: float = MARKET_CLOSE_DELAY) -> pd.Timestamp:
+    """Most recent weekday close (plus `delay` seconds) at or before `now`, in UTC."""
+    now = pd.Timestamp.now(tz=timezone) if now is None else pd.Timestamp(now).tz_convert(timezone)
+    day = now.normalize()
+    while True:
+        closed_at = day + pd.Timedelta(close + ':00') + pd.Timedelta(seconds=delay)
+        if day.weekday() < 5 and closed_at <= now:
+            return closed_at.tz_convert('UTC')
+        day -= pd.Timedelta(days=1)
+
+class RefreshScheduler:
+    """
+    Background thread that warms and refreshes the price store, running its work on the shared runtime.
+
+    Each cycle walks the universe (plus any ticker users have asked for) in priority order,
+    most-requested first. Tickers that aren't stored yet are seeded from the database and
+    filled with `history_days` of bars; stored tickers whose data predates the last market
+    close get the bars since their last one. Fresh tickers are skipped, so outside of the
+    daily close a cycle costs nothing upstream. Upstream requests are paced at `rate_limit`
+    per second, and `progress()` reports how far the current cycle has got.
+
+    The web tier never waits on the scheduler: requests for tickers it hasn't reached yet
+    are served through the range cache as usual.
+    """
+
+    def __init__(self, range_cache: RangeCache, universe: Iterable[str], runtime: AsyncRuntime,
+                 sql_store: Optional[SQLStore] = None, rate_limit: float = REFRESH_RATE_LIMIT,
+                 poll_interval: float = REFRESH_POLL_INTERVAL, history_days: int = REFRESH_HISTORY_DAYS):
+        self.range_cache = range_cache
+        self.runtime = runtime
+        self.universe = list(universe)
+        self.sql_store = sql_store
+        self.rate_limit = rate_limit
+        self.poll_interval = poll_interval
+        self.history_days = history_days
+
+        self._requests = Counter()
+        self._checked_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._next_slot = 0.0
+        self._progress = {'state': 'stopped', 'total': 0, 'done': 0, 'failed': 0, 'current': None,
+                          'cycle_started': None, 'cycle_finished': None}
+
+    def record_request(self, tickers: Iterable[str]):
+        """Count user requests so popular tickers are refreshed first."""
+        with self._lock:
+            self._requests.update(tickers)
+
+    def prioritized(self) -> List[str]:
+        with self._lock:
+            requests = dict(self._requests)
+        tickers = self.universe + [ticker for ticker in requests if ticker not in self.universe]
+        order = {ticker: i for i, ticker in enumerate(tickers)}
+        return sorted(tickers, key=lambda ticker: (-requests.get(ticker, 0), order[ticker]))
+
+    def is_stale(self, ticker: str, close: Optional[pd.Timestamp] = None) -> bool:
+        close = last_market_close() if close is None else close
+        # An attempt that found no new bars (a holiday, a delisted ticker) isn't retried until the next close
+        checked_at = max(self.range_cache.store.written_at(ticker) or 0.0, self._checked_at.get(ticker, 0.0))
+        return checked_at < close.timestamp()
+
+    def progress(self) -> dict:
+        with self._lock:
+            return dict(self._progress)
+
+    def _update(self, **values):
+        with self._lock:
+            self._progress.update(values)
+
+    async def _throttle(self) -> bool:
+        """Wait for the next upstream request slot. Returns False if the scheduler was stopped."""
+        delay = self._next_slot - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        self._next_slot = max(self._next_slot, time.monotonic()) + 1.0 / self.rate_limit
+        return not self._stop.is_set()
+
+    def _seed(self, ticker: str):
+        """Store the database's bars of a ticker the price store doesn't have yet."""
+        if self.range_cache.store.written_at(ticker) is None and self.sql_store is not None:
+            stored = self.sql_store.read(ticker)
+            if not stored.empty:
+                self.range_cache.seed(ticker, stored[['Open', 'High', 'Low', 'Close', 'Volume']])
+
+    async def _refresh(self, ticker: str) -> bool:
+        # The database read and the store write block, and the loop is shared with web requests
+        await asyncio.to_thread(self._seed, ticker)
+
+        if self.range_cache.store.written_at(ticker) is None:
+            end = pd.Timestamp.today().normalize() + pd.Timedelta(days=1)
+            return await self.range_cache.fill(ticker, end - pd.Timedelta(days=self.history_days), end)
+        return await self.range_cache.refresh(ticker)
+
+    async def run_cycle(self):
+        """Warm or refresh every stale ticker once, in priority order."""
+        close = last_market_close()
+        # Reads the metadata of every ticker in the store
+        pending = await asyncio.to_thread(
+            lambda: [ticker for ticker in self.prioritized() if self.is_stale(ticker, close)]
+        )
+        self._update(state='refreshing', total=len(pending), done=0, failed=0, current=None,
+                     cycle_started=time.time(), cycle_finished=None)
+        if pending:
+            logger.info("Refreshing %d stale tickers...", len(pending))
+
+        for i, ticker in enumerate(pending):
+            if not await self._throttle():
+                break
+            self._update(current=ticker)
+            try:
+                with METRICS.span('refresh_ticker'):
+                    ok = await self._refresh(ticker)
+            except Exception as e:
+                logger.warning("Error refreshing %s: %r", ticker, e)
+                ok = False
+            METRICS.inc('stocker_refresh_tickers_total', outcome='ok' if ok else 'failed')
+            self._checked_at[ticker] = time.time()
+            with self._lock:
+                self._progress['done'] = i + 1
+                self._progress['failed'] += not ok
+            if (i + 1) % 100 == 0:
+                logger.info("Refreshed %d/%d tickers.", i + 1, len(pending))
+
+        progress = self.progress()
+        self._update(state='idle', current=None, cycle_finished=time.time())
+        if pending:
+            logger.info("Refresh complete: %d refreshed, %d failed.", progress['done'] - progress['failed'], progress['failed'])
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                # Cycles run on the shared runtime so fetchers can use its HTTP session
+                try:
+                    with METRICS.span('refresh_cycle'):
+                        # Paced by the rate limit, so a cycle can take far longer than a request
+                        self.runtime.run(self.run_cycle(), timeout=None)
+                except Exception as e:
+                    METRICS.inc('stocker_refresh_errors_total')
+                    logger.exception("Error in refresh cycle: %r", e)
+                # Cycles are cheap when nothing is stale, so polling also picks up newly requested tickers
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+        finally:
+            self._update(state='stopped', current=None)
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="refresh-scheduler", daemon=True)
+        self._thread.start()
+
+    def wake(self):
+        """Start the next cycle now instead of waiting for the poll interval."""
+        self._wake.set()
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
@@ -0,0 +1,247 @@
+import operator
+import re
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config import SCREENER_DEFAULT_LIMIT
+from data.fetchers.base_fetcher import OHLCV_COLUMNS
+from data.fetchers.processors.indicators import DEFAULT_INDICATORS
+from metrics import METRICS
+
+# Columns of the latest-value table: the last bar and the indicators process_stock_data adds
+SCREENER_COLUMNS = OHLCV_COLUMNS + DEFAULT_INDICATORS
+
+OPERATORS = {'<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge, '==': operator.eq, '!=': operator.ne}
+
+# Comparisons with the operands swapped, for "30 > RSI"
+FLIPPED = {'<': '>', '<=': '>=', '>': '<', '>=': '<=', '==': '==', '!=': '!='}
+
+_TOKEN = re.compile(r"\s*(?:(?P<number>[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)|(?P<op><=|>=|==|!=|<|>)"
+                    r"|(?P<name>[A-Za-z_%][A-Za-z0-9_%]*))")
+
+Operand = Tuple[str, object]  # ('column', name) or ('number', value)
+Condition = Tuple[Operand, str, Operand]
+
+def latest_values(df: pd.DataFrame, columns: Sequence[str] = SCREENER_COLUMNS) -> Optional[Tuple[str, Dict[str, float]]]:
+    """The date and values of the last row of a processed frame, for ScreenerIndex.update."""
+    if df.empty:
+        return None
+    row = df.iloc[-1]
+    return df.index[-1].strftime('%Y-%m-%d'), {column: float(row[column]) for column in columns if column in df.columns}
+
+def parse_query(query: str, columns: Sequence[str] = SCREENER_COLUMNS) -> List[List[Condition]]:
+    """
+    Parse a screen such as "RSI < 30 and Close > SMA_50" into OR-ed groups of AND-ed conditions.
+
+    A condition compares a column with a number or another column; "and" binds tighter than
+    "or". An empty query matches everything. Raises ValueError on anything else.
+    """
+    tokens = []
+    position = 0
+    query = (query or '').strip()
+    while position < len(query):
+        match = _TOKEN.match(query, position)
+        if match is None or match.end() == position:
+            raise ValueError(f"Unexpected input at '{query[position:].strip()}'.")
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind)))
+        position = match.end()
+
+    def operand(token) -> Operand:
+        kind, text = token
+        if kind == 'number':
+            return 'number', float(text)
+        if kind == 'name' and text in columns:
+            return 'column', text
+        if kind == 'name':
+            raise ValueError(f"Unknown column '{text}'. Available: {', '.join(columns)}")
+        raise ValueError(f"Expected a column or number, got '{text}'.")
+
+    groups: List[List[Condition]] = [[]] if tokens else []
+    i = 0
+    while i < len(tokens):
+        if i + 2 >= len(tokens) or tokens[i + 1][0] != 'op':
+            raise ValueError("Expected a comparison such as 'RSI < 30'.")
+        left, right = operand(tokens[i]), operand(tokens[i + 2])
+        if left[0] == 'number' and right[0] == 'number':
+            raise ValueError("A comparison needs at least one column.")
+        groups[-1].append((left, tokens[i + 1][1], right))
+        i += 3
+        if i == len(tokens):
+            break
+        joiner = tokens[i][1].lower() if tokens[i][0] == 'name' else None
+        if joiner not in ('and', 'or') or i + 1 == len(tokens):
+            raise ValueError("Join comparisons with 'and' or 'or'.")
+        if joiner == 'or':
+            groups.append([])
+        i += 1
+    return groups
+
+def query_columns(groups: List[List[Condition]]) -> List[str]:
+    """Columns a parsed query refers to, in order of appearance."""
+    columns = []
+    for group in groups:
+        for left, _, right in group:
+            for kind, value in (left, right):
+                if kind == 'column' and value not in columns:
+                    columns.append(value)
+    return columns
+
+class ScreenerIndex:
+    """
+    Latest bar and indicator values of every indexed ticker, for queries over the whole universe.
+
+    Values live in one (tickers x columns) float64 table. Each column also has a sorted
+    index (table rows ordered by value, NaN excluded) that is rebuilt lazily after updates,
+    so comparisons with a number are binary searches and top-N queries are slices; column
+    to column comparisons are vectorized over the table. No per-ticker history is touched.
+    """
+
+    def __init__(self, columns: Sequence[str] = SCREENER_COLUMNS, capacity: int = 1024):
+        self.columns = list(columns)
+        self._positions = {column: i for i, column in enumerate(self.columns)}
+        self._values = np.full((capacity, len(self.columns)), np.nan)
+        self._tickers: List[str] = []
+        self._as_of: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._sorted: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._tickers)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'tickers': len(self._tickers), 'sorted_columns': len(self._sorted)}
+
+    def update(self, ticker: str, as_of: str, values: Dict[str, float]):
+        with self._lock:
+            row = self._rows.get(ticker)
+            if row is None:
+                row = self._rows[ticker] = len(self._tickers)
+                self._tickers.append(ticker)
+                self._as_of.append(as_of)
+                if row == len(self._values):
+                    grown = np.full((2 * len(self._values), len(self.columns)), np.nan)
+                    grown[:row] = self._values
+                    self._values = grown
+            self._as_of[row] = as_of
+            self._values[row] = [values.get(column, np.nan) for column in self.columns]
+            self._sorted.clear()
+
+    def remove(self, ticker: str):
+        with self._lock:
+            row = self._rows.pop(ticker, None)
+            if row is None:
+                return
+            # Move the last row into the gap
+            last = len(self._tickers) - 1
+            if row != last:
+                moved = self._tickers[last]
+                self._tickers[row], self._as_of[row] = moved, self._as_of[last]
+                self._values[row] = self._values[last]
+                self._rows[moved] = row
+            self._tickers.pop()
+            self._as_of.pop()
+            self._values[last] = np.nan
+            self._sorted.clear()
+
+    def sync(self, latest: Dict[str, Tuple[str, Dict[str, float]]]):
+        """Make the index hold exactly the tickers in `latest`, as (date, values) per ticker."""
+        with self._lock:
+            removed = [ticker for ticker in self._rows if ticker not in latest]
+        for ticker in removed:
+            self.remove(ticker)
+        for ticker, (as_of, values) in latest.items():
+            self.update(ticker, as_of, values)
+
+    def _sorted_index(self, column: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Rows with a value in `column`, in ascending order of it, and those values."""
+        index = self._sorted.get(column)
+        if index is None:
+            values = self._values[:len(self._tickers), self._positions[column]]
+            order = np.argsort(values, kind='stable')
+            # argsort puts NaN last
+            order = order[:np.count_nonzero(~np.isnan(values))]
+            index = self._sorted[column] = (order, values[order])
+        return index
+
+    def _match(self, condition: Condition) -> np.ndarray:
+        (left_kind, left), op, (right_kind, right) = condition
+        rows = len(self._tickers)
+        if left_kind == 'column' and right_kind == 'column':
+            table = self._values[:rows]
+            with np.errstate(invalid='ignore'):
+                return OPERATORS[op](table[:, self._positions[left]], table[:, self._positions[right]])
+        if left_kind == 'number':
+            left, op, right = right, FLIPPED[op], left
+
+        order, values = self._sorted_index(left)
+        lo, hi = {
+            '<': (0, np.searchsorted(values, right, 'left')),
+            '<=': (0, np.searchsorted(values, right, 'right')),
+            '>': (np.searchsorted(values, right, 'right'), len(values)),
+            '>=': (np.searchsorted(values, right, 'left'), len(values)),
+            '==': (np.searchsorted(values, right, 'left'), np.searchsorted(values, right, 'right')),
+            '!=': (0, len(values)),
+        }[op]
+        mask = np.zeros(rows, dtype=bool)
+        mask[order[lo:hi]] = True
+        if op == '!=':
+            mask[order[np.searchsorted(values, right, 'left'):np.searchsorted(values, right, 'right')]] = False
+        return mask
+
+    def screen(self, query: str = '', sort_by: Optional[str] = None, descending: bool = True,
+               limit: Optional[int] = SCREENER_DEFAULT_LIMIT, columns: Optional[Sequence[str]] = None) -> dict:
+        """
+        Run `query` (see parse_query) over every indexed ticker.
+
+        Matches are ranked by `sort_by` (tickers without a value last) or else by ticker, and
+        at most `limit` are returned with the `columns` asked for (default: all). Raises
+        ValueError for invalid queries or column names.
+        """
+        groups = parse_query(query, self.columns)
+        if sort_by is not None and sort_by not in self._positions:
+            raise ValueError(f"Unknown column '{sort_by}'. Available: {', '.join(self.columns)}")
+        columns = self.columns if columns is None else list(columns)
+        unknown = [column for column in columns if column not in self._positions]
+        if unknown:
+            raise ValueError(f"Unknown column '{unknown[0]}'. Available: {', '.join(self.columns)}")
+
+        with self._lock, METRICS.span('screen'):
+            rows = len(self._tickers)
+            if groups:
+                mask = np.zeros(rows, dtype=bool)
+                for group in groups:
+                    group_mask = np.ones(rows, dtype=bool)
+                    for condition in group:
+                        group_mask &= self._match(condition)
+                    mask |= group_mask
+            else:
+                mask = np.ones(rows, dtype=bool)
+
+            if sort_by is not None:
+                order, _ = self._sorted_index(sort_by)
+                if descending:
+                    order = order[::-1]
+                unsorted = np.setdiff1d(np.arange(rows), order, assume_unique=True)
+                ranked = np.concatenate([order, unsorted])
+                ranked = ranked[mask[ranked]]
+            else:
+                ranked = np.flatnonzero(mask)
+                ranked = ranked[np.argsort([self._tickers[row] for row in ranked], kind='stable')]
+            count = len(ranked)
+            if limit is not None:
+                ranked = ranked[:limit]
+
+            positions = [self._positions[column] for column in columns]
+            values = self._values[ranked][:, positions]
+            results = [
+                {'ticker': self._tickers[row], 'as_of': self._as_of[row],
+                 **{column: (None if np.isnan(value) else float(value)) for column, value in zip(columns, row_values)}}
+                for row, row_values in zip(ranked, values)
+            ]
+        return {'count': count, 'tickers': rows, 'results': results}
@@ -0,0 +1,132 @@
+import threading
+from typing import Dict, Iterable, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from config import MEMORY_PRECISION
+
+# Float dtypes a precision policy can name
+PRECISIONS = {'float32': np.float32, 'float64': np.float64}
+
+# Significant decimal digits a float32 holds
+FLOAT32_DIGITS = 7
+
+# Powers of ten that are exact in float64
+_POWERS_OF_TEN = 10.0 ** np.arange(23)
+
+def float_dtype(precision: str = MEMORY_PRECISION) -> np.dtype:
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision '{precision}'. Available: {', '.join(PRECISIONS)}")
+    return np.dtype(PRECISIONS[precision])
+
+def shrink(values: np.ndarray, precision: str = MEMORY_PRECISION) -> np.ndarray:
+    """Copy float `values` at the policy's precision; integer values keep their dtype."""
+    values = np.asarray(values)
+    if values.dtype.kind in 'biu':
+        return values.copy()
+    return values.astype(float_dtype(precision))
+
+def restore(values: np.ndarray) -> np.ndarray:
+    """
+    Return `values` as float64.
+
+    float32 values are rounded to the significant digits a float32 holds, so that prices
+    read back as the decimals they were stored from (101.23, not 101.23000335693359) and
+    serialize just as compactly. Other dtypes are returned as they are.
+    """
+    if values.dtype != np.float32:
+        return values
+    restored = values.astype(np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        exponent = FLOAT32_DIGITS - 1 - np.floor(np.log10(np.abs(restored)))
+    # Zeros, NaN, inf and magnitudes beyond the exact powers of ten are left as they are
+    skip = ~(np.abs(exponent) < len(_POWERS_OF_TEN))
+    exponent[skip] = 0
+    exponent = exponent.astype(np.int64)
+    scale = _POWERS_OF_TEN[np.abs(exponent)]
+    if (exponent >= 0).all():
+        rounded = np.round(restored * scale) / scale
+    else:
+        rounded = np.where(exponent >= 0, np.round(restored * scale) / scale, np.round(restored / scale) * scale)
+    np.copyto(rounded, restored, where=skip)
+    return rounded
+
+class TradingCalendar:
+    """
+    Shared index of every trading day seen, per time zone.
+
+    Compact frames reference rows of the calendar instead of each carrying a DatetimeIndex:
+    a contiguous run of trading days is just a slice, and only histories with gaps (e.g.
+    halted days) store int32 positions. The calendar grows by replacing its index; frames
+    keep the index they were built against, so they never need remapping.
+    """
+
+    def __init__(self):
+        self._indexes: Dict[str, pd.DatetimeIndex] = {}
+        self._lock = threading.Lock()
+
+    def locate(self, index: pd.DatetimeIndex) -> Tuple[pd.DatetimeIndex, Union[slice, np.ndarray]]:
+        """Return the calendar covering the sorted, unique `index` and the rows of it `index` is."""
+        key = str(index.tz)
+        with self._lock:
+            calendar = self._indexes.get(key)
+            if calendar is None:
+                # A copy, so the calendar never references a caller's (or a memory-mapped) buffer
+                calendar = self._indexes[key] = index.copy(deep=True)
+            elif not index.isin(calendar).all():
+                calendar = self._indexes[key] = calendar.union(index)
+        positions = calendar.get_indexer(index)
+        if not len(positions):
+            return calendar, slice(0, 0)
+        if positions[-1] - positions[0] == len(positions) - 1:
+            return calendar, slice(int(positions[0]), int(positions[-1]) + 1)
+        return calendar, positions.astype(np.int32)
+
+    @property
+    def nbytes(self) -> int:
+        with self._lock:
+            return sum(index.nbytes for index in self._indexes.values())
+
+class CompactFrame:
+    """
+    One ticker's columns in compact form: arrays at the precision policy's float dtype,
+    integer columns (volume) as integers, and rows of a shared TradingCalendar index.
+    """
+
+    __slots__ = ('calendar', 'rows', 'arrays')
+
+    def __init__(self, calendar: pd.DatetimeIndex, rows: Union[slice, np.ndarray], arrays: Dict[str, np.ndarray]):
+        self.calendar = calendar
+        self.rows = rows
+        self.arrays = arrays
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self.arrays)
+
+    @property
+    def index(self) -> pd.DatetimeIndex:
+        return self.calendar[self.rows]
+
+    def __len__(self) -> int:
+        return self.rows.stop - self.rows.start if isinstance(self.rows, slice) else len(self.rows)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by this frame alone; the shared calendar is accounted for once, by TradingCalendar."""
+        rows = 0 if isinstance(self.rows, slice) else self.rows.nbytes
+        return rows + sum(values.nbytes for values in self.arrays.values())
+
+    def to_frame(self) -> pd.DataFrame:
+        """A float64 DataFrame of the stored values (see `restore`)."""
+        return pd.DataFrame({column: restore(values) for column, values in self.arrays.items()}, index=self.index)
+
+def compact_frame(df: pd.DataFrame, calendar: TradingCalendar, precision: str = MEMORY_PRECISION,
+                  drop: Iterable[str] = ()) -> CompactFrame:
+    """Compact `df`, which must have a sorted DatetimeIndex without duplicates, leaving out `drop` columns."""
+    drop = set(drop)
+    index, rows = calendar.locate(df.index)
+    return CompactFrame(index, rows, {
+        column: shrink(df[column].to_numpy(), precision) for column in df.columns if column not in drop
+    })
@@ -0,0 +1 @@
+# This file makes 'stocker.data.storage' a Python package.
\ No newline at end of file
@@ -0,0 +1,109 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config import CACHE_TIMEOUT, MEMORY_CACHE_MAX_BYTES
+from .compact import CompactFrame
+
+def estimate_nbytes(value: Any) -> int:
+    """Approximate memory held by a cached value: frames, series, arrays and tuples, lists or dicts of them."""
+    if isinstance(value, (np.ndarray, CompactFrame)):
+        return int(value.nbytes)
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True))
+    if isinstance(value, pd.Index):
+        return int(value.nbytes)
+    if isinstance(value, (tuple, list)):
+        return sum(estimate_nbytes(item) for item in value)
+    if isinstance(value, dict):
+        return sum(estimate_nbytes(item) for item in value.values())
+    return 64
+
+class MemoryCache:
+    """
+    Thread-safe in-process LRU cache bounded by a byte budget.
+
+    Entries expire `ttl` seconds after they were stored. When adding an entry would exceed
+    `max_bytes`, least recently used entries are evicted until it fits; a single entry larger
+    than the whole budget is not cached at all. Hits, misses and evictions are counted.
+    """
+
+    def __init__(self, max_bytes: int = MEMORY_CACHE_MAX_BYTES, ttl: Optional[float] = CACHE_TIMEOUT):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: 'OrderedDict[Hashable, Tuple[Any, int, float]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _drop(self, key: Hashable):
+        _, size, _ = self._entries.pop(key)
+        self.nbytes -= size
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, _, stored_at = entry
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                self._drop(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, nbytes: Optional[int] = None):
+        size = estimate_nbytes(value) if nbytes is None else nbytes
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            if size > self.max_bytes:
+                return
+            while self._entries and self.nbytes + size > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+            self._entries[key] = (value, size, time.monotonic())
+            self.nbytes += size
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def usage(self) -> Dict[Hashable, int]:
+        """Bytes held per key."""
+        with self._lock:
+            return {key: size for key, (_, size, _) in self._entries.items()}
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.nbytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
@@ -0,0 +1,254 @@
+import fcntl
+import json
+import os
+import pickle
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config import PRICE_STORE_DIR
+
+def write_frame(directory: str, df: pd.DataFrame, name: str) -> dict:
+    """
+    Save `df` in a new `directory` as index.npy (int64 UTC nanoseconds) and one row-major 2D
+    .npy array per dtype; returns the layout (tz, rows, blocks) for map_frame and frame_view.
+    """
+    if not isinstance(df.index, pd.DatetimeIndex):
+        raise ValueError(f"Expected a DatetimeIndex for ticker '{name}', got {type(df.index).__name__}.")
+    os.makedirs(directory)
+
+    tz = str(df.index.tz) if df.index.tz is not None else None
+    index = df.index.tz_convert('UTC').tz_localize(None) if tz else df.index
+    np.save(os.path.join(directory, 'index.npy'), index.values.astype('datetime64[ns]').view('int64'))
+
+    groups: Dict[np.dtype, List[str]] = {}
+    for column, dtype in df.dtypes.items():
+        if dtype.kind not in 'biuf':
+            raise ValueError(f"Column '{column}' of ticker '{name}' has non-numeric dtype {dtype}.")
+        groups.setdefault(dtype, []).append(column)
+
+    blocks = []
+    for dtype, columns in groups.items():
+        file_name = f"{np.dtype(dtype).name}.npy"
+        np.save(os.path.join(directory, file_name), np.ascontiguousarray(df[columns].to_numpy(dtype=dtype)))
+        blocks.append({'file': file_name, 'columns': columns})
+    return {'tz': tz, 'rows': len(df), 'blocks': blocks}
+
+def map_frame(directory: str, layout: dict) -> Tuple[np.ndarray, List[np.ndarray]]:
+    """Memory-map the index and blocks written by write_frame. Raises FileNotFoundError once they are deleted."""
+    index = np.load(os.path.join(directory, 'index.npy'), mmap_mode='r')
+    return index, [np.load(os.path.join(directory, block['file']), mmap_mode='r') for block in layout['blocks']]
+
+def frame_view(layout: dict, index: np.ndarray, blocks: List[np.ndarray], lo: int = 0, hi: Optional[int] = None) -> pd.DataFrame:
+    """Rows [lo, hi) of a mapped frame as a DataFrame backed by the mapped memory."""
+    hi = len(index) if hi is None else hi
+    dates = pd.DatetimeIndex(index[lo:hi].view('datetime64[ns]'))
+    if layout['tz']:
+        dates = dates.tz_localize('UTC').tz_convert(layout['tz'])
+    frames = [
+        pd.DataFrame(values[lo:hi], index=dates, columns=block['columns'], copy=False)
+        for block, values in zip(layout['blocks'], blocks)
+    ]
+    if not frames:
+        return pd.DataFrame(index=dates)
+    return frames[0] if len(frames) == 1 else pd.concat(frames, axis=1, copy=False)
+
+class PriceStore:
+    """
+    Columnar on-disk store for processed price frames.
+
+    Each ticker is kept as a set of NumPy .npy files: the index as int64 nanoseconds
+    (UTC) and one row-major 2D array per dtype holding the data columns. Reads memory-map
+    the files and use a binary search on the index, so fetching a date range only touches
+    the pages of the requested rows and returns DataFrames backed by the mapped memory
+    without copying or decoding anything.
+
+    Writes go to a fresh version directory that is published by atomically replacing the
+    ticker's CURRENT pointer, so readers never observe a half-written ticker. Writers of a
+    ticker, in any process, are serialized by a lock file in its directory, so removing
+    the versions a write replaces never deletes another writer's version in progress, and
+`update` can read, merge and write a ticker without losing another process's write.
+
+    Frames read from the store are read-only views; columns are grouped by dtype.
+    """
+
+    def __init__(self, root: str = PRICE_STORE_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+        self._mapped: Dict[str, Tuple[str, dict, np.ndarray, List[np.ndarray]]] = {}
+        os.makedirs(self.root, exist_ok=True)
+
+    def _ticker_dir(self, ticker: str) -> str:
+        return os.path.join(self.root, ticker.replace(os.sep, '_'))
+
+    def _current_version(self, ticker: str) -> Optional[str]:
+        try:
+            with open(os.path.join(self._ticker_dir(ticker), 'CURRENT')) as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return None
+
+    @contextmanager
+    def _write_lock(self, ticker: str):
+        """Hold the exclusive per-ticker lock that every process writing `ticker` takes."""
+        ticker_dir = self._ticker_dir(ticker)
+        os.makedirs(ticker_dir, exist_ok=True)
+        with open(os.path.join(ticker_dir, 'LOCK'), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield ticker_dir
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def write(self, ticker: str, df: pd.DataFrame, coverage: Optional[List[Tuple[str, str]]] = None):
+        """
+        Persist `df` as the new version of `ticker`, replacing any previous one.
+
+        `coverage` optionally records the [start, end) date ranges that were requested upstream,
+        including days without bars, so callers can tell what is missing.
+        """
+        with self._write_lock(ticker) as ticker_dir:
+            self._publish(ticker, ticker_dir, df, coverage)
+
+    def update(self, ticker: str, fn: Callable[[Optional[pd.DataFrame], List[Tuple[str, str]], Optional[float]],
+                                                  Tuple[pd.DataFrame, List[Tuple[str, str]]]]):
+        """
+        Replace `ticker` with `fn(frame, coverage, written_at)` of its current version, atomically.
+
+        `fn` gets None, [] and None if the ticker isn't stored, and returns the new frame and
+        coverage. The lock is held from the read to the write, so concurrent updates of the
+        ticker, in any process, each see the result of the previous one.
+        """
+        with self._write_lock(ticker) as ticker_dir:
+            mapped = self._open(ticker)
+            if mapped is None:
+                df, coverage = fn(None, [], None)
+            else:
+                _, meta, index, blocks = mapped
+                df, coverage = fn(frame_view(meta, index, blocks), [tuple(interval) for interval in meta['coverage']],
+                                  meta['written_at'])
+            self._publish(ticker, ticker_dir, df, coverage)
+
+    def _publish(self, ticker: str, ticker_dir: str, df: pd.DataFrame, coverage: Optional[List[Tuple[str, str]]]):
+        # Called with the ticker's write lock held
+        version = f"v{time.time_ns()}"
+        version_dir = os.path.join(ticker_dir, version)
+
+        meta = dict(write_frame(version_dir, df, ticker), written_at=time.time(), coverage=coverage or [])
+        with open(os.path.join(version_dir, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+
+        pointer = os.path.join(ticker_dir, 'CURRENT')
+        with open(pointer + '.tmp', 'w') as f:
+            f.write(version)
+        os.replace(pointer + '.tmp', pointer)
+
+        # Readers that already mapped an old version keep their mapping until they are done.
+        for name in os.listdir(ticker_dir):
+            if name.startswith('v') and name != version:
+                shutil.rmtree(os.path.join(ticker_dir, name), ignore_errors=True)
+
+    def _open(self, ticker: str) -> Optional[Tuple[str, dict, np.ndarray, List[np.ndarray]]]:
+        version = self._current_version(ticker)
+        if version is None:
+            return None
+        with self._lock:
+            mapped = self._mapped.get(ticker)
+            if mapped is not None and mapped[0] == version:
+                return mapped
+
+            version_dir = os.path.join(self._ticker_dir(ticker), version)
+            try:
+                with open(os.path.join(version_dir, 'meta.json')) as f:
+                    meta = json.load(f)
+                index, blocks = map_frame(version_dir, meta)
+            except FileNotFoundError:
+                # Replaced by a concurrent write between reading CURRENT and mapping the files.
+                return None
+            mapped = self._mapped[ticker] = (version, meta, index, blocks)
+            return mapped
+
+    @staticmethod
+    def _bound(value, tz: Optional[str], end: bool) -> int:
+        ts = pd.Timestamp(value)
+        if end and ts == ts.normalize() and not (isinstance(value, str) and ':' in value):
+            # A bare date includes the whole day, like df.loc[start_date:end_date].
+            ts = ts + pd.Timedelta(days=1) - pd.Timedelta(1, unit='ns')
+        if tz:
+            ts = ts.tz_localize(tz) if ts.tzinfo is None else ts
+            ts = ts.tz_convert('UTC').tz_localize(None)
+        elif ts.tzinfo is not None:
+            ts = ts.tz_convert('UTC').tz_localize(None)
+        return ts.value
+
+    def read(self, ticker: str, start_date=None, end_date=None, max_age: Optional[float] = None) -> Optional[pd.DataFrame]:
+        """
+        Return the rows of `ticker` between `start_date` and `end_date` (inclusive).
+
+        Returns None if the ticker is not stored or was written more than `max_age` seconds ago.
+        """
+        return self.read_versioned(ticker, start_date, end_date, max_age)[0]
+
+    def read_versioned(self, ticker: str, start_date=None, end_date=None,
+                       max_age: Optional[float] = None) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
+        """Like `read`, also returning the version the rows came from, for keying derived data."""
+        mapped = self._open(ticker)
+        if mapped is None:
+            return None, None
+        version, meta, index, blocks = mapped
+        if max_age is not None and time.time() - meta['written_at'] > max_age:
+            return None, None
+
+        tz = meta['tz']
+        lo = 0 if start_date is None else int(np.searchsorted(index, self._bound(start_date, tz, False), side='left'))
+        hi = len(index) if end_date is None else int(np.searchsorted(index, self._bound(end_date, tz, True), side='right'))
+        hi = max(lo, hi)
+
+        return frame_view(meta, index, blocks, lo, hi), version
+
+    def version(self, ticker: str) -> Optional[str]:
+        """The published version of `ticker`, without mapping it; it changes on every write."""
+        return self._current_version(ticker)
+
+    def written_at(self, ticker: str) -> Optional[float]:
+        mapped = self._open(ticker)
+        return mapped[1]['written_at'] if mapped is not None else None
+
+    def coverage(self, ticker: str) -> List[Tuple[str, str]]:
+        mapped = self._open(ticker)
+        return [tuple(interval) for interval in mapped[1].get('coverage', [])] if mapped is not None else []
+
+    def read_state(self, ticker: str, name: str) -> Any:
+        """The object last saved as `name` for `ticker` by `write_state`, or None."""
+        try:
+            with open(os.path.join(self._ticker_dir(ticker), f"{name}.pkl"), 'rb') as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+
+    def write_state(self, ticker: str, name: str, state: Any):
+        """
+        Save a picklable object derived from a stored ticker's bars, e.g. indicator state, as `name`.
+
+        It is kept next to the versions, across writes, which don't check it against the bars
+        they store, until the ticker is deleted. Replaced atomically, so readers in any process
+        see either the previous state or this one.
+        """
+        path = os.path.join(self._ticker_dir(ticker), f"{name}.pkl")
+        temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary, 'wb') as f:
+            pickle.dump(state, f)
+        os.replace(temporary, path)
+
+    def tickers(self) -> List[str]:
+        return sorted(name for name in os.listdir(self.root) if self._current_version(name) is not None)
+
+    def delete(self, ticker: str):
+        with self._lock:
+            self._mapped.pop(ticker, None)
+        shutil.rmtree(self._ticker_dir(ticker), ignore_errors=True)
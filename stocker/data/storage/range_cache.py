@@ -0,0 +1,235 @@
+import asyncio
+import time
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config import CACHE_TIMEOUT, RANGE_REFRESH_DAYS
+from data.fetchers.base_fetcher import BaseFetcher
+from data.fetchers.processors.indicators import ALL_INDICATORS
+from metrics import METRICS
+from .compact import TradingCalendar, compact_frame
+from .memory_cache import MemoryCache
+from .price_store import PriceStore
+from .shared_frames import SharedFrameStore
+from .single_flight import SingleFlight
+
+# Half-open [start, end) range of calendar days, like yfinance's start/end
+Interval = Tuple[pd.Timestamp, pd.Timestamp]
+
+def merge_intervals(intervals: List[Interval]) -> List[Interval]:
+    """Sort intervals and merge the ones that overlap or touch."""
+    merged: List[Interval] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+def subtract_intervals(wanted: Interval, covered: List[Interval]) -> List[Interval]:
+    """Parts of `wanted` not inside any of the `covered` intervals."""
+    gaps = []
+    cursor, end = wanted
+    for covered_start, covered_end in merge_intervals(covered):
+        if covered_end <= cursor:
+            continue
+        if covered_start >= end:
+            break
+        if covered_start > cursor:
+            gaps.append((cursor, covered_start))
+        cursor = max(cursor, covered_end)
+    if cursor < end:
+        gaps.append((cursor, end))
+    return gaps
+
+def bars_to_days(bars: int) -> int:
+    """Calendar days that safely contain `bars` trading days, allowing for weekends and holidays."""
+    return int(np.ceil(bars * 7 / 5)) + 10 if bars else 0
+
+class RangeCache:
+    """
+    Date-range aware front for the price store.
+
+    The store records which [start, end) ranges have been requested upstream for each
+    ticker. A request only fetches the sub-ranges that are not covered yet (plus enough
+    bars before the start for indicators to warm up), merges them into the stored history
+    and never drops bars that were already there. Once a ticker's data is older than
+    `max_age`, the last `refresh_days` days are treated as missing so new bars get picked up.
+
+    With a `memory` cache, compact copies (see data.storage.compact) of the histories of
+    recently requested tickers are kept in process, so repeated requests for covered ranges
+    touch neither disk nor JSON. Their prices stay float64 whatever MEMORY_PRECISION is:
+    indicators are computed from them, and must match the ones persisted from the store. With a `shared` store (see data.storage.shared_frames),
+    tickers whose published frame is of the stored version and covers the request are
+    served from it instead, indicators included, without a per-process copy.
+
+    Concurrent requests for the same ticker and range, from any thread, share a single
+    upstream fetch and processing run; merges into a ticker's history, from any process,
+    are serialized by the store (see PriceStore.update).
+    """
+
+    def __init__(self, store: PriceStore, fetcher: BaseFetcher, max_age: float = CACHE_TIMEOUT,
+                 refresh_days: int = RANGE_REFRESH_DAYS,
+                 on_write: Optional[Callable[[str, pd.DataFrame], None]] = None,
+                 memory: Optional[MemoryCache] = None, shared: Optional[SharedFrameStore] = None):
+        self.store = store
+        self.fetcher = fetcher
+        self.max_age = max_age
+        self.refresh_days = refresh_days
+        # Called with (ticker, newly fetched bars) after the store has been updated
+        self.on_write = on_write
+        self.memory = memory
+        self.shared = shared
+        # Cached histories reference one shared index of trading days
+        self.calendar = TradingCalendar()
+        self.flights = SingleFlight()
+
+    def _fresh_coverage(self, intervals: List[Tuple[str, str]], written_at: Optional[float]) -> List[Interval]:
+        intervals = [(pd.Timestamp(start), pd.Timestamp(end)) for start, end in intervals]
+        if written_at is not None and time.time() - written_at > self.max_age:
+            cutoff = pd.Timestamp.today().normalize() - pd.Timedelta(days=self.refresh_days)
+            intervals = [(start, min(end, cutoff)) for start, end in intervals if start < cutoff]
+        return merge_intervals(intervals)
+
+    def coverage(self, ticker: str) -> List[Interval]:
+        return self._fresh_coverage(self.store.coverage(ticker), self.store.written_at(ticker))
+
+    @staticmethod
+    def _wanted(start_date, end_date, lookback_bars: int) -> Interval:
+        start = pd.Timestamp(start_date).normalize() - pd.Timedelta(days=bars_to_days(lookback_bars))
+        return start, pd.Timestamp(end_date).normalize()
+
+    def missing_ranges(self, ticker: str, start_date, end_date, lookback_bars: int = 0) -> List[Interval]:
+        return subtract_intervals(self._wanted(start_date, end_date, lookback_bars), self.coverage(ticker))
+
+    @staticmethod
+    def _merge(frames: List[pd.DataFrame]) -> pd.DataFrame:
+        tz = next((df.index.tz for df in frames if df.index.tz is not None), None)
+        aligned = []
+        for df in frames:
+            df = df.drop(columns=[col for col in ALL_INDICATORS if col in df.columns])
+            if tz is not None and df.index.tz is None:
+                df = df.tz_localize(tz)
+            elif tz is not None:
+                df = df.tz_convert(tz)
+            aligned.append(df)
+        merged = pd.concat(aligned)
+        # Later frames are fresher, so they win on overlapping dates
+        return merged[~merged.index.duplicated(keep='last')].sort_index()
+
+    def _store(self, ticker: str, frames: List[pd.DataFrame], intervals: List[Interval]):
+        """Merge `frames` into the stored history and mark `intervals` as covered."""
+        def merge(existing, coverage, written_at):
+            # Other threads and processes may be merging other ranges of the ticker; the store
+            # holds its lock until this result is written, so neither side loses bars or coverage
+            if existing is not None and not existing.empty:
+                merged = self._merge([existing] + frames)
+            else:
+                merged = self._merge(frames)
+            covered = merge_intervals(self._fresh_coverage(coverage, written_at) + intervals)
+            return merged, [(start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')) for start, end in covered]
+
+        with METRICS.span('store_write'):
+            self.store.update(ticker, merge)
+            if self.memory is not None:
+                self.memory.invalidate(ticker)
+
+    async def _fetch(self, ticker: str, gaps: List[Interval]) -> bool:
+        with METRICS.span('upstream_fetch'):
+            results = await asyncio.gather(*(
+                self.fetcher.fetch_data(ticker, start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d'))
+                for start, end in gaps
+            ))
+        fetched = [(gap, df) for gap, df in zip(gaps, results) if not df.empty]
+        if not fetched:
+            return False
+
+        # A full rewrite of the ticker's files, kept off the loop that every request shares
+        await asyncio.to_thread(self._store, ticker, [df for _, df in fetched], [gap for gap, _ in fetched])
+        if self.on_write is not None:
+            with METRICS.span('on_write'):
+                self.on_write(ticker, self._merge([df for _, df in fetched]))
+        return True
+
+    async def fill(self, ticker: str, start_date, end_date, lookback_bars: int = 0) -> bool:
+        """Fetch and store whatever part of the range is missing. Returns False if nothing could be fetched."""
+        gaps = self.missing_ranges(ticker, start_date, end_date, lookback_bars)
+        if not gaps:
+            return True
+        return await self._fetch(ticker, gaps)
+
+    async def refresh(self, ticker: str, end_date=None) -> bool:
+        """
+        Fetch the bars after the last stored one, regardless of age.
+
+        The last stored day is fetched again since it may have been a partial bar. Returns
+        False if the ticker isn't stored or nothing could be fetched.
+        """
+        df = await asyncio.to_thread(self.store.read, ticker)
+        if df is None or df.empty:
+            return False
+        start = df.index[-1].replace(tzinfo=None).normalize()
+        end = (pd.Timestamp.today() if end_date is None else pd.Timestamp(end_date)).normalize() + pd.Timedelta(days=1)
+        return await self.flights.do((ticker, start, end), lambda: self._fetch(ticker, [(start, end)]))
+
+    def seed(self, ticker: str, df: pd.DataFrame):
+        """
+        Store bars obtained elsewhere (e.g. from the database) as covering the runs of trading days they span.
+
+        A run ends where more than one weekday in a row has no bar: a market holiday doesn't
+        do that, a range that was never fetched does, and stays missing.
+        """
+        if df.empty:
+            return
+        days = (df.index.tz_localize(None) if df.index.tz is not None else df.index).normalize()
+        dates = days.values.astype('datetime64[D]')
+        breaks = np.flatnonzero(np.busday_count(dates[:-1] + 1, dates[1:]) > 1) + 1
+        starts, ends = np.concatenate(([0], breaks)), np.concatenate((breaks, [len(days)])) - 1
+        self._store(ticker, [df], [(days[start], days[end] + pd.Timedelta(days=1)) for start, end in zip(starts, ends)])
+
+    async def get(self, ticker: str, start_date, end_date,
+                  lookback_bars: int = 0) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
+        """
+        Return the ticker's full stored history, after filling gaps in [start_date - lookback, end_date).
+
+        The whole history is returned (memory-mapped, or rebuilt from the memory tier) together
+        with the store version so that derived indicators can be memoized per version; callers
+        slice the range they show. Frames from the shared store also carry the default indicators.
+        """
+        wanted = self._wanted(start_date, end_date, lookback_bars)
+        if self.shared is not None:
+            df, entry = self.shared.read(ticker)
+            # A frame published from older bars than the store holds is never served
+            if (df is not None and entry['version'] == self.store.version(ticker)
+                    and not subtract_intervals(wanted, self._fresh_coverage(entry['coverage'], entry['written_at']))):
+                METRICS.inc('stocker_cache_requests_total', cache='shared', result='hit')
+                return df, entry['version']
+            METRICS.inc('stocker_cache_requests_total', cache='shared', result='miss')
+        if self.memory is not None:
+            cached = self.memory.get(ticker)
+            if cached is not None:
+                compact, version, intervals, written_at = cached
+                if not subtract_intervals(wanted, self._fresh_coverage(intervals, written_at)):
+                    METRICS.inc('stocker_cache_requests_total', cache='range', result='hit')
+                    return compact.to_frame(), version
+
+        METRICS.inc('stocker_cache_requests_total', cache='range', result='miss')
+        return await self.flights.do((ticker, *wanted), lambda: self._load(ticker, start_date, end_date, lookback_bars))
+
+    async def _load(self, ticker: str, start_date, end_date, lookback_bars: int) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
+        await self.fill(ticker, start_date, end_date, lookback_bars)
+        # Compacting copies the whole history
+        return await asyncio.to_thread(self._read, ticker)
+
+    def _read(self, ticker: str) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
+        with METRICS.span('store_read'):
+            df, version = self.store.read_versioned(ticker)
+        if self.memory is not None and df is not None:
+            # Compacted out of the memory map, so hits never fault pages in from disk; misses
+            # return the same values later hits will
+            compact = compact_frame(df, self.calendar, 'float64')
+            self.memory.set(ticker, (compact, version, self.store.coverage(ticker), self.store.written_at(ticker)))
+            df = compact.to_frame()
+        return df, version
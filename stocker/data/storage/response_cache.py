@@ -0,0 +1,66 @@
+import gzip
+import threading
+from typing import Dict, Hashable, Optional, Tuple
+
+from config import CACHE_TIMEOUT, RESPONSE_CACHE_COMPRESS_LEVEL, RESPONSE_CACHE_MAX_BYTES
+from metrics import METRICS
+from .memory_cache import MemoryCache
+from .price_store import PriceStore
+
+class ResponseCache:
+    """
+    Serialized responses keyed by a normalized query signature.
+
+    Bodies are kept gzip-compressed (unless `compress_level` is 0) along with the price store
+    version of every ticker they were built from. A lookup only hits while each of those
+    tickers is still at that version, so a refresh invalidates the responses built from the
+    old bars, including refreshes written by another process. Entries also expire after
+    `ttl` seconds, like the stored ranges they were built from.
+    """
+
+    def __init__(self, store: PriceStore, max_bytes: int = RESPONSE_CACHE_MAX_BYTES, ttl: Optional[float] = CACHE_TIMEOUT,
+                 compress_level: int = RESPONSE_CACHE_COMPRESS_LEVEL):
+        self.store = store
+        self.compress_level = compress_level
+        self.memory = MemoryCache(max_bytes, ttl)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    def get(self, key: Hashable, accept_gzip: bool = False) -> Optional[Tuple[bytes, Optional[str]]]:
+        """Return the body and its content encoding ('gzip' only if `accept_gzip`), or None on a miss."""
+        entry = self.memory.get(key)
+        stale = entry is not None and any(self.store.version(ticker) != version for ticker, version in entry[2].items())
+        if stale:
+            self.memory.invalidate(key)
+            entry = None
+        with self._lock:
+            self.hits += entry is not None
+            self.misses += entry is None
+            self.stale += stale
+        METRICS.inc('stocker_cache_requests_total', cache='response', result='miss' if entry is None else 'hit')
+        if entry is None:
+            return None
+        body, compressed, _ = entry
+        if compressed and not accept_gzip:
+            return gzip.decompress(body), None
+        return body, 'gzip' if compressed else None
+
+    def set(self, key: Hashable, body: bytes, versions: Dict[str, str]):
+        """Cache `body`, built from the given store version of each ticker."""
+        compressed = self.compress_level > 0
+        if compressed:
+            body = gzip.compress(body, self.compress_level, mtime=0)
+        self.memory.set(key, (body, compressed, dict(versions)), nbytes=len(body))
+
+    @property
+    def nbytes(self) -> int:
+        return self.memory.nbytes
+
+    def stats(self) -> Dict[str, int]:
+        stats = self.memory.stats()
+        # The memory tier counts lookups of stale entries as hits
+        with self._lock:
+            stats.update(hits=self.hits, misses=self.misses, stale=self.stale)
+        return stats
@@ -0,0 +1,148 @@
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .price_store import frame_view, map_frame, write_frame
+
+class SharedFrameStore:
+    """
+    Processed per-ticker frames published by one process and memory-mapped by many.
+
+    Frames are written in the price store's columnar layout (see price_store.write_frame)
+    to their own directory under frames/, then published together by writing a manifest
+    of every ticker's entry (directory, layout, the price store version it was built from,
+    coverage and last row) and atomically replacing the MANIFEST pointer. Readers, e.g.
+    every gunicorn worker, pick up the new manifest on their next read, so a refresh of
+    any number of tickers is one swap, and map the files read-only: the pages live once in
+    the OS page cache however many processes read them, and frames are views of them.
+
+    Only one process may call `publish`. Frames it supersedes are deleted right away;
+    processes that mapped them keep their mapping until they are done.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.Lock()
+        self._manifest: Optional[dict] = None
+        self._mapped: Dict[str, Tuple[str, np.ndarray, List[np.ndarray]]] = {}
+        os.makedirs(os.path.join(self.root, 'frames'), exist_ok=True)
+
+    def generation(self) -> Optional[str]:
+        """Name of the published manifest; it changes on every publish."""
+        try:
+            with open(os.path.join(self.root, 'MANIFEST')) as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return None
+
+    def manifest(self) -> dict:
+        """The published manifest: {'generation', 'published_at', 'tickers': {ticker: entry}}."""
+        for _ in range(3):
+            generation = self.generation()
+            with self._lock:
+                if self._manifest is not None and self._manifest['generation'] == generation:
+                    return self._manifest
+            if generation is None:
+                manifest = {'generation': None, 'published_at': None, 'tickers': {}}
+            else:
+                try:
+                    with open(os.path.join(self.root, f"{generation}.json")) as f:
+                        manifest = json.load(f)
+                except FileNotFoundError:
+                    # Replaced by a newer publish between reading MANIFEST and opening it
+                    continue
+            tickers = manifest['tickers']
+            with self._lock:
+                self._manifest = manifest
+                # Unmap frames the new manifest no longer refers to
+                self._mapped = {ticker: mapped for ticker, mapped in self._mapped.items()
+                                if ticker in tickers and tickers[ticker]['dir'] == mapped[0]}
+            return manifest
+        with self._lock:
+            return self._manifest or {'generation': None, 'published_at': None, 'tickers': {}}
+
+    def tickers(self) -> List[str]:
+        return sorted(self.manifest()['tickers'])
+
+    def read(self, ticker: str) -> Tuple[Optional[pd.DataFrame], Optional[dict]]:
+        """The published frame of `ticker` (a read-only view of the mapped files) and its manifest entry."""
+        entry = self.manifest()['tickers'].get(ticker)
+        if entry is None:
+            return None, None
+        with self._lock:
+            mapped = self._mapped.get(ticker)
+            if mapped is None or mapped[0] != entry['dir']:
+                try:
+                    index, blocks = map_frame(os.path.join(self.root, entry['dir']), entry)
+                except FileNotFoundError:
+                    # Superseded by a publish since the manifest was read
+                    return None, None
+                mapped = self._mapped[ticker] = (entry['dir'], index, blocks)
+        _, index, blocks = mapped
+        return frame_view(entry, index, blocks), entry
+
+    def write(self, ticker: str, df: pd.DataFrame, version: str, coverage: List[Tuple[str, str]],
+              written_at: Optional[float], latest: Optional[Tuple[str, Dict[str, float]]] = None) -> dict:
+        """
+        Write the processed frame of `ticker`, built from price store `version`, without publishing it.
+
+        Returns its manifest entry for `publish`. Safe to call from any process.
+        """
+        directory = os.path.join('frames', ticker.replace(os.sep, '_'), f"{version}.{time.time_ns()}")
+        layout = write_frame(os.path.join(self.root, directory), df, ticker)
+        return dict(layout, dir=directory, version=version, coverage=[list(interval) for interval in coverage],
+                    written_at=written_at, latest=latest)
+
+    def publish(self, entries: Dict[str, dict], removed: Iterable[str] = ()) -> str:
+        """Atomically replace the entries of the tickers in `entries` and drop `removed`; returns the new generation."""
+        previous = self.manifest()
+        tickers = dict(previous['tickers'])
+        superseded = [tickers.pop(ticker)['dir'] for ticker in [*entries, *removed] if ticker in tickers]
+        tickers.update(entries)
+
+        generation = f"g{time.time_ns()}"
+        with open(os.path.join(self.root, f"{generation}.json"), 'w') as f:
+            json.dump({'generation': generation, 'published_at': time.time(), 'tickers': tickers}, f)
+        pointer = os.path.join(self.root, 'MANIFEST')
+        with open(pointer + '.tmp', 'w') as f:
+            f.write(generation)
+        os.replace(pointer + '.tmp', pointer)
+
+        for directory in superseded:
+            shutil.rmtree(os.path.join(self.root, directory), ignore_errors=True)
+        for ticker in removed:
+            shutil.rmtree(os.path.join(self.root, 'frames', ticker.replace(os.sep, '_')), ignore_errors=True)
+        if previous['generation'] is not None:
+            try:
+                os.remove(os.path.join(self.root, f"{previous['generation']}.json"))
+            except FileNotFoundError:
+                pass
+        return generation
+
+    def prune(self):
+        """Delete frames and manifests the published manifest doesn't refer to, e.g. left by an interrupted publish."""
+        manifest = self.manifest()
+        published = {entry['dir'] for entry in manifest['tickers'].values()}
+        frames_dir = os.path.join(self.root, 'frames')
+        for ticker_dir in os.listdir(frames_dir):
+            for name in os.listdir(os.path.join(frames_dir, ticker_dir)):
+                if os.path.join('frames', ticker_dir, name) not in published:
+                    shutil.rmtree(os.path.join(frames_dir, ticker_dir, name), ignore_errors=True)
+            if not os.listdir(os.path.join(frames_dir, ticker_dir)):
+                os.rmdir(os.path.join(frames_dir, ticker_dir))
+        for name in os.listdir(self.root):
+            if name.endswith('.json') and name != f"{manifest['generation']}.json":
+                os.remove(os.path.join(self.root, name))
+
+    def stats(self) -> Dict[str, float]:
+        manifest = self.manifest()
+        with self._lock:
+            mapped_bytes = sum(index.nbytes + sum(block.nbytes for block in blocks) for _, index, blocks in self._mapped.values())
+            return {'tickers': len(manifest['tickers']), 'mapped': len(self._mapped), 'mapped_bytes': mapped_bytes,
+                    'published_at': manifest['published_at'] or 0}
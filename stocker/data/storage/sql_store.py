@@ -0,0 +1,144 @@
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import and_, delete, func, select
+from sqlalchemy.engine import Engine
+
+from data.models.stock_data import Base, StockData
+
+# process_stock_data column -> stock_data column
+COLUMN_MAP = {
+    'Open': 'open',
+    'High': 'high',
+    'Low': 'low',
+    'Close': 'close',
+    'Volume': 'volume',
+    'SMA_20': 'sma_20',
+    'SMA_50': 'sma_50',
+    'EMA_12': 'ema_12',
+    'EMA_26': 'ema_26',
+    'RSI': 'rsi',
+    'Upper_BB': 'upper_bb',
+    'Lower_BB': 'lower_bb',
+    'MACD': 'macd',
+    'Signal_Line': 'signal_line',
+    'OBV': 'obv',
+    '%K': 'percent_k',
+    '%D': 'percent_d',
+}
+
+# Indicators that have a column in stock_data
+PERSISTED_INDICATORS = [name for name in COLUMN_MAP if name not in ('Open', 'High', 'Low', 'Close', 'Volume')]
+
+class SQLStore:
+    """
+    Bulk persistence of processed frames in the `stock_data` table.
+
+    Frames are upserted on the unique (ticker, date) index in batches of `batch_size` rows
+    with a single executemany per batch, using the dialect's native upsert on SQLite and
+    PostgreSQL and a delete-then-insert transaction elsewhere. Dates are stored as naive
+    exchange-local timestamps. Indicators without a column in the table are not persisted.
+    The schema is created on first use, so constructing a store doesn't touch the database.
+    """
+
+    def __init__(self, engine: Engine, batch_size: int = 5000):
+        self.engine = engine
+        self.batch_size = batch_size
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
+
+    def create_schema(self):
+        """Create the table and its indexes if they don't exist yet."""
+        if self._schema_ready:
+            return
+        with self._schema_lock:
+            if self._schema_ready:
+                return
+            Base.metadata.create_all(self.engine)
+            # create_all skips tables that already exist, so add the index to older databases too
+            for index in StockData.__table__.indexes:
+                index.create(self.engine, checkfirst=True)
+            self._schema_ready = True
+
+    def _insert(self):
+        if self.engine.dialect.name == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        elif self.engine.dialect.name == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            return None
+        stmt = insert(StockData.__table__)
+        columns = {col: stmt.excluded[col] for col in COLUMN_MAP.values()}
+        return stmt.on_conflict_do_update(index_elements=['ticker', 'date'], set_=columns)
+
+    @staticmethod
+    def _rows(ticker: str, df: pd.DataFrame) -> List[dict]:
+        index = df.index.tz_localize(None) if getattr(df.index, 'tz', None) is not None else df.index
+        columns = {'ticker': np.full(len(df), ticker, dtype=object), 'date': index.to_pydatetime()}
+        for source, target in COLUMN_MAP.items():
+            if source not in df.columns:
+                continue
+            series = df[source]
+            missing = series.isna().to_numpy()
+            values = series.fillna(0).to_numpy(dtype=np.int64 if target == 'volume' else np.float64).astype(object)
+            values[missing] = None
+            columns[target] = values
+        names = list(columns)
+        return [dict(zip(names, row)) for row in zip(*columns.values())]
+
+    def upsert(self, ticker: str, df: pd.DataFrame):
+        """Insert or replace the rows of `df` for `ticker`."""
+        self.upsert_many({ticker: df})
+
+    def upsert_many(self, dfs: Dict[str, pd.DataFrame]):
+        self.create_schema()
+        stmt = self._insert()
+        table = StockData.__table__
+        with self.engine.begin() as conn:
+            for ticker, df in dfs.items():
+                if df.empty:
+                    continue
+                rows = self._rows(ticker, df)
+                if stmt is None:
+                    conn.execute(delete(table).where(and_(
+                        table.c.ticker == ticker,
+                        table.c.date >= rows[0]['date'],
+                        table.c.date <= rows[-1]['date'],
+                    )))
+                for start in range(0, len(rows), self.batch_size):
+                    conn.execute(stmt if stmt is not None else table.insert(), rows[start:start + self.batch_size])
+
+    def read(self, ticker: str, start_date=None, end_date=None) -> pd.DataFrame:
+        """Return the stored rows of `ticker` between `start_date` and `end_date` (inclusive)."""
+        self.create_schema()
+        table = StockData.__table__
+        query = select([table.c.date] + [table.c[col].label(name) for name, col in COLUMN_MAP.items()])
+        query = query.where(table.c.ticker == ticker)
+        if start_date is not None:
+            query = query.where(table.c.date >= pd.Timestamp(start_date).tz_localize(None).to_pydatetime())
+        if end_date is not None:
+            end = pd.Timestamp(end_date).tz_localize(None)
+            if end == end.normalize():
+                end = end + pd.Timedelta(days=1) - pd.Timedelta(microseconds=1)
+            query = query.where(table.c.date <= end.to_pydatetime())
+        query = query.order_by(table.c.date)
+
+        with self.engine.connect() as conn:
+            df = pd.read_sql(query, conn, index_col='date', parse_dates=['date'])
+        df.index.name = None
+        return df
+
+    def last_date(self, ticker: str) -> Optional[pd.Timestamp]:
+        self.create_schema()
+        table = StockData.__table__
+        with self.engine.connect() as conn:
+            value = conn.execute(select([func.max(table.c.date)]).where(table.c.ticker == ticker)).scalar()
+        return pd.Timestamp(value) if value is not None else None
+
+    def tickers(self) -> List[str]:
+        self.create_schema()
+        table = StockData.__table__
+        with self.engine.connect() as conn:
+            return [row[0] for row in conn.execute(select([table.c.ticker]).distinct())]
@@ -0,0 +1 @@
+# This file makes 'stocker.data.streaming' a Python package.
\ No newline at end of file
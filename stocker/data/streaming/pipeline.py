@@ -0,0 +1,102 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config import STREAM_BAR_SECONDS, STREAM_BUFFER_BARS
+from data.fetchers.base_fetcher import OHLCV_COLUMNS
+from data.fetchers.processors.incremental_processor import IncrementalProcessor
+from data.fetchers.processors.indicators import DEFAULT_INDICATORS
+from .ring_buffer import BarRingBuffer
+from .sources import BarEvent, BaseSource
+
+# Columns of every ticker's ring buffer
+STREAM_COLUMNS = OHLCV_COLUMNS + DEFAULT_INDICATORS
+
+class StreamPipeline:
+    """
+    Aggregate ticks or bars from a source into fixed-interval bars with live indicators.
+
+    Events are bucketed into `bar_seconds` bars per ticker. Time only moves forward: once an
+    event for a later bucket arrives from any ticker, every open bar from earlier buckets is
+    closed, run through that ticker's IncrementalProcessor and appended, with its indicators,
+    to the ticker's ring buffer of `capacity` bars. Events for buckets that have already
+    closed are dropped and counted as late.
+
+    Memory per ticker is bounded: one ring buffer, one partial bar and the processor's
+    fixed-size window state.
+    """
+
+    def __init__(self, source: BaseSource, bar_seconds: int = STREAM_BAR_SECONDS, capacity: int = STREAM_BUFFER_BARS):
+        self.source = source
+        self.bar_ns = int(bar_seconds * 1e9)
+        self.capacity = capacity
+        self.buffers: Dict[str, BarRingBuffer] = {}
+        self._processors: Dict[str, IncrementalProcessor] = {}
+        self._open: Dict[str, List[float]] = {}  # ticker -> [bucket, open, high, low, close, volume]
+        self._watermark: Optional[int] = None
+        self.running = False
+        self.events = 0
+        self.bars = 0
+        self.late = 0
+
+    def ingest(self, event: BarEvent):
+        bucket = event.timestamp // self.bar_ns
+        if self._watermark is None or bucket > self._watermark:
+            self._close_before(bucket)
+            self._watermark = bucket
+        elif bucket < self._watermark:
+            self.late += 1
+            return
+        self.events += 1
+
+        bar = self._open.get(event.ticker)
+        if bar is None:
+            self._open[event.ticker] = [bucket, event.open, event.high, event.low, event.close, event.volume]
+        else:
+            bar[2] = max(bar[2], event.high)
+            bar[3] = min(bar[3], event.low)
+            bar[4] = event.close
+            bar[5] += event.volume
+
+    def _close_before(self, bucket: int):
+        for ticker in [ticker for ticker, bar in self._open.items() if bar[0] < bucket]:
+            self._emit(ticker, self._open.pop(ticker))
+
+    def flush(self):
+        """Close every open bar, e.g. at the end of a replay."""
+        for ticker in list(self._open):
+            self._emit(ticker, self._open.pop(ticker))
+
+    def _emit(self, ticker: str, bar: List[float]):
+        processor = self._processors.get(ticker)
+        if processor is None:
+            processor = self._processors[ticker] = IncrementalProcessor()
+            self.buffers[ticker] = BarRingBuffer(STREAM_COLUMNS, self.capacity)
+        bucket, open_, high, low, close, volume = bar
+        indicators = processor.update_arrays(np.array([close]), np.array([high]), np.array([low]), np.array([volume]))
+        row = np.array([open_, high, low, close, volume] + [indicators[col][0] for col in DEFAULT_INDICATORS])
+        self.buffers[ticker].append(int(bucket) * self.bar_ns, row)
+        self.bars += 1
+
+    async def run(self):
+        """Consume the source until it ends."""
+        self.running = True
+        try:
+            async for event in self.source.events():
+                self.ingest(event)
+            self.flush()
+        finally:
+            self.running = False
+
+    def buffer(self, ticker: str) -> Optional[BarRingBuffer]:
+        return self.buffers.get(ticker)
+
+    def stats(self) -> dict:
+        return {
+            'running': self.running,
+            'tickers': len(self.buffers),
+            'events': self.events,
+            'bars': self.bars,
+            'late': self.late,
+            'bytes': sum(buffer.nbytes for buffer in list(self.buffers.values())),
+        }
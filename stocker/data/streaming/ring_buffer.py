@@ -0,0 +1,52 @@
+import threading
+from typing import List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+class BarRingBuffer:
+    """
+    Fixed-capacity circular buffer of the most recent bars of one ticker.
+
+    Memory is allocated once: `capacity` int64 timestamps plus a (capacity x columns) float64
+    block. Every appended bar gets a sequence number, so readers on other threads can ask for
+    just the bars after the last one they saw.
+    """
+
+    def __init__(self, columns: Sequence[str], capacity: int):
+        self.columns = list(columns)
+        self.capacity = capacity
+        self._times = np.zeros(capacity, dtype=np.int64)
+        self._values = np.full((capacity, len(self.columns)), np.nan)
+        self.count = 0  # Bars appended so far, i.e. the sequence number of the next bar
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        return self._times.nbytes + self._values.nbytes
+
+    def append(self, timestamp: int, values: np.ndarray):
+        with self._lock:
+            slot = self.count % self.capacity
+            self._times[slot] = timestamp
+            self._values[slot] = values
+            self.count += 1
+
+    def since(self, sequence: int = 0) -> Tuple[np.ndarray, np.ndarray, int]:
+        """
+        Bars with sequence numbers from `sequence` on, oldest first, and the next sequence number.
+
+        Bars that have already been overwritten are skipped.
+        """
+        with self._lock:
+            start = max(sequence, self.count - self.capacity, 0)
+            positions = np.arange(start, self.count) % self.capacity
+            return self._times[positions], self._values[positions], self.count
+
+    def to_frame(self, tz: str = None) -> pd.DataFrame:
+        times, values, _ = self.since(0)
+        index = pd.DatetimeIndex(times.view('datetime64[ns]')).tz_localize('UTC')
+        return pd.DataFrame(values, index=index.tz_convert(tz) if tz else index, columns=self.columns)
+
+    def columns_index(self, names: Sequence[str]) -> List[int]:
+        return [self.columns.index(name) for name in names]
@@ -0,0 +1,84 @@
+import asyncio
+import csv
+import itertools
+import time
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Iterator, List, NamedTuple
+
+import pandas as pd
+
+from config import STREAM_REPLAY_SPEED
+
+class BarEvent(NamedTuple):
+    """A trade tick (open == high == low == close) or an already aggregated bar."""
+    ticker: str
+    timestamp: int  # UTC nanoseconds
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+
+class BaseSource(ABC):
+    @abstractmethod
+    def events(self) -> AsyncIterator[BarEvent]:
+        """Yield events in timestamp order."""
+
+def _parse_timestamp(value: str) -> int:
+    try:
+        # Epoch seconds
+        return int(float(value) * 1e9)
+    except ValueError:
+        ts = pd.Timestamp(value)
+        return (ts.tz_localize('UTC') if ts.tzinfo is None else ts).value
+
+class FileReplaySource(BaseSource):
+    """
+    Replay ticks or bars from a CSV file.
+
+    The header must have `timestamp` (epoch seconds or ISO 8601, UTC when no offset is given)
+    and `ticker`, plus either `price` and optionally `volume` for ticks, or `open`, `high`,
+    `low`, `close` and `volume` for bars. Events are paced by their timestamps divided by
+    `speed`; a speed of 0 replays as fast as possible. The file is read and parsed lazily, in
+    chunks of `chunk_size` rows on a worker thread, so replaying a large capture neither loads
+    it into memory nor blocks the loop it shares with web requests.
+    """
+
+    def __init__(self, path: str, speed: float = STREAM_REPLAY_SPEED, chunk_size: int = 1000):
+        self.path = path
+        self.speed = speed
+        self.chunk_size = chunk_size
+
+    def _rows(self):
+        with open(self.path, newline='') as f:
+            for row in csv.DictReader(f):
+                timestamp = _parse_timestamp(row['timestamp'])
+                if 'price' in row:
+                    price = float(row['price'])
+                    yield BarEvent(row['ticker'], timestamp, price, price, price, price, float(row.get('volume') or 0))
+                else:
+                    yield BarEvent(row['ticker'], timestamp, float(row['open']), float(row['high']),
+                                   float(row['low']), float(row['close']), float(row['volume'] or 0))
+
+    def _chunk(self, rows: Iterator[BarEvent]) -> List[BarEvent]:
+        return list(itertools.islice(rows, self.chunk_size))
+
+    async def events(self) -> AsyncIterator[BarEvent]:
+        first = None
+        started = time.monotonic()
+        rows = self._rows()
+        try:
+            while True:
+                chunk = await asyncio.to_thread(self._chunk, rows)
+                if not chunk:
+                    break
+                for event in chunk:
+                    if first is None:
+                        first = event.timestamp
+                    if self.speed:
+                        delay = (event.timestamp - first) / 1e9 / self.speed - (time.monotonic() - started)
+                        if delay > 0:
+                            await asyncio.sleep(delay)
+                    yield event
+        finally:
+            rows.close()
@@ -0,0 +1,202 @@
+import cProfile
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+from config import PROFILE_DIR
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the latency histogram buckets
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+def _labels(labels: dict) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + '}'
+
+def _format_value(value: float) -> str:
+    return str(value) if isinstance(value, int) else repr(float(value))
+
+class Metrics:
+    """
+    Thread-safe counters, duration histograms and gauges, rendered in the Prometheus text format.
+
+    Counters and histograms are created on first use and keyed by name and labels. Gauges are
+    callbacks evaluated at render time, so they can report the state of caches and schedulers
+    without those having to push updates.
+    """
+
+    def __init__(self, buckets: Iterable[float] = DURATION_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._help: Dict[str, str] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, list]] = {}
+        self._gauges: Dict[str, Tuple[Callable[[], dict], Tuple[str, ...]]] = {}
+
+    def describe(self, name: str, help_text: str):
+        self._help[name] = help_text
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = _labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = _labels(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            # Per-bucket counts (cumulated when rendered), then sum and count
+            state = series.get(key)
+            if state is None:
+                state = series[key] = [[0] * len(self.buckets), 0.0, 0]
+            position = bisect_left(self.buckets, seconds)
+            if position < len(self.buckets):
+                state[0][position] += 1
+            state[1] += seconds
+            state[2] += 1
+
+    @contextmanager
+    def span(self, stage: str, **labels):
+        """Time the enclosed block as `stage` in the stocker_stage_seconds histogram."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe('stocker_stage_seconds', time.perf_counter() - started, stage=stage, **labels)
+
+    def gauge(self, name: str, func: Callable[[], dict], labels: Sequence[str] = ('stat',),
+              help_text: Optional[str] = None):
+        """
+        Register `func` to be evaluated on every render.
+
+        `func` returns {label value(s): number}; keys are tuples with one value per name in
+        `labels`, or plain values when there is a single label. Non-numeric values are skipped.
+        """
+        self._gauges[name] = (func, tuple(labels))
+        if help_text:
+            self.describe(name, help_text)
+
+    def counter_value(self, name: str, **labels) -> float:
+        with self._lock:
+            return self._counters.get(name, {}).get(_labels(labels), 0)
+
+    def render(self) -> str:
+        lines = []
+
+        def header(name: str, kind: str):
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            counters = {name: dict(series) for name, series in self._counters.items()}
+            histograms = {name: {key: [list(state[0]), state[1], state[2]] for key, state in series.items()}
+                          for name, series in self._histograms.items()}
+
+        for name, series in sorted(counters.items()):
+            header(name, 'counter')
+            for key, value in sorted(series.items()):
+                lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+
+        for name, series in sorted(histograms.items()):
+            header(name, 'histogram')
+            for key, (counts, total, count) in sorted(series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f"{name}_bucket{_format_labels(key, ('le', f'{bound:g}'))} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(key, ('le', '+Inf'))} {count}")
+                lines.append(f"{name}_sum{_format_labels(key)} {total:.6f}")
+                lines.append(f"{name}_count{_format_labels(key)} {count}")
+
+        for name, (func, label_names) in sorted(self._gauges.items()):
+            try:
+                values = func()
+            except Exception as e:
+                logger.warning("Error collecting metric %s: %r", name, e)
+                continue
+            header(name, 'gauge')
+            for key, value in values.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                key = key if isinstance(key, tuple) else (key,)
+                labels = tuple((label, str(part)) for label, part in zip(label_names, key))
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        return "\n".join(lines) + "\n"
+
+# Process-wide registry used by the fetchers, stores and the app
+METRICS = Metrics()
+
+METRICS.describe('stocker_stage_seconds', "Time spent in each stage of request handling, fetching and refreshing.")
+METRICS.describe('stocker_http_request_seconds', "Flask request latency by path, including response serialization.")
+METRICS.describe('stocker_http_response_bytes_total', "Bytes sent by path.")
+METRICS.describe('stocker_cache_requests_total', "Cache lookups by cache and result.")
+METRICS.describe('stocker_upstream_requests_total', "Upstream data requests by provider and outcome.")
+METRICS.describe('stocker_upstream_retries_total', "Upstream calls retried after an error, by provider.")
+METRICS.describe('stocker_fetch_hedges_total', "Hedged requests sent because a provider was slower than its p95.")
+METRICS.describe('stocker_fetch_failovers_total', "Requests passed on to the next provider after this one failed.")
+METRICS.describe('stocker_refresh_tickers_total', "Tickers refreshed by the background scheduler, by outcome.")
+METRICS.describe('stocker_refresh_errors_total', "Refresh cycles that ended with an error.")
+METRICS.describe('stocker_processed_tickers_total', "Tickers processed and persisted by the processing pool, by outcome.")
+
+def install(server, metrics: Metrics = METRICS, profile_dir: Optional[str] = PROFILE_DIR):
+    """
+    Serve `metrics` on /metrics and time every request on the Flask `server`.
+
+    With `profile_dir` set, a request can ask to be profiled with a `profile=1` query
+    parameter, an `X-Profile: 1` header or a `profile=1` cookie (handy for Dash's own
+    callback requests); its cProfile stats are dumped to `profile_dir`. Only the request's own
+    thread is profiled: work it hands to the AsyncRuntime loop (upstream fetches, price store
+    reads and writes) shows up as time waiting on the loop, not as the calls made there, and
+    is timed by the stocker_stage_seconds spans instead.
+    """
+    from flask import Response, g, request
+
+    @server.route("/metrics")
+    def metrics_endpoint():
+        return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+    def wants_profile() -> bool:
+        return profile_dir is not None and '1' in (request.args.get('profile'), request.headers.get('X-Profile'),
+                                                   request.cookies.get('profile'))
+
+    @server.before_request
+    def start_timer():
+        g.request_started = time.perf_counter()
+        if wants_profile():
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    @server.after_request
+    def record_request(response):
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            os.makedirs(profile_dir, exist_ok=True)
+            name = f"{time.strftime('%Y%m%d-%H%M%S')}-{request.path.strip('/').replace('/', '_') or 'root'}-{time.time_ns()}.prof"
+            profiler.dump_stats(os.path.join(profile_dir, name))
+        started = g.pop('request_started', None)
+        # Dash callbacks all share one route, so label them by the outputs they update
+        path = request.path
+        if path.endswith('_dash-update-component') and request.is_json:
+            path = f"{path}:{(request.get_json(silent=True) or {}).get('output', '')}"
+        if started is not None:
+            metrics.observe('stocker_http_request_seconds', time.perf_counter() - started, path=path)
+        if not response.direct_passthrough and response.content_length is not None:
+            metrics.inc('stocker_http_response_bytes_total', response.content_length, path=path)
+        return response
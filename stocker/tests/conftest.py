@@ -0,0 +1,18 @@
+import os
+import sys
+import tempfile
+
+# Settings are read when config is first imported, so keep the tests away from real storage,
+# upstream providers and background work before anything imports it
+SCRATCH_DIR = tempfile.mkdtemp(prefix='stocker-tests-')
+os.environ['PRICE_STORE_DIR'] = os.path.join(SCRATCH_DIR, 'price-store')
+os.environ['CACHE_DIR'] = os.path.join(SCRATCH_DIR, 'cache-directory')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(SCRATCH_DIR, 'stocker.db')}"
+os.environ['REFRESH_SCHEDULER_ENABLED'] = '0'
+os.environ.pop('STREAM_REPLAY_FILE', None)
+os.environ.pop('SHARED_FRAMES_DIR', None)
+
+# Modules import each other from the stocker directory, as when the app is run from it
+STOCKER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if STOCKER_DIR not in sys.path:
+    sys.path.insert(0, STOCKER_DIR)
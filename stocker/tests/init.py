@@ -0,0 +1 @@
+# This file makes 'stocker.tests' a Python package.
\ No newline at end of file
@@ -0,0 +1,75 @@
+import gzip
+import json
+
+import pytest
+
+from benchmarks.synthetic import synthetic_ohlcv
+from metrics import METRICS
+
+GRAPH_OUTPUT = "..multi-stock-graph.figure...error-message.children...figure-state.data.."
+
+class StubFetcher:
+    provider = 'stub'
+
+    async def fetch_data(self, ticker: str, start_date: str, end_date: str):
+        return synthetic_ohlcv(800, start='2020-01-01', seed=sum(map(ord, ticker))).loc[start_date:end_date]
+
+@pytest.fixture(scope='module')
+def stocker():
+    import app
+    app.create_app()
+    app.fetcher.providers = [('stub', StubFetcher())]
+    app.fetcher.latency = {'stub': app.fetcher.latency['yahoo']}
+    yield app
+    app.runtime.close()
+    app.processing_pool.close()
+
+def request_graph(client, tickers: str):
+    body = {
+        "output": GRAPH_OUTPUT,
+        "outputs": [{"id": "multi-stock-graph", "property": "figure"}, {"id": "error-message", "property": "children"},
+                    {"id": "figure-state", "property": "data"}],
+        "inputs": [{"id": "graph-size", "property": "data", "value": {"n_clicks": 1, "width": 800}},
+                   {"id": "multi-stock-graph", "property": "relayoutData", "value": None},
+                   {"id": "indicators-checklist", "property": "value", "value": ['SMA_20']}],
+        "changedPropIds": ["graph-size.data"],
+        "state": [{"id": "fetch-data-button", "property": "n_clicks", "value": 1},
+                  {"id": "ticker-input", "property": "value", "value": tickers},
+                  {"id": "date-picker-range", "property": "start_date", "value": "2021-01-01"},
+                  {"id": "date-picker-range", "property": "end_date", "value": "2022-01-01"},
+                  {"id": "figure-state", "property": "data", "value": None}],
+    }
+    response = client.post('/_dash-update-component', json=body, headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    data = gzip.decompress(response.data) if response.headers.get('Content-Encoding') == 'gzip' else response.data
+    return json.loads(data)
+
+def request_count() -> int:
+    for line in METRICS.render().splitlines():
+        if line.startswith('stocker_http_request_seconds_count') and GRAPH_OUTPUT in line:
+            return int(line.rsplit(' ', 1)[1])
+    return 0
+
+def test_cached_figure_responses_are_timed(stocker):
+    client = stocker.server.test_client()
+    first = request_graph(client, "AAA,BBB")
+    hits = stocker.response_cache.stats()['hits']
+    before = request_count()
+
+    assert request_graph(client, "bbb, aaa") == first
+    assert stocker.response_cache.stats()['hits'] == hits + 1
+    assert request_count() == before + 1
+
+def test_screener_api(stocker):
+    client = stocker.server.test_client()
+    for ticker, rsi in [('ZZA', 25.0), ('ZZB', 15.0), ('ZZC', 45.0)]:
+        stocker.screener_index.update(ticker, '2024-01-02', {'Close': 123456.0, 'RSI': rsi})
+
+    response = client.get('/api/screener?q=Close == 123456 and RSI < 30&sort=RSI&order=asc&limit=1&columns=Close,RSI')
+    assert response.status_code == 200
+    assert response.get_json()['count'] == 2
+    assert response.get_json()['results'] == [{'ticker': 'ZZB', 'as_of': '2024-01-02', 'Close': 123456.0, 'RSI': 15.0}]
+
+    response = client.get('/api/screener?q=RSI <')
+    assert response.status_code == 400
+    assert "Expected a comparison" in response.get_json()['error']
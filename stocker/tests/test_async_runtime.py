@@ -0,0 +1,40 @@
+import asyncio
+import inspect
+from concurrent.futures import TimeoutError
+
+import pytest
+
+from config import FETCH_REQUEST_TIMEOUT
+from data.async_runtime import AsyncRuntime
+
+@pytest.fixture
+def runtime():
+    runtime = AsyncRuntime()
+    yield runtime
+    runtime.close()
+
+def test_run_returns_the_result(runtime):
+    async def work():
+        await asyncio.sleep(0)
+        return 42
+
+    assert runtime.run(work()) == 42
+
+def test_run_times_out_by_default_and_cancels_the_work(runtime):
+    assert inspect.signature(runtime.run).parameters['timeout'].default == FETCH_REQUEST_TIMEOUT
+    cancelled = asyncio.Event()
+
+    async def hung_upstream():
+        try:
+            await asyncio.sleep(3600)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    with pytest.raises(TimeoutError):
+        runtime.run(hung_upstream(), timeout=0.05)
+
+    async def wait_cancelled():
+        await asyncio.wait_for(cancelled.wait(), 5)
+
+    runtime.run(wait_cancelled())
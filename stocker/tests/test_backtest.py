@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest.engine import BacktestResult, evaluate, hold
+
+# Bar to bar returns: +10%, +10%, -10%, 0, +10%, -10%
+CLOSE = np.array([100, 110, 121, 108.9, 108.9, 119.79, 107.811])
+
+def test_hold_is_long_from_entry_until_exit():
+    entries = np.array([[1, 0, 0, 1, 0, 0, 0], [1, 0, 1, 0, 1, 0, 0]], dtype=bool)
+    exits = np.array([[0, 0, 1, 0, 0, 1, 0], [0, 0, 1, 0, 0, 0, 0]], dtype=bool)
+    # An exit on the same bar as an entry wins, and a position stays open without an exit
+    np.testing.assert_array_equal(hold(entries, exits), [[1, 1, 0, 1, 1, 0, 0], [1, 1, 0, 0, 1, 1, 1]])
+
+def test_evaluate_trades_on_the_next_bar_and_pays_costs():
+    positions = np.array([
+        [1, 1, 0, 1, 1, 0, 0],
+        [1, 1, 1, 1, 1, 1, 1],
+        # Long at the close of bar 1 only: earns the move to bar 2, not the move into bar 1
+        [0, 1, 0, 0, 0, 0, 0],
+    ], dtype=bool)
+    free = evaluate(CLOSE, positions, cost=0)
+    np.testing.assert_allclose(free['total_return'], [1.1 ** 3 - 1, 1.1 ** 3 * 0.9 ** 2 - 1, 0.1])
+    # Buy and hold falls from the peak of 121 to 107.811
+    np.testing.assert_allclose(free['max_drawdown'], [0, 107.811 / 121 - 1, 0])
+    np.testing.assert_array_equal(free['trades'], [2, 1, 1])
+    np.testing.assert_allclose(free['exposure'], [4 / 6, 1, 1 / 6])
+
+    # Every change of position pays 1%: entries at bars 0 and 3, exits at bars 2 and 5
+    costly = evaluate(CLOSE, positions[:1], cost=0.01)
+    equity = np.cumprod([1.09, 1.10, 0.99, 0.99, 1.10, 0.99])
+    np.testing.assert_allclose(costly['total_return'], [equity[-1] - 1])
+    np.testing.assert_allclose(costly['max_drawdown'], [equity[3] / equity[1] - 1])
+    assert costly['trades'][0] == 2
+
+def test_aggregate_summarizes_each_combo_across_tickers():
+    params = pd.DataFrame({'window': [10.0, 20.0]})
+    metrics = {
+        'AAA': {'total_return': [0.1, -0.2], 'max_drawdown': [-0.05, -0.3], 'sharpe': [1.0, -1.0],
+                'trades': [2, 4], 'exposure': [0.5, 0.5]},
+        'BBB': {'total_return': [0.3, 0.1], 'max_drawdown': [-0.1, -0.2], 'sharpe': [2.0, 0.5],
+                'trades': [4, 6], 'exposure': [0.5, 0.5]},
+        'CCC': {'total_return': [-0.1, 0.4], 'max_drawdown': [-0.2, -0.1], 'sharpe': [0.0, 1.5],
+                'trades': [0, 2], 'exposure': [0.5, 0.5]},
+    }
+    result = BacktestResult('sma_crossover', params,
+                            {ticker: {name: np.array(values, dtype=np.float64) for name, values in values.items()}
+                             for ticker, values in metrics.items()})
+
+    aggregate = result.aggregate
+    assert list(aggregate['window']) == [10.0, 20.0]
+    assert list(aggregate['tickers']) == [3, 3]
+    np.testing.assert_allclose(aggregate['mean_return'], [0.1, 0.1])
+    np.testing.assert_allclose(aggregate['median_return'], [0.1, 0.1])
+    np.testing.assert_allclose(aggregate['win_rate'], [2 / 3, 2 / 3])
+    np.testing.assert_allclose(aggregate['mean_drawdown'], [-0.35 / 3, -0.2])
+    np.testing.assert_allclose(aggregate['worst_drawdown'], [-0.2, -0.3])
+    np.testing.assert_allclose(aggregate['mean_sharpe'], [1.0, 1 / 3])
+    np.testing.assert_allclose(aggregate['mean_trades'], [2, 4])
+    assert result.per_ticker.loc[('BBB', 1), 'total_return'] == pytest.approx(0.1)
+    assert list(result.best('mean_sharpe', n=1).index) == [0]
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import synthetic_ohlcv
+from data.fetchers.processors.data_processor import process_stock_data
+from data.fetchers.processors.incremental_processor import IncrementalProcessor, process_stock_data_incremental
+from data.fetchers.processors.indicators import ALL_INDICATORS, DEFAULT_INDICATORS
+
+def bars_with_gaps_and_repeats(rows: int = 400) -> pd.DataFrame:
+    df = synthetic_ohlcv(rows, seed=7)
+    # Missing bars, in one column and across a whole row
+    df.iloc[30, df.columns.get_loc('Close')] = np.nan
+    df.iloc[[90, 91], df.columns.get_loc('High')] = np.nan
+    df.iloc[150] = np.nan
+    # A halted stretch repeating the same bar, longer than every window
+    df.iloc[200:260] = df.iloc[199].to_numpy()
+    # An infinite price, which window functions treat as missing
+    df.iloc[300, df.columns.get_loc('Low')] = np.inf
+    return df
+
+def chunked(df: pd.DataFrame, sizes):
+    start = 0
+    for size in sizes:
+        yield df.iloc[start:start + size]
+        start += size
+    if start < len(df):
+        yield df.iloc[start:]
+
+@pytest.mark.parametrize('sizes', [[400], [1] * 400, [7, 1, 50, 3, 120, 19, 1, 1, 64]])
+def test_chunked_updates_match_full_processing(sizes):
+    df = bars_with_gaps_and_repeats()
+    expected = process_stock_data(df)
+
+    processor = IncrementalProcessor()
+    processed = None
+    for chunk in chunked(df, sizes):
+        processed = process_stock_data_incremental(processed, chunk, processor)
+
+    assert list(processed.columns) == list(expected.columns)
+    pd.testing.assert_frame_equal(processed, expected, check_exact=True, check_freq=False)
+
+def test_output_is_restricted_to_requested_indicators():
+    df = bars_with_gaps_and_repeats()
+    default = IncrementalProcessor().update(df)
+    assert [col for col in default.columns if col not in df.columns] == DEFAULT_INDICATORS
+    assert 'stddev_20' not in default.columns and 'TR' not in default.columns
+
+    processor = IncrementalProcessor(['TR', 'SMA_20', 'Upper_BB'])
+    arrays = processor.update_arrays(*(df[col].to_numpy() for col in ['Close', 'High', 'Low', 'Volume']))
+    assert list(arrays) == ['SMA_20', 'Upper_BB', 'TR']
+    expected = process_stock_data(df, ['SMA_20', 'Upper_BB', 'TR'])
+    for column, values in arrays.items():
+        np.testing.assert_array_equal(values, expected[column].to_numpy())
+
+    everything = IncrementalProcessor(ALL_INDICATORS).update(df)
+    pd.testing.assert_frame_equal(everything, process_stock_data(df, ALL_INDICATORS), check_exact=True, check_freq=False)
+
+def test_rejects_unknown_indicators_and_out_of_order_rows():
+    with pytest.raises(ValueError):
+        IncrementalProcessor(['SMA_999'])
+    df = synthetic_ohlcv(30)
+    processor = IncrementalProcessor()
+    processor.update(df.iloc[10:])
+    with pytest.raises(ValueError):
+        processor.update(df.iloc[:10])
@@ -0,0 +1,17 @@
+import numpy as np
+
+from benchmarks.synthetic import synthetic_ohlcv
+from visualization.plotter import PRICE_GROUP, VOLUME_GROUP, ticker_traces
+
+def test_downsampled_volume_bars_sum_the_candle_buckets():
+    df = synthetic_ohlcv(1000, seed=6)
+    x_range = [df.index[600], df.index[700]]
+    [candles] = ticker_traces('AAPL', df, PRICE_GROUP, 'rgb(0, 0, 0)', max_points=200, x_range=x_range)
+    [volume] = ticker_traces('AAPL', df, VOLUME_GROUP, 'rgb(0, 0, 0)', max_points=200, x_range=x_range)
+
+    assert len(candles['x']) < len(df)
+    assert list(volume['x']) == list(candles['x'])
+    # Every bar's volume is counted once, in the bucket of its candle
+    assert volume['y'].sum() == df['Volume'].sum()
+    first_bucket = df.loc[:candles['x'][1]].iloc[:-1]
+    assert volume['y'][0] == first_bucket['Volume'].sum()
@@ -0,0 +1,43 @@
+import multiprocessing
+import os
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import synthetic_ohlcv
+from data.storage.price_store import PriceStore
+
+def test_write_replaces_previous_version(tmp_path):
+    store = PriceStore(str(tmp_path))
+    store.write('AAPL', synthetic_ohlcv(50, seed=1))
+    first = store.version('AAPL')
+    df = synthetic_ohlcv(60, seed=2)
+    store.write('AAPL', df, coverage=[('2000-01-03', '2000-04-01')])
+
+    assert store.version('AAPL') != first
+    assert not os.path.exists(os.path.join(str(tmp_path), 'AAPL', first))
+    pd.testing.assert_frame_equal(store.read('AAPL'), df, check_freq=False)
+    assert store.coverage('AAPL') == [('2000-01-03', '2000-04-01')]
+    assert store.tickers() == ['AAPL']
+
+def _write_repeatedly(root: str, seed: int, count: int):
+    store = PriceStore(root)
+    for i in range(count):
+        store.write('AAPL', synthetic_ohlcv(200, seed=seed * 1000 + i))
+
+def test_concurrent_writers_never_publish_a_deleted_version(tmp_path):
+    root = str(tmp_path)
+    context = multiprocessing.get_context('fork')
+    writers = [context.Process(target=_write_repeatedly, args=(root, seed, 20)) for seed in range(3)]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join()
+    assert all(writer.exitcode == 0 for writer in writers)
+
+    store = PriceStore(root)
+    version = store.version('AAPL')
+    assert os.path.isdir(os.path.join(root, 'AAPL', version))
+    assert sorted(name for name in os.listdir(os.path.join(root, 'AAPL')) if name.startswith('v')) == [version]
+    assert len(store.read('AAPL')) == 200
+    assert np.isfinite(store.read('AAPL')['Close'].to_numpy()).all()
@@ -0,0 +1,113 @@
+import threading
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+
+from benchmarks.synthetic import synthetic_universe
+from data.fetchers.processors.data_processor import process_stock_data
+from data.fetchers.processors.incremental_processor import IncrementalProcessor
+from data.processing_pool import ProcessingPool
+from data.storage.price_store import PriceStore
+from data.storage.sql_store import PERSISTED_INDICATORS, SQLStore
+
+@pytest.fixture
+def universe(tmp_path):
+    store = PriceStore(str(tmp_path / 'price-store'))
+    dfs = synthetic_universe(5, 300)
+    # A shorter history, so the panel has to pad it
+    dfs['SYN0001'] = dfs['SYN0001'].iloc[120:]
+    for ticker, df in dfs.items():
+        store.write(ticker, df)
+    return store, dfs, f"sqlite:///{tmp_path / 'stocker.db'}"
+
+def test_in_process_pool_works_off_the_calling_thread(universe):
+    store, dfs, database_url = universe
+    threads = {}
+    pool = ProcessingPool(store.root, database_url, workers=0,
+                          on_latest=lambda ticker, date, values: threads.update({ticker: threading.get_ident()}))
+    try:
+        # Only the last rows are written, but with indicators warmed up over the whole history
+        rows, (date, values) = pool.submit('SYN0000', dfs['SYN0000'].index[-5:]).result()
+    finally:
+        pool.close()
+
+    assert rows == 5
+    assert date == dfs['SYN0000'].index[-1].strftime('%Y-%m-%d')
+    assert threads['SYN0000'] != threading.get_ident()
+    assert len(SQLStore(create_engine(database_url)).read('SYN0000')) == 5
+
+def test_process_all_persists_panel_values_matching_per_ticker_processing(universe):
+    store, dfs, database_url = universe
+    latest = {}
+    pool = ProcessingPool(store.root, database_url, workers=0, chunk_size=3,
+                          on_latest=lambda ticker, date, values: latest.update({ticker: (date, values)}))
+    try:
+        rows = pool.process_all([*dfs, 'MISSING'])
+    finally:
+        pool.close()
+
+    assert rows == {**{ticker: len(df) for ticker, df in dfs.items()}, 'MISSING': 0}
+    assert set(latest) == set(dfs)
+    sql_store = SQLStore(create_engine(database_url))
+    for ticker, df in dfs.items():
+        expected = process_stock_data(df)
+        stored = sql_store.read(ticker)
+        assert len(stored) == len(df)
+        np.testing.assert_allclose(stored[PERSISTED_INDICATORS].to_numpy(), expected[PERSISTED_INDICATORS].to_numpy(),
+                                   rtol=1e-9, atol=1e-9, equal_nan=True)
+        assert latest[ticker][1]['RSI'] == pytest.approx(expected['RSI'].iloc[-1], rel=1e-9)
+
+def persisted(database_url: str, ticker: str, expected):
+    stored = SQLStore(create_engine(database_url)).read(ticker, expected.index[0], expected.index[-1])
+    assert len(stored) == len(expected)
+    np.testing.assert_allclose(stored[PERSISTED_INDICATORS].to_numpy(), expected[PERSISTED_INDICATORS].to_numpy(),
+                               rtol=1e-12, atol=1e-12, equal_nan=True)
+
+def test_refresh_processes_only_new_bars_from_saved_state(universe, monkeypatch):
+    store, dfs, database_url = universe
+    df = dfs['SYN0000']
+    # The first refresh stored 280 bars; the next refetches the last of them, as a partial bar, and adds 20
+    store.write('SYN0000', df.iloc[:280])
+    updated = []
+    update = IncrementalProcessor.update
+    monkeypatch.setattr(IncrementalProcessor, 'update', lambda self, rows: updated.append(len(rows)) or update(self, rows))
+    pool = ProcessingPool(store.root, database_url, workers=0)
+    try:
+        pool.submit('SYN0000', df.index[270:280]).result()
+        store.write('SYN0000', df)
+        updated.clear()
+        rows, (date, values) = pool.submit('SYN0000', df.index[279:]).result()
+        assert sum(updated) == 21
+        assert rows == 21 and date == df.index[-1].strftime('%Y-%m-%d')
+        expected = process_stock_data(df)
+        persisted(database_url, 'SYN0000', expected.iloc[279:])
+        assert values['RSI'] == pytest.approx(expected['RSI'].iloc[-1], rel=1e-12)
+
+        # A changed bar before the saved state's last row reprocesses the whole history
+        changed = df.copy()
+        changed.iloc[100, changed.columns.get_loc('Close')] *= 1.1
+        store.write('SYN0000', changed)
+        updated.clear()
+        pool.submit('SYN0000', changed.index[100:]).result()
+        assert sum(updated) == len(df)
+        persisted(database_url, 'SYN0000', process_stock_data(changed).iloc[100:])
+    finally:
+        pool.close()
+
+def test_in_process_pools_keep_their_own_stores(tmp_path):
+    pools = []
+    for name in ('first', 'second'):
+        store = PriceStore(str(tmp_path / name))
+        store.write(name.upper(), synthetic_universe(1, 50)['SYN0000'])
+        pools.append(ProcessingPool(store.root, f"sqlite:///{tmp_path / name}.db", workers=0))
+    try:
+        for pool in pools:
+            pool.start()
+        # The first pool still reads its own store after the second one started
+        assert pools[0].submit('FIRST').result()[0] == 50
+        assert pools[1].submit('SECOND').result()[0] == 50
+        assert pools[0].submit('SECOND').result() == (0, None)
+    finally:
+        for pool in pools:
+            pool.close()
@@ -0,0 +1,193 @@
+import asyncio
+import time
+
+import pandas as pd
+import pytest
+from aiohttp import web
+
+from config import MARKET_TIMEZONE
+from data.async_runtime import AsyncRuntime
+from data.fetchers.alpha_vantage_fetcher import AlphaVantageFetcher
+from data.fetchers.base_fetcher import BaseFetcher, OHLCV_COLUMNS
+from data.fetchers.finnhub_fetcher import FinnhubFetcher
+from data.fetchers.polygon_fetcher import PolygonFetcher
+from data.fetchers.providers import MultiProviderFetcher
+
+DAYS = ['2024-01-02', '2024-01-03', '2024-01-04']
+
+class StubServer:
+    """aiohttp server on the runtime's loop answering each path with a canned response, counting hits."""
+
+    def __init__(self, runtime: AsyncRuntime):
+        self.runtime = runtime
+        self.responses = {}
+        self.hits = {}
+        self.params = {}
+        app = web.Application()
+        app.router.add_get('/{path:.*}', self._handle)
+        self._runner = web.AppRunner(app)
+        self.url = runtime.run(self._start())
+
+    async def _start(self) -> str:
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, '127.0.0.1', 0)
+        await site.start()
+        host, port = self._runner.addresses[0][:2]
+        return f"http://{host}:{port}"
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        path = '/' + request.match_info['path']
+        self.hits[path] = self.hits.get(path, 0) + 1
+        self.params[path] = dict(request.query)
+        status, payload = self.responses.get(path, (404, {'error': 'not found'}))
+        return web.json_response(payload, status=status)
+
+    def close(self):
+        self.runtime.run(self._runner.cleanup())
+
+@pytest.fixture
+def runtime():
+    runtime = AsyncRuntime()
+    yield runtime
+    runtime.close()
+
+@pytest.fixture
+def server(runtime):
+    server = StubServer(runtime)
+    yield server
+    server.close()
+
+def fetch(runtime: AsyncRuntime, fetcher: BaseFetcher, start_date: str = '2024-01-01', end_date: str = '2024-01-04'):
+    return runtime.run(fetcher.fetch_data('AAPL', start_date, end_date))
+
+def expected_index(days) -> pd.DatetimeIndex:
+    return pd.DatetimeIndex(days).tz_localize(MARKET_TIMEZONE)
+
+def test_polygon_parses_aggregates(runtime, server):
+    # Stamped at the start of the trading day in New York, in epoch ms
+    stamps = [int(pd.Timestamp(day, tz=MARKET_TIMEZONE).timestamp() * 1000) for day in DAYS]
+    server.responses['/v2/aggs/ticker/AAPL/range/1/day/2024-01-01/2024-01-04'] = (200, {
+        'status': 'OK',
+        'results': [{'t': t, 'o': 10 + i, 'h': 12 + i, 'l': 9 + i, 'c': 11 + i, 'v': 1000 * (i + 1)}
+                    for i, t in enumerate(stamps)],
+    })
+    df = fetch(runtime, PolygonFetcher('key', runtime, base_url=server.url))
+
+    # The end date is exclusive, although Polygon's range includes it
+    assert list(df.index) == list(expected_index(DAYS[:2]))
+    assert list(df.columns) == OHLCV_COLUMNS
+    assert df['Close'].tolist() == [11.0, 12.0]
+    assert df['Volume'].tolist() == [1000, 2000] and df['Volume'].dtype == 'int64'
+    assert server.params['/v2/aggs/ticker/AAPL/range/1/day/2024-01-01/2024-01-04']['adjusted'] == 'true'
+
+def test_finnhub_parses_candles(runtime, server):
+    server.responses['/api/v1/stock/candle'] = (200, {
+        's': 'ok',
+        't': [int(pd.Timestamp(day, tz='UTC').timestamp()) for day in DAYS],
+        'o': [10, 11, 12], 'h': [12, 13, 14], 'l': [9, 10, 11], 'c': [11, 12, 13], 'v': [100, 200, 300],
+    })
+    df = fetch(runtime, FinnhubFetcher('key', runtime, base_url=server.url), end_date='2024-01-05')
+
+    assert list(df.index) == list(expected_index(DAYS))
+    assert df['Open'].tolist() == [10.0, 11.0, 12.0]
+    assert df['Volume'].tolist() == [100, 200, 300]
+
+def test_finnhub_no_data_is_empty(runtime, server):
+    server.responses['/api/v1/stock/candle'] = (200, {'s': 'no_data'})
+    assert fetch(runtime, FinnhubFetcher('key', runtime, base_url=server.url)).empty
+
+def test_alpha_vantage_adjusts_for_splits_and_dividends(runtime, server):
+    def bar(open_, close, adjusted, volume, split='1.0'):
+        return {'1. open': open_, '2. high': str(float(close) + 1), '3. low': str(float(open_) - 1), '4. close': close,
+                '5. adjusted close': adjusted, '6. volume': volume, '7. dividend amount': '0.0000',
+                '8. split coefficient': split}
+
+    # A 2-for-1 split on the 3rd; the adjusted closes also reflect a later dividend
+    server.responses['/query'] = (200, {'Time Series (Daily)': {
+        '2024-01-04': bar('101.0', '102.0', '102.0', '300'),
+        '2024-01-03': bar('100.0', '100.0', '99.0', '200', split='2.0'),
+        '2024-01-02': bar('200.0', '198.0', '98.0', '100'),
+    }})
+    df = fetch(runtime, AlphaVantageFetcher('key', runtime, base_url=server.url), end_date='2024-01-05')
+
+    assert server.params['/query']['function'] == 'TIME_SERIES_DAILY_ADJUSTED'
+    assert list(df.index) == list(expected_index(DAYS))
+    assert df['Close'].tolist() == [98.0, 99.0, 102.0]
+    assert df['Open'].tolist() == pytest.approx([200.0 * 98 / 198, 100.0 * 99 / 100, 101.0])
+    assert df['High'].tolist() == pytest.approx([199.0 * 98 / 198, 101.0 * 99 / 100, 103.0])
+    assert df['Volume'].tolist() == [200, 200, 300]
+
+def test_alpha_vantage_rate_limit_note_is_an_error(runtime, server):
+    server.responses['/query'] = (200, {'Note': 'Thank you for using Alpha Vantage! Our standard API rate limit is...'})
+    assert fetch(runtime, AlphaVantageFetcher('key', runtime, base_url=server.url)).empty
+
+def test_client_errors_are_not_retried(runtime, server):
+    server.responses['/api/v1/stock/candle'] = (401, {'error': 'Invalid API key'})
+    df = fetch(runtime, FinnhubFetcher('bad', runtime, base_url=server.url, retries=2, backoff=0))
+    assert df.empty
+    assert server.hits['/api/v1/stock/candle'] == 1
+
+def test_server_errors_are_retried(runtime, server):
+    server.responses['/api/v1/stock/candle'] = (503, {'error': 'unavailable'})
+    assert fetch(runtime, FinnhubFetcher('key', runtime, base_url=server.url, retries=2, backoff=0)).empty
+    assert server.hits['/api/v1/stock/candle'] == 3
+
+def test_failover_after_consecutive_failures(runtime, server):
+    server.responses['/api/v1/stock/candle'] = (500, {'error': 'down'})
+    stamps = [int(pd.Timestamp(day, tz=MARKET_TIMEZONE).timestamp() * 1000) for day in DAYS]
+    server.responses['/v2/aggs/ticker/AAPL/range/1/day/2024-01-01/2024-01-04'] = (200, {
+        'status': 'OK', 'results': [{'t': t, 'o': 1, 'h': 1, 'l': 1, 'c': 1, 'v': 1} for t in stamps],
+    })
+    fetcher = MultiProviderFetcher([
+        ('finnhub', FinnhubFetcher('key', runtime, base_url=server.url, retries=0)),
+        ('polygon', PolygonFetcher('key', runtime, base_url=server.url, retries=0)),
+    ], hedge=False, failover_threshold=3)
+
+    for attempt in range(5):
+        assert len(fetch(runtime, fetcher)) == 2
+        # The failing provider is asked first until it has failed `failover_threshold` times in a row
+        assert server.hits['/api/v1/stock/candle'] == min(attempt + 1, 3)
+    assert [name for name, _ in fetcher._ordered()] == ['polygon', 'finnhub']
+    assert fetcher.stats()['finnhub']['consecutive_failures'] == 3
+
+class SlowFetcher(BaseFetcher):
+    """Answers after `delay` seconds, recording whether it was cancelled first."""
+
+    def __init__(self, delay: float, provider: str):
+        self.delay = delay
+        self.provider = provider
+        self.calls = 0
+        self.cancelled = False
+
+    async def fetch_data(self, ticker: str, start_date: str, end_date: str) -> pd.DataFrame:
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        index = expected_index(DAYS[:1])
+        return pd.DataFrame({col: [1.0] for col in OHLCV_COLUMNS}, index=index).assign(provider=self.provider)
+
+def test_hedge_fires_past_p95_and_cancels_the_loser(runtime):
+    slow, fast = SlowFetcher(30, 'slow'), SlowFetcher(0.01, 'fast')
+    fetcher = MultiProviderFetcher([('slow', slow), ('fast', fast)], hedge=True, default_delay=60)
+    for _ in range(100):
+        fetcher.latency['slow'].record(0.05, ok=True)
+    assert fetcher.hedge_delay('slow') == pytest.approx(0.05)
+
+    started = time.perf_counter()
+    df = fetch(runtime, fetcher)
+    elapsed = time.perf_counter() - started
+
+    assert elapsed < 5
+    assert (slow.calls, fast.calls) == (1, 1)
+    assert slow.cancelled and not fast.cancelled
+    # Only the OHLCV columns of the winner are returned
+    assert list(df.columns) == OHLCV_COLUMNS
+
+def test_no_hedge_before_the_delay(runtime):
+    primary, backup = SlowFetcher(0.01, 'primary'), SlowFetcher(0.01, 'backup')
+    fetcher = MultiProviderFetcher([('primary', primary), ('backup', backup)], hedge=True, default_delay=5)
+    assert not fetch(runtime, fetcher).empty
+    assert (primary.calls, backup.calls) == (1, 0)
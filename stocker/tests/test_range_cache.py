@@ -0,0 +1,95 @@
+import asyncio
+import multiprocessing
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import synthetic_ohlcv
+from data.fetchers.processors.data_processor import process_stock_data
+from data.fetchers.processors.indicators import DEFAULT_INDICATORS, IndicatorCache, compute_indicators, warmup_bars
+from data.storage.memory_cache import MemoryCache
+from data.storage.price_store import PriceStore
+from data.storage.range_cache import RangeCache
+
+# Cached indicator values are float32 at the default MEMORY_PRECISION, which holds about
+# 7 significant digits (see IndicatorCache)
+FLOAT32_RTOL = 2e-6
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = RangeCache(PriceStore(str(tmp_path)), fetcher=None, memory=MemoryCache())
+    bars = synthetic_ohlcv(400, seed=3)
+    # Prices a float32 can't hold exactly
+    bars[['Open', 'High', 'Low', 'Close']] = bars[['Open', 'High', 'Low', 'Close']] + 1 / 3
+    cache.seed('AAPL', bars)
+    return cache
+
+def get(cache: RangeCache):
+    start, end = '2001-01-02', '2001-06-01'
+    return asyncio.run(cache.get('AAPL', start, end, warmup_bars(DEFAULT_INDICATORS)))
+
+def test_cached_prices_are_the_stored_float64_values(cache):
+    stored = cache.store.read('AAPL')
+    (missed, version), (hit, hit_version) = get(cache), get(cache)
+    assert version == hit_version == cache.store.version('AAPL')
+    assert cache.memory.hits == 1
+    for df in (missed, hit):
+        pd.testing.assert_frame_equal(df, stored, check_exact=True, check_freq=False)
+
+@pytest.mark.parametrize('precision', ['float64', 'float32'])
+def test_request_indicators_match_the_persisted_ones(cache, precision):
+    # What the processing pool persists and publishes: indicators over the store's float64 history
+    expected = process_stock_data(cache.store.read('AAPL'), DEFAULT_INDICATORS)
+    scale = {column: np.nanmax(np.abs(expected[column].to_numpy())) for column in DEFAULT_INDICATORS}
+    # Computed from the memoized EMAs, so they carry the EMAs' rounding
+    scale['MACD'] = scale['Signal_Line'] = scale['EMA_12']
+
+    indicator_cache = IndicatorCache(precision=precision)
+    for _ in range(2):
+        df, version = get(cache)
+        df = compute_indicators(df, DEFAULT_INDICATORS, 'AAPL', version, indicator_cache)
+        for column in DEFAULT_INDICATORS:
+            if precision == 'float64':
+                np.testing.assert_array_equal(df[column].to_numpy(), expected[column].to_numpy())
+            else:
+                np.testing.assert_allclose(df[column].to_numpy(), expected[column].to_numpy(), rtol=0,
+                                           atol=FLOAT32_RTOL * scale[column], equal_nan=True, err_msg=column)
+
+def _store_chunks(root: str, bars: pd.DataFrame, bounds: list, chunks: range):
+    cache = RangeCache(PriceStore(root), fetcher=None)
+    days = bars.index.tz_localize(None).normalize()
+    for i in chunks:
+        start, end = bounds[i], bounds[i + 1]
+        cache._store('AAPL', [bars[(days >= start) & (days < end)]], [(start, end)])
+
+def test_concurrent_processes_merge_without_losing_bars(tmp_path):
+    root = str(tmp_path)
+    bars = synthetic_ohlcv(400, seed=4)
+    # Adjacent chunks of 10 bars, stored alternately by two processes
+    days = bars.index.tz_localize(None).normalize()
+    bounds = list(days[::10]) + [days[-1] + pd.Timedelta(days=1)]
+    context = multiprocessing.get_context('fork')
+    writers = [context.Process(target=_store_chunks, args=(root, bars, bounds, range(k, len(bounds) - 1, 2)))
+               for k in range(2)]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join()
+    assert all(writer.exitcode == 0 for writer in writers)
+
+    cache = RangeCache(PriceStore(root), fetcher=None)
+    pd.testing.assert_frame_equal(cache.store.read('AAPL'), bars, check_freq=False)
+    assert cache.coverage('AAPL') == [(bounds[0], bounds[-1])]
+
+def test_seeded_coverage_leaves_gaps_in_the_bars_missing(tmp_path):
+    cache = RangeCache(PriceStore(str(tmp_path)), fetcher=None)
+    bars = synthetic_ohlcv(200, seed=5)
+    # Ranges that were never fetched, and a market holiday
+    seeded = bars.drop(bars.index[50:70]).drop(bars.index[[120]]).drop(bars.index[150:152])
+    cache.seed('AAPL', seeded)
+
+    days = bars.index.tz_localize(None)
+    assert cache.missing_ranges('AAPL', days[0], days[-1] + pd.Timedelta(days=1)) == [
+        (days[49] + pd.Timedelta(days=1), days[70]), (days[149] + pd.Timedelta(days=1), days[152])
+    ]
@@ -0,0 +1,43 @@
+import asyncio
+import threading
+
+import pandas as pd
+
+from benchmarks.synthetic import synthetic_ohlcv
+from data.fetchers.base_fetcher import BaseFetcher
+from data.refresh_scheduler import RefreshScheduler
+from data.storage.price_store import PriceStore
+from data.storage.range_cache import RangeCache
+
+class EmptyFetcher(BaseFetcher):
+    provider = 'stub'
+
+    async def fetch_data(self, ticker: str, start_date: str, end_date: str) -> pd.DataFrame:
+        return pd.DataFrame()
+
+class RecordingSQLStore:
+    """Serves synthetic bars and records the threads it was read from."""
+
+    def __init__(self):
+        self.threads = set()
+
+    def read(self, ticker: str) -> pd.DataFrame:
+        self.threads.add(threading.get_ident())
+        return synthetic_ohlcv(100, start='2020-01-01')
+
+def test_cycle_seeds_from_the_database_off_the_loop(tmp_path):
+    store = PriceStore(str(tmp_path))
+    sql_store = RecordingSQLStore()
+    scheduler = RefreshScheduler(RangeCache(store, EmptyFetcher()), ['AAPL', 'MSFT'], runtime=None,
+                                 sql_store=sql_store, rate_limit=1000)
+    loop_threads = set()
+
+    async def cycle():
+        loop_threads.add(threading.get_ident())
+        await scheduler.run_cycle()
+
+    asyncio.run(cycle())
+    assert store.tickers() == ['AAPL', 'MSFT']
+    assert len(store.read('AAPL')) == 100
+    assert sql_store.threads and not sql_store.threads & loop_threads
+    assert scheduler.progress()['done'] == 2
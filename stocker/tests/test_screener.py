@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from data.screener import ScreenerIndex, parse_query, query_columns
+
+COLUMNS = ['Close', 'RSI', 'SMA_50']
+
+def test_parse_query_groups_conditions():
+    groups = parse_query("RSI < 30 and Close > SMA_50 or 70 <= RSI", COLUMNS)
+    assert groups == [
+        [(('column', 'RSI'), '<', ('number', 30.0)), (('column', 'Close'), '>', ('column', 'SMA_50'))],
+        [(('number', 70.0), '<=', ('column', 'RSI'))],
+    ]
+    assert query_columns(groups) == ['RSI', 'Close', 'SMA_50']
+    assert parse_query("Close>=1e3 AND RSI!=-.5", COLUMNS) == [
+        [(('column', 'Close'), '>=', ('number', 1000.0)), (('column', 'RSI'), '!=', ('number', -0.5))]
+    ]
+    assert parse_query("  ", COLUMNS) == []
+
+@pytest.mark.parametrize('query, message', [
+    ("Volume > 1", "Unknown column 'Volume'"),
+    ("RSI <", "Expected a comparison"),
+    ("RSI < 30 Close > 1", "Join comparisons"),
+    ("RSI < 30 and", "Join comparisons"),
+    ("1 < 2", "at least one column"),
+    ("RSI < 30 # comment", "Unexpected input at '# comment'"),
+    ("RSI < <", "Expected a column or number, got '<'"),
+])
+def test_parse_query_rejects_invalid_screens(query, message):
+    with pytest.raises(ValueError, match=message):
+        parse_query(query, COLUMNS)
+
+@pytest.fixture
+def index():
+    index = ScreenerIndex(COLUMNS, capacity=2)
+    for ticker, close, rsi, sma in [('AAA', 10.0, 25.0, 12.0), ('BBB', 20.0, 30.0, 15.0), ('CCC', 30.0, np.nan, 25.0),
+                                    ('DDD', 40.0, 30.0, 45.0), ('EEE', 50.0, 80.0, np.nan)]:
+        index.update(ticker, '2024-01-02', {'Close': close, 'RSI': rsi, 'SMA_50': sma})
+    return index
+
+def tickers(screen: dict):
+    return [result['ticker'] for result in screen['results']]
+
+@pytest.mark.parametrize('query, expected', [
+    ("RSI < 30", ['AAA']),
+    ("RSI <= 30", ['AAA', 'BBB', 'DDD']),
+    ("RSI > 30", ['EEE']),
+    ("RSI >= 30", ['BBB', 'DDD', 'EEE']),
+    ("RSI == 30", ['BBB', 'DDD']),
+    ("30 > RSI", ['AAA']),
+    # Tickers without a value never match a comparison with a number, not even !=
+    ("RSI != 30", ['AAA', 'EEE']),
+    ("RSI != 31", ['AAA', 'BBB', 'DDD', 'EEE']),
+    ("Close > SMA_50", ['BBB', 'CCC']),
+    ("RSI < 30 or Close >= 40 and SMA_50 > 40", ['AAA', 'DDD']),
+    ("", ['AAA', 'BBB', 'CCC', 'DDD', 'EEE']),
+])
+def test_screen_matches_by_binary_search(index, query, expected):
+    screen = index.screen(query, limit=None)
+    assert tickers(screen) == expected
+    assert screen['count'] == len(expected) and screen['tickers'] == 5
+
+def test_screen_ranks_and_limits(index):
+    screen = index.screen("Close > 15", sort_by='RSI', limit=3, columns=['RSI'])
+    # Tickers without a value rank last; descending reverses the ascending order, ties included
+    assert tickers(screen) == ['EEE', 'DDD', 'BBB'] and screen['count'] == 4
+    assert screen['results'][0] == {'ticker': 'EEE', 'as_of': '2024-01-02', 'RSI': 80.0}
+    assert tickers(index.screen("Close > 15", sort_by='RSI', descending=False, limit=None)) == ['BBB', 'DDD', 'EEE', 'CCC']
+    assert index.screen("Close < 15", columns=['RSI', 'SMA_50'])['results'] == [
+        {'ticker': 'AAA', 'as_of': '2024-01-02', 'RSI': 25.0, 'SMA_50': 12.0}
+    ]
+    with pytest.raises(ValueError, match="Unknown column 'MFI'"):
+        index.screen(sort_by='MFI')
+
+def test_remove_moves_the_last_row_into_the_gap(index):
+    assert index.screen("RSI >= 30", limit=None)['count'] == 3
+    index.remove('BBB')
+    index.remove('MISSING')
+
+    assert len(index) == 4
+    assert tickers(index.screen("RSI >= 30", limit=None)) == ['DDD', 'EEE']
+    # EEE took BBB's row and keeps its own values
+    assert index.screen("Close == 50", columns=['RSI'])['results'] == [{'ticker': 'EEE', 'as_of': '2024-01-02', 'RSI': 80.0}]
+    index.update('EEE', '2024-01-03', {'Close': 5.0, 'RSI': 10.0})
+    assert tickers(index.screen("RSI < 30", sort_by='RSI', descending=False)) == ['EEE', 'AAA']
+
+def test_sync_replaces_the_indexed_tickers(index):
+    index.sync({'BBB': ('2024-01-03', {'Close': 21.0}), 'FFF': ('2024-01-03', {'Close': 60.0})})
+    assert tickers(index.screen(limit=None)) == ['BBB', 'FFF']
+    assert index.screen("Close > 20", columns=['Close'])['results'][0] == {'ticker': 'BBB', 'as_of': '2024-01-03', 'Close': 21.0}
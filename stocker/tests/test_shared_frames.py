@@ -0,0 +1,74 @@
+import os
+
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import synthetic_ohlcv
+from data.frame_publisher import FramePublisher
+from data.storage.price_store import PriceStore
+from data.storage.shared_frames import SharedFrameStore
+
+COVERAGE = [('2000-01-03', '2000-04-01')]
+
+@pytest.fixture
+def shared(tmp_path):
+    return SharedFrameStore(str(tmp_path / 'shared'))
+
+def write(shared: SharedFrameStore, ticker: str, seed: int, version: str) -> dict:
+    return shared.write(ticker, synthetic_ohlcv(50, seed=seed), version, COVERAGE, written_at=1.0)
+
+def test_publish_swaps_the_manifest(shared):
+    first = shared.publish({'AAPL': write(shared, 'AAPL', 1, 'v1'), 'MSFT': write(shared, 'MSFT', 2, 'v1')})
+    old_dir = shared.manifest()['tickers']['AAPL']['dir']
+    second = shared.publish({'AAPL': write(shared, 'AAPL', 3, 'v2')})
+
+    # A second store, e.g. another worker, sees the new manifest on its next read
+    reader = SharedFrameStore(shared.root)
+    assert second != first and reader.generation() == second
+    assert reader.tickers() == ['AAPL', 'MSFT']
+    df, entry = reader.read('AAPL')
+    assert entry['version'] == 'v2' and entry['coverage'] == [list(interval) for interval in COVERAGE]
+    pd.testing.assert_frame_equal(df, synthetic_ohlcv(50, seed=3), check_freq=False)
+    assert reader.read('MSFT')[1]['version'] == 'v1'
+    # The superseded frame and manifest are deleted
+    assert not os.path.exists(os.path.join(shared.root, old_dir))
+    assert not os.path.exists(os.path.join(shared.root, f"{first}.json"))
+
+def test_read_of_a_superseded_frame_returns_nothing(shared, monkeypatch):
+    shared.publish({'AAPL': write(shared, 'AAPL', 1, 'v1')})
+    reader = SharedFrameStore(shared.root)
+    stale = reader.manifest()
+    shared.publish({'AAPL': write(shared, 'AAPL', 2, 'v2')})
+
+    # The manifest was read just before the publish deleted the frame it refers to
+    monkeypatch.setattr(reader, 'manifest', lambda: stale)
+    assert reader.read('AAPL') == (None, None)
+
+def test_publish_removes_tickers(shared):
+    shared.publish({'AAPL': write(shared, 'AAPL', 1, 'v1'), 'MSFT': write(shared, 'MSFT', 2, 'v1')})
+    shared.publish({}, removed=['MSFT'])
+
+    assert shared.tickers() == ['AAPL']
+    assert shared.read('MSFT') == (None, None)
+    assert not os.path.exists(os.path.join(shared.root, 'frames', 'MSFT'))
+
+def test_prune_deletes_unpublished_frames(shared):
+    shared.publish({'AAPL': write(shared, 'AAPL', 1, 'v1')})
+    # Written by a publish that was interrupted before its manifest swap
+    orphan = write(shared, 'AAPL', 2, 'v2')
+    shared.prune()
+
+    assert not os.path.exists(os.path.join(shared.root, orphan['dir']))
+    assert shared.read('AAPL')[1]['version'] == 'v1'
+
+def test_stale_finds_changed_and_removed_tickers(tmp_path, shared):
+    store = PriceStore(str(tmp_path / 'store'))
+    for seed, ticker in enumerate(['AAPL', 'MSFT', 'NVDA']):
+        store.write(ticker, synthetic_ohlcv(50, seed=seed))
+    shared.publish({ticker: write(shared, ticker, 0, store.version(ticker)) for ticker in ['AAPL', 'MSFT']}
+                   | {'GOOGL': write(shared, 'GOOGL', 0, 'v1')})
+    store.write('MSFT', synthetic_ohlcv(60, seed=4))
+
+    publisher = FramePublisher(store, shared, pool=None)
+    # MSFT's bars changed since it was published, NVDA was never published and GOOGL is no longer stored
+    assert publisher.stale() == (['MSFT', 'NVDA'], ['GOOGL'])
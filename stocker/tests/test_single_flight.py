@@ -0,0 +1,179 @@
+import asyncio
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import synthetic_ohlcv
+from data.fetchers.base_fetcher import BaseFetcher
+from data.storage.price_store import PriceStore
+from data.storage.range_cache import RangeCache
+from data.storage.single_flight import SingleFlight
+
+WAITERS = 8
+
+class UpstreamError(Exception):
+    pass
+
+def wait_until(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise TimeoutError("Condition not met in time.")
+        time.sleep(0.001)
+
+async def wait_until_async(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise TimeoutError("Condition not met in time.")
+        await asyncio.sleep(0.001)
+
+class CountingFetcher(BaseFetcher):
+    """Returns synthetic bars for the requested days once `release` says so, counting calls."""
+
+    provider = 'stub'
+
+    def __init__(self, release, error: Exception = None):
+        self.release = release
+        self.error = error
+        self.calls = 0
+
+    async def fetch_data(self, ticker: str, start_date: str, end_date: str) -> pd.DataFrame:
+        self.calls += 1
+        await wait_until_async(self.release)
+        if self.error is not None:
+            raise self.error
+        rows = len(pd.bdate_range(start_date, end_date, inclusive='left'))
+        return synthetic_ohlcv(rows, start=start_date)
+
+def test_do_runs_once_for_concurrent_callers():
+    flight = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await wait_until_async(lambda: flight.shared == WAITERS - 1)
+        return 'bars'
+
+    async def main():
+        return await asyncio.gather(*(flight.do('AAPL', work) for _ in range(WAITERS)))
+
+    assert asyncio.run(main()) == ['bars'] * WAITERS
+    assert len(calls) == 1
+    assert (flight.calls, flight.shared, flight.in_flight()) == (1, WAITERS - 1, 0)
+
+def test_do_shares_the_exception_and_clears_the_key():
+    flight = SingleFlight()
+
+    async def work():
+        await wait_until_async(lambda: flight.shared == WAITERS - 1)
+        raise UpstreamError('down')
+
+    async def main():
+        return await asyncio.gather(*(flight.do('AAPL', work) for _ in range(WAITERS)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, UpstreamError) for result in results)
+    assert flight.in_flight() == 0
+
+    async def recovered():
+        return 'bars'
+
+    assert asyncio.run(flight.do('AAPL', recovered)) == 'bars'
+    assert flight.calls == 2
+
+def run_threads(target, count: int = WAITERS) -> list:
+    results = [None] * count
+
+    def run(i: int):
+        try:
+            results[i] = target()
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+def test_call_runs_once_across_threads():
+    flight = SingleFlight()
+    calls = []
+
+    def work():
+        calls.append(1)
+        wait_until(lambda: flight.shared == WAITERS - 1)
+        return 'bars'
+
+    assert run_threads(lambda: flight.call('AAPL', work)) == ['bars'] * WAITERS
+    assert len(calls) == 1
+    assert flight.in_flight() == 0
+
+def test_call_shares_the_exception_across_threads_and_clears_the_key():
+    flight = SingleFlight()
+
+    def work():
+        wait_until(lambda: flight.shared == WAITERS - 1)
+        raise UpstreamError('down')
+
+    results = run_threads(lambda: flight.call('AAPL', work))
+    assert all(isinstance(result, UpstreamError) for result in results)
+    assert flight.in_flight() == 0
+    assert flight.call('AAPL', lambda: 'bars') == 'bars'
+
+@pytest.fixture
+def store(tmp_path):
+    return PriceStore(str(tmp_path))
+
+def test_range_cache_get_fetches_once_for_concurrent_requests(store):
+    # Upstream answers once every other request has joined the first one's flight
+    fetcher = CountingFetcher(lambda: cache.flights.shared == WAITERS - 1)
+    cache = RangeCache(store, fetcher)
+
+    async def main():
+        return await asyncio.gather(*(cache.get('AAPL', '2020-01-01', '2020-03-01') for _ in range(WAITERS)))
+
+    results = asyncio.run(main())
+    assert fetcher.calls == 1
+    assert cache.flights.in_flight() == 0
+    versions = {version for _, version in results}
+    assert versions == {store.version('AAPL')}
+    assert all(len(df) == len(results[0][0]) > 0 for df, _ in results)
+
+    # Covered now, so later requests don't go upstream
+    asyncio.run(cache.get('AAPL', '2020-01-15', '2020-02-15'))
+    assert fetcher.calls == 1
+
+def test_range_cache_get_fetches_once_across_threads_and_loops(store):
+    # Upstream answers once every other request has joined the first one's flight
+    fetcher = CountingFetcher(lambda: cache.flights.shared == WAITERS - 1)
+    cache = RangeCache(store, fetcher)
+
+    results = run_threads(lambda: asyncio.run(cache.get('AAPL', '2020-01-01', '2020-03-01')))
+    assert fetcher.calls == 1
+    assert cache.flights.in_flight() == 0
+    assert {version for _, version in results} == {store.version('AAPL')}
+
+def test_range_cache_get_shares_upstream_failures(store):
+    fetcher = CountingFetcher(lambda: cache.flights.shared == WAITERS - 1, UpstreamError('down'))
+    cache = RangeCache(store, fetcher)
+
+    async def main():
+        return await asyncio.gather(*(cache.get('AAPL', '2020-01-01', '2020-03-01') for _ in range(WAITERS)),
+                                    return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert fetcher.calls == 1
+    assert all(isinstance(result, UpstreamError) for result in results)
+    assert cache.flights.in_flight() == 0
+    assert store.version('AAPL') is None
+
+    # The failed flight is gone, so the next request goes upstream again
+    fetcher.error = None
+    df, version = asyncio.run(cache.get('AAPL', '2020-01-01', '2020-03-01'))
+    assert fetcher.calls == 2
+    assert version == store.version('AAPL') and not df.empty
@@ -0,0 +1,33 @@
+import json
+import os
+import subprocess
+import sys
+
+from config import STARTUP_IMPORT_BUDGET
+
+STOCKER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Loaded by create_app or on first use; importing the app module must not pull them in
+DEFERRED_MODULES = ['dash', 'plotly', 'sqlalchemy', 'aiohttp', 'yfinance']
+
+IMPORT_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+print(json.dumps({'import': imported - started, 'loaded': sorted(name for name in %r if name in sys.modules)}))
+"""
+
+def import_app() -> dict:
+    # A fresh interpreter, since a module is only imported once per process
+    completed = subprocess.run([sys.executable, '-c', IMPORT_SCRIPT % DEFERRED_MODULES], cwd=STOCKER_DIR,
+                               env=os.environ, capture_output=True, text=True, check=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def test_import_defers_heavy_modules():
+    assert import_app()['loaded'] == []
+
+def test_import_meets_budget():
+    # The first run warms the OS file cache; the best of the rest discounts a busy machine
+    import_app()
+    assert min(import_app()['import'] for _ in range(3)) <= STARTUP_IMPORT_BUDGET
@@ -0,0 +1,88 @@
+import asyncio
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import synthetic_ohlcv
+from data.fetchers.processors.data_processor import process_stock_data
+from data.fetchers.processors.indicators import DEFAULT_INDICATORS
+from data.streaming.pipeline import STREAM_COLUMNS, StreamPipeline
+from data.streaming.ring_buffer import BarRingBuffer
+from data.streaming.sources import FileReplaySource
+
+START = pd.Timestamp('2024-01-02 14:30', tz='UTC')
+
+def replay(path, capacity: int = 100) -> StreamPipeline:
+    pipeline = StreamPipeline(FileReplaySource(str(path), speed=0, chunk_size=7), bar_seconds=60, capacity=capacity)
+    asyncio.run(pipeline.run())
+    return pipeline
+
+def write_ticks(path, rows):
+    pd.DataFrame(rows, columns=['timestamp', 'ticker', 'price', 'volume']).to_csv(path, index=False)
+
+def test_replayed_ticks_are_aggregated_into_bars_with_indicators(tmp_path):
+    bars = synthetic_ohlcv(80, seed=5)
+    # Each minute bar as four ticks: open, high, low, close, its volume split between them
+    rows = []
+    for minute, bar in enumerate(bars.itertuples()):
+        at = START + pd.Timedelta(minutes=minute)
+        for second, price in zip((0, 10, 20, 59), (bar.Open, bar.High, bar.Low, bar.Close)):
+            rows.append([(at + pd.Timedelta(seconds=second)).isoformat(), 'AAPL', repr(price), bar.Volume / 4])
+    write_ticks(tmp_path / 'ticks.csv', rows)
+    pipeline = replay(tmp_path / 'ticks.csv')
+
+    assert pipeline.stats()['bars'] == 80 and pipeline.stats()['events'] == 320
+    df = pipeline.buffer('AAPL').to_frame()
+    assert list(df.columns) == STREAM_COLUMNS
+    assert df.index[0] == START and df.index[-1] == START + pd.Timedelta(minutes=79)
+    expected = process_stock_data(bars.set_axis(df.index))
+    np.testing.assert_allclose(df[['Open', 'High', 'Low', 'Close', 'Volume']].to_numpy(),
+                               expected[['Open', 'High', 'Low', 'Close', 'Volume']].to_numpy(), rtol=1e-12)
+    np.testing.assert_allclose(df[DEFAULT_INDICATORS].to_numpy(), expected[DEFAULT_INDICATORS].to_numpy(),
+                               rtol=1e-9, atol=1e-9, equal_nan=True)
+
+def test_late_events_are_dropped_and_out_of_order_ones_within_a_bar_kept(tmp_path):
+    write_ticks(tmp_path / 'ticks.csv', [
+        [START.isoformat(), 'AAPL', 10.0, 1],
+        [(START + pd.Timedelta(seconds=30)).isoformat(), 'AAPL', 12.0, 1],
+        # Out of order, but within the open bar
+        [(START + pd.Timedelta(seconds=5)).isoformat(), 'AAPL', 9.0, 1],
+        [(START + pd.Timedelta(minutes=1)).isoformat(), 'MSFT', 50.0, 1],
+        # The first minute has closed
+        [(START + pd.Timedelta(seconds=50)).isoformat(), 'AAPL', 20.0, 1],
+        [(START + pd.Timedelta(minutes=1, seconds=1)).isoformat(), 'AAPL', 11.0, 2],
+    ])
+    pipeline = replay(tmp_path / 'ticks.csv')
+
+    assert pipeline.stats()['late'] == 1 and pipeline.stats()['events'] == 5
+    df = pipeline.buffer('AAPL').to_frame()
+    assert list(df.index) == [START, START + pd.Timedelta(minutes=1)]
+    np.testing.assert_array_equal(df[['Open', 'High', 'Low', 'Close', 'Volume']].to_numpy(),
+                                  [[10.0, 12.0, 9.0, 9.0, 3.0], [11.0, 11.0, 11.0, 11.0, 2.0]])
+    assert len(pipeline.buffer('MSFT').to_frame()) == 1
+
+def test_ring_buffer_keeps_the_most_recent_bars():
+    buffer = BarRingBuffer(['Close'], capacity=4)
+    for i in range(10):
+        buffer.append(i, np.array([float(i)]))
+
+    times, values, sequence = buffer.since(0)
+    assert sequence == 10
+    np.testing.assert_array_equal(times, [6, 7, 8, 9])
+    np.testing.assert_array_equal(values[:, 0], [6.0, 7.0, 8.0, 9.0])
+    # Readers resume from the sequence number they last saw
+    times, _, _ = buffer.since(8)
+    np.testing.assert_array_equal(times, [8, 9])
+    assert len(buffer.since(10)[0]) == 0
+
+def test_replay_wraps_the_ring_buffer(tmp_path):
+    write_ticks(tmp_path / 'ticks.csv', [[(START + pd.Timedelta(minutes=minute)).isoformat(), 'AAPL', float(minute), 1]
+                                         for minute in range(25)])
+    pipeline = replay(tmp_path / 'ticks.csv', capacity=10)
+
+    df = pipeline.buffer('AAPL').to_frame()
+    assert pipeline.stats()['bars'] == 25
+    np.testing.assert_array_equal(df['Close'].to_numpy(), np.arange(15.0, 25.0))
+    # Indicators carry on across the wrap: SMA_20 of the last bar averages closes 5 to 24
+    assert df['SMA_20'].iloc[-1] == pytest.approx(np.mean(np.arange(5.0, 25.0)))
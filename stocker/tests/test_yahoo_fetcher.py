@@ -0,0 +1,106 @@
+import asyncio
+import threading
+import time
+
+import pandas as pd
+import pytest
+import yfinance as yf
+
+from benchmarks.synthetic import synthetic_ohlcv
+from data.fetchers.yahoo_fetcher import YahooFetcher
+
+class SleepingYahoo:
+    """Stands in for yf.Ticker and yf.download: sleeps like a slow upstream and records concurrency."""
+
+    def __init__(self, delay: float = 0.0, failures: int = 0):
+        self.delay = delay
+        self.failures = failures
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def _call(self, request):
+        with self._lock:
+            self.calls.append(request)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            failing = len(self.calls) <= self.failures
+        try:
+            time.sleep(self.delay)
+            if failing:
+                raise ConnectionError("Connection reset by peer")
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def Ticker(self, ticker: str):
+        fake = self
+
+        class Ticker:
+            def history(self, start, end, timeout):
+                fake._call(ticker)
+                return synthetic_ohlcv(20, seed=len(ticker))
+
+        return Ticker()
+
+    def download(self, tickers, start, end, **kwargs):
+        self._call(list(tickers))
+        return pd.concat({ticker: synthetic_ohlcv(20, seed=len(ticker)) for ticker in tickers}, axis=1)
+
+@pytest.fixture
+def fake(monkeypatch):
+    fake = SleepingYahoo()
+    monkeypatch.setattr(yf, 'Ticker', fake.Ticker)
+    monkeypatch.setattr(yf, 'download', fake.download)
+    return fake
+
+def fetch(fetcher: YahooFetcher, tickers):
+    async def fetch_all():
+        return await asyncio.gather(*(fetcher.fetch_data(ticker, '2000-01-01', '2000-02-01') for ticker in tickers))
+    try:
+        return asyncio.run(fetch_all())
+    finally:
+        fetcher.close()
+
+def test_requests_in_flight_are_bounded(fake):
+    fake.delay = 0.05
+    tickers = [f"T{i}" for i in range(8)]
+    results = fetch(YahooFetcher(max_workers=8, max_concurrency=2), tickers)
+
+    assert sorted(fake.calls) == tickers
+    assert fake.max_active == 2
+    assert all(not df.empty for df in results)
+
+def test_timed_out_request_yields_an_empty_frame(fake):
+    fake.delay = 0.5
+    started = time.perf_counter()
+    [df] = fetch(YahooFetcher(timeout=0.05, retries=0), ['AAPL'])
+
+    assert df.empty
+    assert time.perf_counter() - started < fake.delay
+
+def test_transient_errors_are_retried(fake):
+    fake.failures = 2
+    [df] = fetch(YahooFetcher(retries=2, backoff=0.01), ['AAPL'])
+
+    assert fake.calls == ['AAPL'] * 3
+    pd.testing.assert_frame_equal(df, synthetic_ohlcv(20, seed=4))
+
+def test_errors_past_the_retries_yield_an_empty_frame(fake):
+    fake.failures = 3
+    [df] = fetch(YahooFetcher(retries=2, backoff=0.01), ['AAPL'])
+
+    assert df.empty and len(fake.calls) == 3
+
+def test_large_universes_are_downloaded_in_batches(fake):
+    tickers = [f"T{i}" for i in range(5)]
+    fetcher = YahooFetcher(batch_size=2)
+    try:
+        frames = asyncio.run(fetcher.fetch_top_1000_stocks('2000-01-01', '2000-02-01', tickers))
+    finally:
+        fetcher.close()
+
+    assert sorted(fake.calls) == [['T0', 'T1'], ['T2', 'T3'], ['T4']]
+    assert list(frames) == tickers
+    pd.testing.assert_frame_equal(frames['T0'], synthetic_ohlcv(20, seed=2))
@@ -0,0 +1,403 @@
+"""
+Dash callbacks and the figure response cache hooks.
+
+Imported by app.create_app, so importing app doesn't load Dash and Plotly. Callbacks reach
+the services through the app module's globals.
+"""
+import json
+import asyncio
+from concurrent.futures import TimeoutError
+from dash import Input, Output, Patch, State, callback, clientside_callback, ctx, html, no_update
+from dash.exceptions import PreventUpdate
+import dash_bootstrap_components as dbc
+from flask import Response, g, has_request_context, request
+import pandas as pd
+import app
+from data.fetchers.processors.indicators import compute_indicators, expand_selection, warmup_bars
+from data.screener import parse_query, query_columns
+from visualization.plotter import (
+    INDICATOR_TRACES, multi_stock_layout, plot_live_chart, ticker_color, ticker_traces, trace_groups
+)
+from metrics import METRICS
+from config import PLOT_DEFAULT_WIDTH, MARKET_TIMEZONE
+
+# Measure the graph in the browser so the server only sends as many points as there are pixels
+clientside_callback(
+    """
+    function(n_clicks) {
+        var graph = document.getElementById("multi-stock-graph");
+        return {n_clicks: n_clicks, width: graph ? graph.offsetWidth : window.innerWidth};
+    }
+    """,
+    Output("graph-size", "data"),
+    Input("fetch-data-button", "n_clicks")
+)
+
+def relayout_x_range(relayout_data):
+    """Return the zoomed x-axis range from Plotly relayoutData, None for autorange, or raise PreventUpdate."""
+    if not relayout_data:
+        raise PreventUpdate
+    if relayout_data.get("xaxis.autorange"):
+        return None
+    if "xaxis.range[0]" in relayout_data and "xaxis.range[1]" in relayout_data:
+        return [relayout_data["xaxis.range[0]"], relayout_data["xaxis.range[1]"]]
+    if "xaxis.range" in relayout_data:
+        return relayout_data["xaxis.range"]
+    # Legend clicks, autosize and other layout changes don't need new data
+    raise PreventUpdate
+
+def figure_query(trigger, graph_size, relayout_data, tickers, start_date, end_date):
+    """
+    The tickers (deduplicated and sorted, so equivalent queries build identical figures) and
+    the window [start_date, end_date, max points, x range] a fetch or zoom asks for.
+    """
+    tickers_list = sorted({ticker.strip().upper() for ticker in tickers.split(',')})
+    # Zooming or dragging the range slider re-requests the visible window at full resolution
+    x_range = relayout_x_range(relayout_data) if trigger == "multi-stock-graph" else None
+    max_points = (graph_size or {}).get("width") or PLOT_DEFAULT_WIDTH
+    return tickers_list, [start_date, end_date, max_points, x_range]
+
+def figure_signature(body):
+    """
+    Normalized signature of a callback request for a whole multi-stock figure, or None.
+
+    Requests answered with a patch of the figure the browser already shows, checklist
+    toggles and requests that update nothing depend on more than the query, so they have
+    no signature.
+    """
+    output = (body or {}).get('output', '')
+    if 'multi-stock-graph.figure' not in output or 'figure-state.data' not in output:
+        return None
+    values = {f"{item['id']}.{item['property']}": item.get('value')
+              for item in body.get('inputs', []) + body.get('state', []) if isinstance(item, dict)}
+    trigger = (body.get('changedPropIds') or [''])[0].rsplit('.', 1)[0]
+    tickers = values.get('ticker-input.value')
+    if trigger not in ('graph-size', 'multi-stock-graph') or not values.get('fetch-data-button.n_clicks') or not tickers:
+        return None
+    try:
+        tickers_list, window = figure_query(trigger, values.get('graph-size.data'), values.get('multi-stock-graph.relayoutData'),
+                                            tickers, values.get('date-picker-range.start_date'),
+                                            values.get('date-picker-range.end_date'))
+    except PreventUpdate:
+        return None
+    figure_state = values.get('figure-state.data')
+    if figure_state and figure_state.get('window') == window:
+        return None
+    # A zoom keeps the uirevision of the figure it refines
+    uirevision = figure_state.get('uirevision') if figure_state and trigger == 'multi-stock-graph' else None
+    return (tuple(tickers_list), json.dumps(window), tuple(sorted(values.get('indicators-checklist.value') or [])), uirevision)
+
+def serve_cached_figure():
+    """Answer repeated figure queries with the stored response, without running the callback."""
+    if not request.path.endswith('_dash-update-component') or not request.is_json:
+        return None
+    signature = figure_signature(request.get_json(silent=True))
+    if signature is None:
+        return None
+    cached = app.response_cache.get(signature, accept_gzip='gzip' in request.headers.get('Accept-Encoding', ''))
+    if cached is None:
+        # The callback records the versions it built from, and the response is stored below
+        g.figure_signature = signature
+        return None
+    app.refresh_scheduler.record_request(list(signature[0]))
+    body, encoding = cached
+    response = Response(body, mimetype='application/json')
+    if encoding is not None:
+        response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+    return response
+
+def store_figure_response(response):
+    signature = g.pop('figure_signature', None)
+    versions = g.pop('figure_versions', None)
+    if signature is not None and versions is not None and response.status_code == 200 and not response.direct_passthrough:
+        app.response_cache.set(signature, response.get_data(), versions)
+    return response
+
+def cached_traces(ticker, df, version, group, color, window, visible):
+    """Traces of one ticker's trace group at `window`, from the trace cache unless the bars changed."""
+    start_date, end_date, max_points, x_range = window
+    key = (ticker, version, group, color, json.dumps(window))
+    # Bars read from the database fallback have no store version to key on
+    traces = app.trace_cache.get(key) if version is not None else None
+    if traces is None:
+        traces = ticker_traces(ticker, df, group, color, max_points, x_range)
+        if version is not None:
+            app.trace_cache.set(key, traces)
+    if group not in INDICATOR_TRACES:
+        return traces
+    # Cached traces are shared between requests, so visibility goes on copies
+    return [dict(trace, visible=visible) for trace in traces]
+
+@callback(
+    Output("multi-stock-graph", "figure"),
+    Output("error-message", "children"),
+    Output("figure-state", "data"),
+    Input("graph-size", "data"),
+    Input("multi-stock-graph", "relayoutData"),
+    Input("indicators-checklist", "value"),
+    State("fetch-data-button", "n_clicks"),
+    State("ticker-input", "value"),
+    State("date-picker-range", "start_date"),
+    State("date-picker-range", "end_date"),
+    State("figure-state", "data")
+)
+def update_multi_stock_graph(graph_size, relayout_data, indicators, n_clicks, tickers, start_date, end_date, figure_state):
+    """
+    Send the multi-stock figure, or only what changed since the figure in `figure_state`.
+
+    A fetch or zoom that changes the window (dates, graph width or zoomed range) rebuilds every
+    trace. Otherwise the figure is patched: traces of removed tickers, or of tickers whose
+    stored bars changed, are deleted and only the missing (ticker, trace group) traces are
+    appended. Checklist changes are handled in the browser, except for indicators that were
+    never loaded, whose traces are appended here.
+    """
+    if not n_clicks:
+        return {}, "", None
+
+    indicators = indicators or []
+    if ctx.triggered_id == "indicators-checklist":
+        # Indicators already loaded are shown and hidden by the clientside callback
+        if not figure_state or all(group in figure_state['groups'] for group in indicators):
+            raise PreventUpdate
+        tickers_list = figure_state['tickers']
+        window = figure_state['window']
+    else:
+        if not tickers:
+            return {}, "Please enter valid ticker symbols.", None
+        tickers_list, window = figure_query(ctx.triggered_id, graph_size, relayout_data, tickers, start_date, end_date)
+    start_date, end_date, max_points, x_range = window
+
+    patching = figure_state is not None and figure_state['window'] == window
+    # Every ticker carries the same groups, so the browser can toggle any of them
+    groups = [group for group in INDICATOR_TRACES
+              if group in indicators or (patching and group in figure_state['groups'])]
+
+    app.refresh_scheduler.record_request(tickers_list)
+    indicator_columns = expand_selection(groups)
+    error_messages = []
+
+    async def fetch(ticker):
+        # Fetches only uncovered parts of the range, including bars for indicator warm-up
+        with METRICS.span('cache_lookup'):
+            df, version = await app.range_cache.get(ticker, start_date, end_date, warmup_bars(indicator_columns))
+        if df is None or df.loc[start_date:end_date].empty:
+            # Upstream failed or timed out; fall back to persisted bars, off the shared loop
+            METRICS.inc('stocker_cache_requests_total', cache='database', result='fallback')
+            with METRICS.span('database_read'):
+                df, version = await asyncio.to_thread(app.sql_store.read, ticker, start_date, end_date), None
+        return ticker, df, version
+
+    async def fetch_all():
+        return await asyncio.gather(*(fetch(ticker) for ticker in tickers_list))
+
+    try:
+        with METRICS.span('fetch_all'):
+            fetched = app.runtime.run(fetch_all())
+    except TimeoutError:
+        return {}, "Timed out fetching data; please try again.", None
+
+    results = []
+    for ticker, df, version in fetched:
+        # Only compute what is displayed, memoized per stored version of the ticker. CPU-bound,
+        # so it runs here rather than on the loop every request shares
+        with METRICS.span('indicators'):
+            df = compute_indicators(df, indicator_columns, ticker, version, app.indicator_cache)
+        results.append((ticker, df.loc[start_date:end_date], version))
+
+    dfs, versions = {}, {}
+    for ticker, df, version in results:
+        if df.empty:
+            error_messages.append(f"No data found for ticker '{ticker}'.")
+            continue
+        dfs[ticker] = df
+        versions[ticker] = version
+
+    if not dfs:
+        error_message = " | ".join(error_messages) if error_messages else "No data could be fetched for the provided tickers."
+        return {}, error_message, None
+
+    error_message = " | ".join(error_messages) if error_messages else ""
+    with METRICS.span('figure_build'):
+        if not patching:
+            ticker_colors = {ticker: ticker_color(i) for i, ticker in enumerate(dfs)}
+            shown = [[ticker, group] for ticker in dfs for group in trace_groups(groups)]
+            # A zoom keeps the zoom and legend state of the figure it refines
+            uirevision = figure_state['uirevision'] if figure_state and ctx.triggered_id == "multi-stock-graph" else ",".join(dfs)
+            figure = {
+                'data': [trace for ticker, group in shown for trace in cached_traces(
+                    ticker, dfs[ticker], versions[ticker], group, ticker_colors[ticker], window, group in indicators)],
+                'layout': multi_stock_layout(uirevision, x_range),
+            }
+        else:
+            uirevision = figure_state['uirevision']
+            stale = {ticker for ticker in figure_state['tickers']
+                     if ticker not in dfs or versions[ticker] is None or versions[ticker] != figure_state['versions'].get(ticker)}
+            figure = Patch()
+            changed = False
+            shown = figure_state['traces']
+            # Delete from the end so the indices of earlier traces stay valid
+            for i in reversed(range(len(shown))):
+                if shown[i][0] in stale:
+                    del figure['data'][i]
+                    changed = True
+            shown = [entry for entry in shown if entry[0] not in stale]
+            ticker_colors = {ticker: color for ticker, color in figure_state['colors'].items() if ticker in dfs}
+            for ticker, df in dfs.items():
+                if ticker not in ticker_colors:
+                    used = set(ticker_colors.values())
+                    ticker_colors[ticker] = next((ticker_color(i) for i in range(len(ticker_colors) + 1)
+                                                  if ticker_color(i) not in used), ticker_color(len(ticker_colors)))
+                loaded = {group for shown_ticker, group in shown if shown_ticker == ticker}
+                for group in trace_groups(groups):
+                    if group in loaded:
+                        continue
+                    for trace in cached_traces(ticker, df, versions[ticker], group, ticker_colors[ticker], window,
+                                               group in indicators):
+                        figure['data'].append(trace)
+                    shown.append([ticker, group])
+                    changed = True
+            if not changed:
+                figure = no_update
+
+    state = {'window': window, 'tickers': list(dfs), 'groups': groups, 'versions': versions,
+             'colors': ticker_colors, 'traces': shown, 'uirevision': uirevision}
+    if not patching and not error_messages and None not in versions.values() and has_request_context():
+        # Lets store_figure_response cache this response for identical queries
+        g.figure_versions = versions
+    return figure, error_message, state
+
+# Checklist changes only flip the visibility of loaded trace groups, without a server round trip
+clientside_callback(
+    """
+    function(indicators, figure) {
+        if (!figure || !figure.data) {
+            return window.dash_clientside.no_update;
+        }
+        var selected = indicators || [];
+        var changed = false;
+        var data = figure.data.map(function(trace) {
+            var group = trace.meta && trace.meta.group;
+            if (group === undefined || group === "Price" || group === "Volume") {
+                return trace;
+            }
+            var visible = selected.indexOf(group) >= 0;
+            if ((trace.visible !== false) === visible) {
+                return trace;
+            }
+            changed = true;
+            return Object.assign({}, trace, {visible: visible});
+        });
+        return changed ? Object.assign({}, figure, {data: data}) : window.dash_clientside.no_update;
+    }
+    """,
+    Output("multi-stock-graph", "figure", allow_duplicate=True),
+    Input("indicators-checklist", "value"),
+    State("multi-stock-graph", "figure"),
+    prevent_initial_call=True
+)
+
+def live_points(ticker, column_positions, sequence):
+    """Bars of `ticker` from `sequence` on, as exchange-local times and one array per column position."""
+    times, values, next_sequence = app.stream.buffer(ticker).since(sequence)
+    x = pd.DatetimeIndex(times.view('datetime64[ns]')).tz_localize('UTC').tz_convert(MARKET_TIMEZONE).tz_localize(None)
+    return x, [values[:, position] for position in column_positions], next_sequence
+
+@callback(
+    Output("live-graph", "figure"),
+    Output("live-graph", "style"),
+    Output("live-state", "data"),
+    Output("live-interval", "disabled"),
+    Output("live-status", "children"),
+    Input("live-toggle", "value"),
+    Input("fetch-data-button", "n_clicks"),
+    State("ticker-input", "value"),
+    State("indicators-checklist", "value")
+)
+def start_live_graph(live, n_clicks, tickers, indicators):
+    hidden = {"display": "none"}
+    if not live:
+        return {}, hidden, None, True, ""
+    if app.stream is None:
+        return {}, hidden, None, True, "Live data is not configured (set STREAM_REPLAY_FILE)."
+    if not tickers:
+        return {}, hidden, None, True, "Please enter valid ticker symbols."
+
+    tickers_list = [ticker.strip().upper() for ticker in tickers.split(',')]
+    streaming = [ticker for ticker in tickers_list if app.stream.buffer(ticker) is not None]
+    if not streaming:
+        return {}, hidden, None, True, "No intraday data for the requested tickers yet."
+
+    columns = expand_selection(indicators)
+    sequences = {}
+    frames = {}
+    for ticker in streaming:
+        buffer = app.stream.buffer(ticker)
+        x, ys, sequences[ticker] = live_points(ticker, buffer.columns_index(['Close'] + columns), 0)
+        frames[ticker] = pd.DataFrame(dict(zip(['Close'] + columns, ys)), index=x)
+    fig, traces = plot_live_chart(frames, columns)
+
+    missing = [ticker for ticker in tickers_list if ticker not in streaming]
+    status = f"No intraday data for {', '.join(missing)}." if missing else ""
+    state = {"traces": traces, "sequences": sequences}
+    return fig, {"height": "50vh"}, state, False, status
+
+@callback(
+    Output("live-graph", "extendData"),
+    Output("live-state", "data", allow_duplicate=True),
+    Input("live-interval", "n_intervals"),
+    State("live-state", "data"),
+    prevent_initial_call=True
+)
+def extend_live_graph(n_intervals, state):
+    if not state or not state.get("traces"):
+        raise PreventUpdate
+
+    columns_by_ticker = {}
+    for i, (ticker, column) in enumerate(state["traces"]):
+        columns_by_ticker.setdefault(ticker, []).append((i, column))
+
+    xs, ys, indices = [], [], []
+    sequences = dict(state["sequences"])
+    for ticker, trace_columns in columns_by_ticker.items():
+        buffer = app.stream.buffer(ticker)
+        x, values, sequences[ticker] = live_points(ticker, buffer.columns_index([column for _, column in trace_columns]),
+                                                  sequences[ticker])
+        if not len(x):
+            continue
+        for (i, _), y in zip(trace_columns, values):
+            xs.append(x)
+            ys.append(y)
+            indices.append(i)
+
+    if not indices:
+        raise PreventUpdate
+    # Only the new bars are sent; the browser keeps at most a ring buffer's worth per trace
+    return [dict(x=xs, y=ys), indices, app.stream.capacity], {"traces": state["traces"], "sequences": sequences}
+
+@callback(
+    Output("screener-results", "children"),
+    Output("screener-status", "children"),
+    Input("screener-button", "n_clicks"),
+    Input("screener-query", "n_submit"),
+    State("screener-query", "value"),
+    State("screener-sort", "value"),
+    State("screener-order", "value"),
+    State("screener-limit", "value")
+)
+def update_screener(n_clicks, n_submit, query, sort_by, order, limit):
+    if not n_clicks and not n_submit:
+        raise PreventUpdate
+    try:
+        # Close, then whatever the query filters and ranks on
+        columns = list(dict.fromkeys(['Close'] + query_columns(parse_query(query or '')) + ([sort_by] if sort_by else [])))
+        screen = app.run_screen(query, sort_by, order, limit, columns)
+    except ValueError as e:
+        return None, html.Span(str(e), className="text-danger")
+
+    status = f"{screen['count']} of {screen['tickers']} tickers match."
+    if not screen['results']:
+        return None, status
+    table = pd.DataFrame(screen['results'], columns=['ticker', 'as_of'] + columns).round(2)
+    table.columns = ['Ticker', 'As of'] + [column.replace('_', ' ') for column in columns]
+    return dbc.Table.from_dataframe(table, striped=True, bordered=False, hover=True, size="sm"), status
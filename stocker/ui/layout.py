@@ -1,6 +1,8 @@
 import dash_bootstrap_components as dbc
 from dash import html, dcc
 import datetime
+from config import STREAM_PUSH_INTERVAL, SCREENER_DEFAULT_LIMIT, SCREENER_MAX_LIMIT
+from data.screener import SCREENER_COLUMNS
 
 def create_layout():
     indicators = [
@@ -52,7 +54,66 @@ def create_layout():
                     style={"height": "70vh", "backgroundColor": "#f8f9fa", "borderRadius": "10px"},
                     className="mb-3"
                 ),
-                html.Div(id="error-message", className="text-center text-danger")
+                html.Div(id="error-message", className="text-center text-danger"),
+                # Graph width in pixels, measured in the browser on each fetch
+                dcc.Store(id="graph-size"),
+                # What the graph currently shows, so later updates can send only the traces that changed
+                dcc.Store(id="figure-state"),
+                dbc.Switch(
+                    id="live-toggle",
+                    label="Live intraday",
+                    value=False,
+                    className="mb-3 d-flex justify-content-center"
+                ),
+                dcc.Graph(
+                    id="live-graph",
+                    style={"display": "none"},
+                    className="mb-3"
+                ),
+                html.Div(id="live-status", className="text-center text-muted"),
+                # Polls for bars closed since the last update, which are appended with extendData
+                dcc.Interval(id="live-interval", interval=STREAM_PUSH_INTERVAL, disabled=True),
+                dcc.Store(id="live-state")
+            ], width=12)
+        ]),
+        dbc.Row([
+            dbc.Col([
+                html.H3("Screener", className="mt-4 mb-3"),
+                dbc.Input(
+                    id="screener-query",
+                    type="text",
+                    placeholder="Filter the cached universe, e.g., RSI < 30 and Close > SMA_50",
+                    debounce=True,
+                    className="mb-3"
+                ),
+                dbc.Row([
+                    dbc.Col(dcc.Dropdown(
+                        id="screener-sort",
+                        options=[{'label': i.replace('_', ' '), 'value': i} for i in SCREENER_COLUMNS],
+                        placeholder="Sort by",
+                    ), md=5),
+                    dbc.Col(dbc.Select(
+                        id="screener-order",
+                        options=[{'label': 'Highest first', 'value': 'desc'}, {'label': 'Lowest first', 'value': 'asc'}],
+                        value='desc',
+                    ), md=3),
+                    dbc.Col(dbc.Input(
+                        id="screener-limit",
+                        type="number",
+                        min=1,
+                        max=SCREENER_MAX_LIMIT,
+                        value=SCREENER_DEFAULT_LIMIT,
+                    ), md=2),
+                    dbc.Col(dbc.Button(
+                        "Screen",
+                        id="screener-button",
+                        n_clicks=0,
+                        color="primary",
+                        className="w-100"
+                    ), md=2),
+                ], className="mb-3"),
+                html.Div(id="screener-status", className="text-center text-muted mb-2"),
+                html.Div(id="screener-results")
             ], width=12)
         ])
     ], fluid=True, className="p-4")
\ No newline at end of file
@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+from typing import Optional, Sequence, Tuple
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: pick `n_out` points that preserve the visual shape of a line.
+
+    The first and last points are always kept; every bucket in between contributes the point
+    forming the largest triangle with the previously selected point and the next bucket's mean.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    every = (n - 2) / (n_out - 2)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = x[end:next_end].mean() if next_end > end else x[-1]
+        avg_y = y[end:next_end].mean() if next_end > end else y[-1]
+
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+def _timestamp(value, tz) -> pd.Timestamp:
+    ts = pd.Timestamp(value)
+    if tz is not None and ts.tzinfo is None:
+        return ts.tz_localize(tz)
+    if tz is None and ts.tzinfo is not None:
+        return ts.tz_convert(None)
+    return ts
+
+def _split(index: pd.DatetimeIndex, x_range: Optional[Sequence]) -> Tuple[int, int]:
+    """Positions of the first and one past the last row inside `x_range`."""
+    if x_range is None:
+        return 0, len(index)
+    lo = int(index.searchsorted(_timestamp(x_range[0], index.tz), side='left'))
+    hi = int(index.searchsorted(_timestamp(x_range[1], index.tz), side='right'))
+    return lo, max(lo, hi)
+
+def _budgets(lo: int, hi: int, n: int, max_points: int) -> Sequence[Tuple[int, int, int]]:
+    """Segments of the series with their point budgets: full resolution for the visible range."""
+    if lo == 0 and hi == n:
+        return [(0, n, max_points)]
+    outside = max(max_points // 4, 3)
+    return [(0, lo, outside), (lo, hi, max_points), (hi, n, outside)]
+
+def downsample_line(index: pd.DatetimeIndex, values: np.ndarray, max_points: int,
+                    x_range: Optional[Sequence] = None) -> Tuple[pd.DatetimeIndex, np.ndarray]:
+    """
+    Reduce a line trace to about `max_points` points with LTTB.
+
+    Missing values are dropped before selection. When `x_range` is given, that window is
+    sampled at `max_points` and the rest of the series at a quarter of that, so a zoomed view
+    gets full resolution while the range slider still shows the whole history.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    lo, hi = _split(index, x_range)
+    x = index.asi8.astype(np.float64)
+
+    keep = []
+    for start, end, budget in _budgets(lo, hi, len(index), max_points):
+        positions = np.arange(start, end)[~np.isnan(values[start:end])]
+        if len(positions):
+            keep.append(positions[lttb_indices(x[positions], values[positions], budget)])
+    keep = np.concatenate(keep) if keep else np.arange(0)
+    return index[keep], values[keep]
+
+def resample_ohlc(df: pd.DataFrame, max_bars: int, x_range: Optional[Sequence] = None) -> pd.DataFrame:
+    """
+    Merge consecutive bars so at most about `max_bars` remain (per segment when `x_range` is given).
+
+    Each merged bar keeps the first Open, highest High, lowest Low, last Close and total Volume,
+    stamped with the date of its first bar.
+    """
+    lo, hi = _split(df.index, x_range)
+    frames = []
+    for start, end, budget in _budgets(lo, hi, len(df), max_bars):
+        segment = df.iloc[start:end]
+        n = len(segment)
+        if n <= budget:
+            frames.append(segment[['Open', 'High', 'Low', 'Close', 'Volume']])
+            continue
+        size = int(np.ceil(n / budget))
+        starts = np.arange(0, n, size)
+        ends = np.append(starts[1:], n) - 1
+        frames.append(pd.DataFrame({
+            'Open': segment['Open'].to_numpy()[starts],
+            'High': np.fmax.reduceat(segment['High'].to_numpy(dtype=np.float64), starts),
+            'Low': np.fmin.reduceat(segment['Low'].to_numpy(dtype=np.float64), starts),
+            'Close': segment['Close'].to_numpy()[ends],
+            'Volume': np.add.reduceat(np.nan_to_num(segment['Volume'].to_numpy(dtype=np.float64)), starts),
+        }, index=segment.index[starts]))
+    return pd.concat(frames) if len(frames) > 1 else frames[0]
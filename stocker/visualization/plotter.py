@@ -1,238 +1,268 @@
+import copy
 import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import plotly.colors as colors
 import pandas as pd
-from typing import Dict, List
-
-def plot_multi_stock_chart(dfs: Dict[str, pd.DataFrame], indicators: List[str]) -> go.Figure:
-    fig = make_subplots(
-        rows=2, cols=1,
-        shared_xaxes=True,
-        vertical_spacing=0.03,
-        row_heights=[0.7, 0.3],
-        subplot_titles=("Stock Prices and Indicators", "Volume")
-    )
+from typing import Dict, List, Optional, Sequence, Tuple
+from .downsample import downsample_line, resample_ohlc
+
+# Horizontal pixels per candlestick when downsampling
+CANDLE_PIXELS = 4
+
+# Secondary y-axes of oscillators in the live chart; everything else shares the price axis
+LIVE_AXES = {'RSI': 'y2', 'MACD': 'y3', 'Signal_Line': 'y3', 'OBV': 'y4', '%K': 'y5', '%D': 'y5'}
+
+def _line_xy(df: pd.DataFrame, column: str, max_points: Optional[int], x_range: Optional[Sequence]) -> dict:
+    if not max_points:
+        return dict(x=df.index, y=df[column])
+    x, y = downsample_line(df.index, df[column].to_numpy(), max_points, x_range)
+    return dict(x=x, y=y)
+
+def _candles(df: pd.DataFrame, max_points: Optional[int], x_range: Optional[Sequence]) -> pd.DataFrame:
+    # Volume bars are summed over the same buckets, so they line up with the candles
+    return resample_ohlc(df, max(max_points // CANDLE_PIXELS, 3), x_range) if max_points else df
 
+# Traces of each checklist entry: (column, name, line width, dash, extra attributes)
+INDICATOR_TRACES = {
+    'SMA_20': [('SMA_20', 'SMA (20)', 1.5, 'dot', {})],
+    'SMA_50': [('SMA_50', 'SMA (50)', 1.5, 'dash', {})],
+    'EMA_12': [('EMA_12', 'EMA (12)', 1.5, 'dashdot', {})],
+    'EMA_26': [('EMA_26', 'EMA (26)', 1.5, 'longdash', {})],
+    'RSI': [('RSI', 'RSI', 1.5, None, {})],
+    'Bollinger_Bands': [
+        ('Upper_BB', 'Upper BB', 1, None, {}),
+        ('Lower_BB', 'Lower BB', 1, None, {'fill': 'tonexty', 'fillcolor': 'rgba(173,216,230,0.2)'}),
+    ],
+    'MACD': [('MACD', 'MACD', 1.5, None, {}), ('Signal_Line', 'Signal Line', 1, 'dash', {})],
+    'OBV': [('OBV', 'OBV', 1.5, None, {})],
+    'Stochastic_Oscillator': [('%K', '%K', 1.5, None, {}), ('%D', '%D', 1, 'dash', {})],
+}
+
+# Trace groups that are always shown with a ticker, whatever the checklist says
+PRICE_GROUP = 'Price'
+VOLUME_GROUP = 'Volume'
+
+def ticker_color(i: int) -> str:
     color_cycle = colors.qualitative.Plotly
+    return color_cycle[i % len(color_cycle)]
+
+def _translucent(color: str) -> str:
+    return color.replace('rgb', 'rgba').replace(')', ', 0.5)')
+
+def ticker_traces(ticker: str, df: pd.DataFrame, group: str, color: str, max_points: Optional[int] = None,
+                  x_range: Optional[Sequence] = None, visible: bool = True) -> List[dict]:
+    """
+    Plotly traces of one ticker for one trace group: PRICE_GROUP, VOLUME_GROUP or an
+    INDICATOR_TRACES entry, downsampled as in plot_multi_stock_chart.
+
+    Traces are plain dicts tagged with meta {'ticker', 'group'}, so they can be cached, sent
+    on their own and shown or hidden in the browser by group.
+    """
+    meta = {'ticker': ticker, 'group': group}
+    if group == PRICE_GROUP:
+        candles = _candles(df, max_points, x_range)
+        return [dict(
+            type='candlestick',
+            x=candles.index,
+            open=candles["Open"].to_numpy(),
+            high=candles["High"].to_numpy(),
+            low=candles["Low"].to_numpy(),
+            close=candles["Close"].to_numpy(),
+            name=ticker,
+            increasing=dict(line=dict(color=color)),
+            decreasing=dict(line=dict(color=_translucent(color))),
+            legendgroup=ticker,
+            xaxis='x', yaxis='y',
+            meta=meta
+        )]
+    if group == VOLUME_GROUP:
+        candles = _candles(df, max_points, x_range)
+        return [dict(
+            type='bar',
+            x=candles.index,
+            y=candles["Volume"].to_numpy(),
+            name=f"{ticker} Volume",
+            marker=dict(color=_translucent(color)),
+            legendgroup=ticker,
+            xaxis='x2', yaxis='y2',
+            meta=meta
+        )]
+    traces = []
+    for column, name, width, dash, extra in INDICATOR_TRACES[group]:
+        line = dict(color=color, width=width)
+        if dash is not None:
+            line['dash'] = dash
+        traces.append(dict(
+            type='scatter',
+            **_line_xy(df, column, max_points, x_range),
+            mode="lines",
+            name=f"{ticker} {name}",
+            line=line,
+            legendgroup=ticker,
+            xaxis='x', yaxis='y',
+            visible=visible,
+            meta=meta,
+            **extra
+        ))
+    return traces
+
+def trace_groups(indicators: Sequence[str]) -> List[str]:
+    """Trace groups of a ticker, in plotting order, for the checked `indicators`."""
+    return [PRICE_GROUP] + [group for group in INDICATOR_TRACES if group in indicators] + [VOLUME_GROUP]
+
+_base_layout: Optional[dict] = None
+
+def multi_stock_layout(uirevision: str, x_range: Optional[Sequence] = None) -> dict:
+    """Layout of the multi-stock figure: price and volume subplots, indicator axes and range controls."""
+    global _base_layout
+    if _base_layout is None:
+        # Only needed once per process, so it isn't imported with the module
+        from plotly.subplots import make_subplots
+        fig = make_subplots(
+            rows=2, cols=1,
+            shared_xaxes=True,
+            vertical_spacing=0.03,
+            row_heights=[0.7, 0.3],
+            subplot_titles=("Stock Prices and Indicators", "Volume")
+        )
+
+        # Layout updates for cleaner UI
+        fig.update_layout(
+            hovermode="x unified",
+            dragmode="zoom",
+            margin=dict(l=20, r=20, t=40, b=20),
+            template="plotly_white",
+            legend=dict(
+                orientation='h',
+                yanchor="bottom",
+                y=1.02,
+                xanchor="right",
+                x=1,
+                font=dict(size=10)
+            ),
+            font=dict(size=12)
+        )
+
+        # Add secondary y-axes for indicators, placed right of a narrowed plot area
+        # (Plotly only accepts axis positions within [0, 1])
+        fig.update_layout(
+            xaxis_domain=[0, 0.92],
+            xaxis2_domain=[0, 0.92],
+            yaxis2=dict(
+                title="SMA/EMA",
+                overlaying='y',
+                side='right'
+            ),
+            yaxis3=dict(
+                title="RSI",
+                anchor="free",
+                overlaying='y',
+                side='right',
+                position=0.94
+            ),
+            yaxis4=dict(
+                title="MACD",
+                anchor="x",
+                overlaying='y',
+                side='right',
+                position=0.96
+            ),
+            yaxis5=dict(
+                title="OBV",
+                anchor="x",
+                overlaying='y',
+                side='right',
+                position=0.98
+            ),
+            yaxis6=dict(
+                title="Stochastic",
+                anchor="x",
+                overlaying='y',
+                side='right',
+                position=1.0
+            )
+        )
+
+        # Range selectors and sliders
+        fig.update_layout(
+            xaxis=dict(
+                rangeselector=dict(
+                    buttons=list([
+                        dict(count=1, label="1m", step="month", stepmode="backward"),
+                        dict(count=3, label="3m", step="month", stepmode="backward"),
+                        dict(count=6, label="6m", step="month", stepmode="backward"),
+                        dict(count=1, label="YTD", step="year", stepmode="todate"),
+                        dict(count=1, label="1y", step="year", stepmode="backward"),
+                        dict(step="all")
+                    ])
+                ),
+                rangeslider=dict(visible=True),
+                type="date"
+            )
+        )
+        # Built once; the subplot grid and axes never change
+        _base_layout = fig.layout.to_plotly_json()
+
+    layout = copy.deepcopy(_base_layout)
+    # Keep zoom and legend state when the figure is re-sent at a finer resolution
+    layout['uirevision'] = uirevision
+    if x_range is not None:
+        layout['xaxis']['range'] = list(x_range)
+    return layout
+
+def plot_multi_stock_chart(dfs: Dict[str, pd.DataFrame], indicators: List[str], max_points: Optional[int] = None,
+                           x_range: Optional[Sequence] = None) -> go.Figure:
+    """
+    Build the candlestick, indicator and volume figure for several tickers.
+
+    With `max_points` (normally the graph's width in pixels) line traces are reduced with LTTB
+    and bars are merged into OHLC buckets, so the figure size no longer grows with the date
+    range. `x_range` is the zoomed window, which is sampled at full resolution and shown.
+    """
+    traces = [
+        trace
+        for i, (ticker, df) in enumerate(dfs.items())
+        for group in trace_groups(indicators)
+        for trace in ticker_traces(ticker, df, group, ticker_color(i), max_points, x_range)
+    ]
+    return go.Figure(data=traces, layout=multi_stock_layout(",".join(dfs), x_range))
+
+def plot_live_chart(dfs: Dict[str, pd.DataFrame], columns: List[str]) -> Tuple[go.Figure, List[Tuple[str, str]]]:
+    """
+    Build the intraday figure: each ticker's close and the indicator `columns` as lines.
+
+    Returns the figure and the (ticker, column) shown by each trace, in trace order, so new
+    bars can be appended to the right traces with extendData instead of redrawing.
+    """
+    fig = go.Figure()
+    color_cycle = colors.qualitative.Plotly
+    traces = []
+    dashes = ['dot', 'dash', 'dashdot', 'longdash', 'solid']
 
     for i, (ticker, df) in enumerate(dfs.items()):
         color = color_cycle[i % len(color_cycle)]
-        
-        # Candlestick chart
-        fig.add_trace(go.Candlestick(
-            x=df.index,
-            open=df["Open"],
-            high=df["High"],
-            low=df["Low"],
-            close=df["Close"],
-            name=ticker,
-            increasing_line_color=color,
-            decreasing_line_color=color.replace('rgb', 'rgba').replace(')', ', 0.5)'),
-            legendgroup=ticker
-        ), row=1, col=1)
-
-        # Add indicators
-        if 'SMA_20' in indicators:
-            fig.add_trace(go.Scatter(
-                x=df.index,
-                y=df["SMA_20"],
-                mode="lines",
-                name=f"{ticker} SMA (20)",
-                line=dict(color=color, width=1.5, dash='dot'),
-                legendgroup=ticker
-            ), row=1, col=1)
-        
-        if 'SMA_50' in indicators:
-            fig.add_trace(go.Scatter(
-                x=df.index,
-                y=df["SMA_50"],
-                mode="lines",
-                name=f"{ticker} SMA (50)",
-                line=dict(color=color, width=1.5, dash='dash'),
-                legendgroup=ticker
-            ), row=1, col=1)
-        
-        if 'EMA_12' in indicators:
-            fig.add_trace(go.Scatter(
-                x=df.index,
-                y=df["EMA_12"],
-                mode="lines",
-                name=f"{ticker} EMA (12)",
-                line=dict(color=color, width=1.5, dash='dashdot'),
-                legendgroup=ticker
-            ), row=1, col=1)
-        
-        if 'EMA_26' in indicators:
-            fig.add_trace(go.Scatter(
-                x=df.index,
-                y=df["EMA_26"],
-                mode="lines",
-                name=f"{ticker} EMA (26)",
-                line=dict(color=color, width=1.5, dash='longdash'),
-                legendgroup=ticker
-            ), row=1, col=1)
-        
-        if 'RSI' in indicators:
-            fig.add_trace(go.Scatter(
-                x=df.index,
-                y=df["RSI"],
-                mode="lines",
-                name=f"{ticker} RSI",
-                yaxis="y3",
-                line=dict(color=color, width=1.5),
-                legendgroup=ticker
-            ), row=1, col=1)
-        
-        if 'Bollinger_Bands' in indicators:
-            fig.add_trace(go.Scatter(
+        for j, column in enumerate(['Close'] + columns):
+            fig.add_trace(go.Scattergl(
                 x=df.index,
-                y=df["Upper_BB"],
+                y=df[column],
                 mode="lines",
-                name=f"{ticker} Upper BB",
-                line=dict(color=color, width=1),
+                name=ticker if column == 'Close' else f"{ticker} {column.replace('_', ' ')}",
+                yaxis=LIVE_AXES.get(column, 'y'),
+                line=dict(color=color, width=2 if column == 'Close' else 1, dash='solid' if column == 'Close' else dashes[j % len(dashes)]),
                 legendgroup=ticker
-            ), row=1, col=1)
-            fig.add_trace(go.Scatter(
-                x=df.index,
-                y=df["Lower_BB"],
-                mode="lines",
-                name=f"{ticker} Lower BB",
-                line=dict(color=color, width=1),
-                legendgroup=ticker,
-                fill='tonexty',
-                fillcolor='rgba(173,216,230,0.2)'
-            ), row=1, col=1)
-        
-        if 'MACD' in indicators:
-            fig.add_trace(go.Scatter(
-                x=df.index,
-                y=df["MACD"],
-                mode="lines",
-                name=f"{ticker} MACD",
-                yaxis="y4",
-                line=dict(color=color, width=1.5),
-                legendgroup=ticker
-            ), row=1, col=1)
-            fig.add_trace(go.Scatter(
-                x=df.index,
-                y=df["Signal_Line"],
-                mode="lines",
-                name=f"{ticker} Signal Line",
-                yaxis="y4",
-                line=dict(color=color, width=1, dash='dash'),
-                legendgroup=ticker
-            ), row=1, col=1)
-        
-        if 'OBV' in indicators:
-            fig.add_trace(go.Scatter(
-                x=df.index,
-                y=df["OBV"],
-                mode="lines",
-                name=f"{ticker} OBV",
-                yaxis="y5",
-                line=dict(color=color, width=1.5),
-                legendgroup=ticker
-            ), row=1, col=1)
-        
-        if 'Stochastic_Oscillator' in indicators:
-            fig.add_trace(go.Scatter(
-                x=df.index,
-                y=df["%K"],
-                mode="lines",
-                name=f"{ticker} %K",
-                yaxis="y6",
-                line=dict(color=color, width=1.5),
-                legendgroup=ticker
-            ), row=1, col=1)
-            fig.add_trace(go.Scatter(
-                x=df.index,
-                y=df["%D"],
-                mode="lines",
-                name=f"{ticker} %D",
-                yaxis="y6",
-                line=dict(color=color, width=1, dash='dash'),
-                legendgroup=ticker
-            ), row=1, col=1)
+            ))
+            traces.append((ticker, column))
 
-        # Volume bar chart
-        fig.add_trace(go.Bar(
-            x=df.index,
-            y=df["Volume"],
-            name=f"{ticker} Volume",
-            marker_color=color.replace('rgb', 'rgba').replace(')', ', 0.5)'),
-            legendgroup=ticker
-        ), row=2, col=1)
-
-    # Layout updates for cleaner UI
     fig.update_layout(
         hovermode="x unified",
-        dragmode="zoom",
         margin=dict(l=20, r=20, t=40, b=20),
         template="plotly_white",
-        legend=dict(
-            orientation='h',
-            yanchor="bottom",
-            y=1.02,
-            xanchor="right",
-            x=1,
-            font=dict(size=10)
-        ),
-        font=dict(size=12)
+        title="Intraday",
+        legend=dict(orientation='h', yanchor="bottom", y=1.02, xanchor="right", x=1, font=dict(size=10)),
+        xaxis=dict(domain=[0, 0.92], type="date"),
+        yaxis2=dict(title="RSI", anchor="free", overlaying='y', side='right', position=0.94),
+        yaxis3=dict(title="MACD", anchor="free", overlaying='y', side='right', position=0.96),
+        yaxis4=dict(title="OBV", anchor="free", overlaying='y', side='right', position=0.98),
+        yaxis5=dict(title="Stochastic", anchor="free", overlaying='y', side='right', position=1.0),
+        uirevision=",".join(dfs)
     )
-
-    # Add secondary y-axes for indicators
-    fig.update_layout(
-        yaxis2=dict(
-            title="SMA/EMA",
-            overlaying='y',
-            side='right'
-        ),
-        yaxis3=dict(
-            title="RSI",
-            anchor="free",
-            overlaying='y',
-            side='right',
-            position=1.015
-        ),
-        yaxis4=dict(
-            title="MACD",
-            anchor="x",
-            overlaying='y',
-            side='right',
-            position=1.03
-        ),
-        yaxis5=dict(
-            title="OBV",
-            anchor="x",
-            overlaying='y',
-            side='right',
-            position=1.045
-        ),
-        yaxis6=dict(
-            title="Stochastic",
-            anchor="x",
-            overlaying='y',
-            side='right',
-            position=1.06
-        )
-    )
-
-    # Range selectors and sliders
-    fig.update_layout(
-        xaxis=dict(
-            rangeselector=dict(
-                buttons=list([
-                    dict(count=1, label="1m", step="month", stepmode="backward"),
-                    dict(count=3, label="3m", step="month", stepmode="backward"),
-                    dict(count=6, label="6m", step="month", stepmode="backward"),
-                    dict(count=1, label="YTD", step="year", stepmode="todate"),
-                    dict(count=1, label="1y", step="year", stepmode="backward"),
-                    dict(step="all")
-                ])
-            ),
-            rangeslider=dict(visible=True),
-            type="date"
-        )
-    )
-
-    return fig
\ No newline at end of file
+    return fig, traces